@@ -145,6 +145,24 @@ app_include_css = "/assets/petrol_pump_v2/css/petrol_pump_v2.css"
 # 	}
 # }
 
+doc_events = {
+	"Sales Invoice": {
+		"on_submit": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+		"on_cancel": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+	},
+	"Payment Entry": {
+		"on_submit": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+		"on_cancel": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+	},
+	"Journal Entry": {
+		"on_submit": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+		"on_cancel": "petrol_pump_v2.petrol_pump_v2.credit_exposure.update_exposure",
+	},
+	"Stock Ledger Entry": {
+		"on_submit": "petrol_pump_v2.petrol_pump_v2.tank_stock.update_tank_stock",
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -166,6 +184,18 @@ app_include_css = "/assets/petrol_pump_v2/css/petrol_pump_v2.css"
 # 	],
 # }
 
+scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"petrol_pump_v2.petrol_pump_v2.fuel_pricing.activate_scheduled_prices",
+		],
+	},
+	"daily": [
+		"petrol_pump_v2.petrol_pump_v2.wet_stock.run_nightly_analysis",
+		"petrol_pump_v2.petrol_pump_v2.stock_forecast.run_daily_forecast",
+	],
+}
+
 # Testing
 # -------
 
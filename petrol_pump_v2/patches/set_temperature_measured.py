@@ -0,0 +1,13 @@
+import frappe
+
+
+def execute():
+	"""Tick Temperature Measured where a temperature was entered before the check box existed.
+
+	Until then a temperature of 0 meant not measured, so every non-zero
+	temperature was used to correct the volume.
+	"""
+	for doctype in ("Dip Reading", "Tank Dip Reading Detail", "Fuel Delivery"):
+		frappe.db.sql(
+			f"UPDATE `tab{doctype}` SET temperature_measured = 1 WHERE IFNULL(temperature, 0) != 0"
+		)
@@ -0,0 +1,240 @@
+"""Side-effect-free totals for Day Closing and Shift Reading.
+
+Nothing here touches the database or imports frappe: callers resolve rates
+(once per fuel type) and meter capacities up front and pass plain rows, either
+dicts or child-table documents. `compute_closing` then derives every row value
+and every total in a single pass per table, so the same code runs inside a
+document, in a benchmark or in a plain unit test.
+"""
+
+import time
+
+# A backward reading is treated as a rollover only if the implied dispensed
+# volume is within this fraction of the meter capacity
+ROLLOVER_WINDOW = 0.1
+
+ROLLOVER = "Rollover"
+METER_REPLACED = "Meter Replaced"
+
+
+def _num(value):
+	try:
+		return float(value or 0)
+	except (TypeError, ValueError):
+		return 0.0
+
+
+def _get(row, field):
+	return row.get(field) if hasattr(row, "get") else getattr(row, field, None)
+
+
+def is_rollover(previous_reading, current_reading, meter_capacity=0, meter_event=None):
+	previous_reading = _num(previous_reading)
+	current_reading = _num(current_reading)
+	meter_capacity = _num(meter_capacity)
+	if current_reading >= previous_reading or not meter_capacity:
+		return False
+	wrapped = meter_capacity - previous_reading + current_reading
+	if meter_event == ROLLOVER:
+		return wrapped >= 0
+	return 0 <= wrapped <= meter_capacity * ROLLOVER_WINDOW
+
+
+def dispensed_liters(previous_reading, current_reading, meter_capacity=0, meter_event=None):
+	"""Liters dispensed between two totalizer readings, accounting for rollover."""
+	previous_reading = _num(previous_reading)
+	current_reading = _num(current_reading)
+	liters = current_reading - previous_reading
+	if liters >= 0 or meter_event == METER_REPLACED:
+		return liters
+
+	if is_rollover(previous_reading, current_reading, meter_capacity, meter_event):
+		return _num(meter_capacity) - previous_reading + current_reading
+	return liters
+
+
+def has_backward_reading(readings):
+	"""True if any reading is below its previous reading, i.e. meter capacities are needed."""
+	return any(
+		_num(_get(r, "current_reading")) < _num(_get(r, "previous_reading")) for r in readings or ()
+	)
+
+
+def fuel_types_without_rate(*tables):
+	"""Fuel types of rows that carry no rate yet, so the caller can resolve each once."""
+	return {
+		_get(row, "fuel_type")
+		for table in tables
+		for row in table or ()
+		if _get(row, "fuel_type") and not _num(_get(row, "rate"))
+	}
+
+
+def _sum_amounts(rows):
+	return sum(_num(_get(row, "amount")) for row in rows or ())
+
+
+def compute_closing(
+	readings=(),
+	credit=(),
+	card=(),
+	expenses=(),
+	transfers=(),
+	supplier_payments=(),
+	collections=(),
+	rates=None,
+	meter_capacities=None,
+	previous_cash=0,
+	recompute_liters=True,
+):
+	"""Compute all row values and totals of a closing.
+
+	`readings` rows need previous_reading, current_reading, fuel_type and
+	optionally rate, meter_event, nozzle_number and dispensed_liters (used as-is
+	when `recompute_liters` is False). `rates` maps fuel_type to the rate used
+	for rows without one; `meter_capacities` maps nozzle_number to capacity.
+
+	Returns a dict with the per-row lists reading_liters, reading_rates,
+	reading_amounts, credit_rates and credit_amounts (in input order) and the
+	parent totals under the Day Closing field names.
+	"""
+	rates = rates or {}
+	meter_capacities = meter_capacities or {}
+
+	reading_liters = []
+	reading_rates = []
+	reading_amounts = []
+	total_liters = 0.0
+	total_sales = 0.0
+	for row in readings or ():
+		if recompute_liters:
+			liters = dispensed_liters(
+				_get(row, "previous_reading"),
+				_get(row, "current_reading"),
+				meter_capacities.get(_get(row, "nozzle_number")),
+				_get(row, "meter_event"),
+			)
+		else:
+			liters = _num(_get(row, "dispensed_liters"))
+		rate = _num(_get(row, "rate")) or _num(rates.get(_get(row, "fuel_type")))
+		amount = liters * rate
+		reading_liters.append(liters)
+		reading_rates.append(rate)
+		reading_amounts.append(amount)
+		total_liters += liters
+		total_sales += amount
+
+	credit_rates = []
+	credit_amounts = []
+	credit_liters = 0.0
+	credit_amount = 0.0
+	for row in credit or ():
+		rate = _num(_get(row, "rate"))
+		if _get(row, "fuel_type") and not rate:
+			rate = _num(rates.get(_get(row, "fuel_type")))
+		liters = _num(_get(row, "liters"))
+		amount = liters * rate if liters > 0 and rate > 0 else _num(_get(row, "amount"))
+		credit_rates.append(rate)
+		credit_amounts.append(amount)
+		credit_liters += liters
+		credit_amount += amount
+
+	fund_transfer_effect = 0.0
+	for row in transfers or ():
+		transfer_type = _get(row, "transfer_type")
+		if transfer_type == "Withdraw":
+			fund_transfer_effect += _num(_get(row, "amount"))
+		elif transfer_type == "Deposit":
+			fund_transfer_effect -= _num(_get(row, "amount"))
+
+	card_amount = _sum_amounts(card)
+	total_expenses = _sum_amounts(expenses)
+	total_supplier_payments = _sum_amounts(supplier_payments)
+	total_credit_collections = _sum_amounts(collections)
+
+	# Net cash received today from all operations
+	cash_amount = (
+		total_sales
+		- credit_amount
+		- card_amount
+		- total_expenses
+		- total_supplier_payments
+		+ total_credit_collections
+		+ fund_transfer_effect
+	)
+
+	return {
+		"reading_liters": reading_liters,
+		"reading_rates": reading_rates,
+		"reading_amounts": reading_amounts,
+		"credit_rates": credit_rates,
+		"credit_amounts": credit_amounts,
+		"total_liters": total_liters,
+		"total_sales": total_sales,
+		"credit_sales_liters": credit_liters,
+		"credit_amount": credit_amount,
+		"card_amount": card_amount,
+		"total_expenses": total_expenses,
+		"total_supplier_payments": total_supplier_payments,
+		"total_credit_collections": total_credit_collections,
+		"total_fund_transfer_effect": fund_transfer_effect,
+		"cash_amount": cash_amount,
+		"cash_in_hand": _num(previous_cash) + cash_amount,
+	}
+
+
+def synthetic_closing(rows=10000, fuel_types=("Petrol", "Diesel", "Hi-Octane")):
+	"""A large in-memory closing for benchmarks and tests."""
+	readings = []
+	for i in range(rows):
+		previous = 1000.0 + i * 7.5
+		readings.append(
+			{
+				"nozzle_number": f"N-{i}",
+				"fuel_type": fuel_types[i % len(fuel_types)],
+				"previous_reading": previous,
+				"current_reading": previous + (i % 500) * 1.25,
+				"rate": 0 if i % 4 else 250.5,
+			}
+		)
+	credit = [
+		{"customer": f"C-{i}", "fuel_type": fuel_types[i % len(fuel_types)], "liters": 10 + i % 50}
+		for i in range(rows // 10)
+	]
+	card = [{"bank_account": f"B-{i % 5}", "amount": 500 + i} for i in range(rows // 20)]
+	expenses = [{"expense_account": "Misc", "amount": 100 + i % 30} for i in range(rows // 50)]
+	transfers = [
+		{"transfer_type": "Deposit" if i % 2 else "Withdraw", "amount": 1000 + i} for i in range(rows // 100)
+	]
+	return {
+		"readings": readings,
+		"credit": credit,
+		"card": card,
+		"expenses": expenses,
+		"transfers": transfers,
+		"supplier_payments": [{"supplier": "S", "amount": 2500}],
+		"collections": [{"customer": "C-1", "amount": 1500}],
+		"rates": dict(zip(fuel_types, (272.15, 283.6, 305.0), strict=False)),
+	}
+
+
+def benchmark(rows=10000, repeat=20):
+	"""Time compute_closing on a synthetic closing; runs without a site.
+
+	python -c "from petrol_pump_v2.petrol_pump_v2.closing_core import benchmark; benchmark()"
+	"""
+	closing = synthetic_closing(rows)
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		compute_closing(**closing)
+		timings.append((time.perf_counter() - started) * 1000)
+	timings.sort()
+	result = {
+		"rows": rows,
+		"repeat": repeat,
+		"best_ms": round(timings[0], 2),
+		"median_ms": round(timings[len(timings) // 2], 2),
+	}
+	print(result)
+	return result
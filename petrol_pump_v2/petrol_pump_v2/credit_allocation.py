@@ -0,0 +1,197 @@
+"""FIFO allocation of customer credit collections against open Sales Invoices.
+
+Open invoices for every customer involved are read with one query and kept in
+memory as per-customer queues (oldest first). Collections consume the queues
+in order, so several collections for the same customer never allocate the same
+outstanding twice.
+"""
+
+import frappe
+from frappe.utils import flt
+
+
+def get_open_invoices(company, customers, receivable_account=None):
+	"""Outstanding Sales Invoices per customer, oldest first, from one query."""
+	customers = [c for c in set(customers or []) if c]
+	if not customers:
+		return {}
+
+	conditions = ""
+	values = {"company": company, "customers": tuple(customers)}
+	if receivable_account:
+		conditions = "AND debit_to = %(receivable_account)s"
+		values["receivable_account"] = receivable_account
+
+	rows = frappe.db.sql(
+		f"""
+		SELECT name, customer, posting_date, grand_total, outstanding_amount
+		FROM `tabSales Invoice`
+		WHERE docstatus = 1 AND is_return = 0 AND outstanding_amount > 0
+			AND company = %(company)s AND customer IN %(customers)s
+			{conditions}
+		ORDER BY customer, posting_date, creation, name
+		""",
+		values,
+		as_dict=True,
+	)
+
+	queues = {}
+	for row in rows:
+		row.outstanding_amount = flt(row.outstanding_amount, 2)
+		queues.setdefault(row.customer, []).append(row)
+	return queues
+
+
+def allocate_fifo(amount, queue):
+	"""Allocate `amount` against the invoices in `queue`, oldest first.
+
+	The queue is consumed in place (fully settled invoices are removed and the
+	outstanding of a partly settled one is reduced). Returns the allocations as
+	(invoice, allocated, outstanding_before) and the unallocated remainder.
+	"""
+	remaining = flt(amount, 2)
+	allocations = []
+	while remaining > 0 and queue:
+		invoice = queue[0]
+		outstanding = invoice.outstanding_amount
+		allocated = min(remaining, outstanding)
+		allocations.append((invoice, allocated, outstanding))
+		remaining = flt(remaining - allocated, 2)
+		invoice.outstanding_amount = flt(outstanding - allocated, 2)
+		if invoice.outstanding_amount <= 0:
+			queue.pop(0)
+	return allocations, remaining
+
+
+def get_unallocated_collections(company=None, petrol_pump=None):
+	"""Submitted Day Closing collection Payment Entries that still carry an unallocated amount."""
+	conditions = ""
+	values = {}
+	if company:
+		conditions += " AND pe.company = %(company)s"
+		values["company"] = company
+	if petrol_pump:
+		conditions += " AND dc.petrol_pump = %(petrol_pump)s"
+		values["petrol_pump"] = petrol_pump
+
+	return frappe.db.sql(
+		f"""
+		SELECT DISTINCT pe.name, pe.company, pe.party, pe.paid_from, pe.paid_amount,
+			pe.unallocated_amount, pe.posting_date, pe.creation
+		FROM `tabPayment Entry` pe
+		JOIN `tabDay Closing` dc ON dc.name = pe.reference_no AND dc.docstatus = 1
+		WHERE pe.docstatus = 1 AND pe.payment_type = 'Receive'
+			AND pe.party_type = 'Customer' AND pe.unallocated_amount > 0
+			{conditions}
+		ORDER BY pe.posting_date, pe.creation
+		""",
+		values,
+		as_dict=True,
+	)
+
+
+def build_reconcile_entries(pe, allocations):
+	"""Rows for reconcile_against_document allocating one Payment Entry to invoices.
+
+	Every row carries the Payment Entry's stored unallocated_amount: ERPNext
+	checks each row against it, and the stored value only changes once the
+	Payment Entry is saved after the last row.
+	"""
+	return [
+		frappe._dict(
+			{
+				"voucher_type": "Payment Entry",
+				"voucher_no": pe.name,
+				"voucher_detail_no": None,
+				"against_voucher_type": "Sales Invoice",
+				"against_voucher": invoice.name,
+				"account": pe.paid_from,
+				"party_type": "Customer",
+				"party": pe.party,
+				"dr_or_cr": "credit_in_account_currency",
+				"unreconciled_amount": flt(pe.unallocated_amount),
+				"unadjusted_amount": flt(pe.paid_amount),
+				"allocated_amount": allocated,
+				"difference_amount": 0,
+				"difference_account": None,
+				"exchange_rate": 1,
+			}
+		)
+		for invoice, allocated, _outstanding in allocations
+	]
+
+
+@frappe.whitelist()
+def reconcile_unallocated_collections(company=None, petrol_pump=None):
+	"""Allocate every historical unallocated collection against open invoices, FIFO.
+
+	Runs network-wide unless filtered. Open invoices are loaded once per
+	company for all customers involved, and each Payment Entry is reconciled
+	through ERPNext's standard reconcile_against_document and committed on
+	its own. A Payment Entry that fails is rolled back and logged, and the
+	run carries on with the next one.
+	"""
+	from erpnext.accounts.utils import reconcile_against_document
+
+	frappe.only_for("System Manager")
+
+	collections = get_unallocated_collections(company, petrol_pump)
+	by_company = {}
+	for pe in collections:
+		by_company.setdefault(pe.company, []).append(pe)
+
+	reconciled = 0
+	failed = 0
+	allocated_total = 0
+	for pe_company, payments in by_company.items():
+		queues = get_open_invoices(pe_company, [pe.party for pe in payments])
+		for pe in payments:
+			allocations, _remaining = allocate_fifo(pe.unallocated_amount, queues.get(pe.party, []))
+			if not allocations:
+				continue
+
+			try:
+				reconcile_against_document(build_reconcile_entries(pe, allocations))
+				frappe.db.commit()
+			except Exception:
+				frappe.db.rollback()
+				frappe.log_error(
+					title=f"Collection reconciliation failed for Payment Entry {pe.name}",
+					reference_doctype="Payment Entry",
+					reference_name=pe.name,
+				)
+				failed += 1
+				# The queue already counts this Payment Entry's allocations; reload it
+				queues[pe.party] = get_open_invoices(pe_company, [pe.party]).get(pe.party, [])
+				continue
+
+			reconciled += 1
+			allocated_total += sum(allocated for _invoice, allocated, _outstanding in allocations)
+
+	result = {
+		"payment_entries": len(collections),
+		"reconciled": reconciled,
+		"failed": failed,
+		"allocated_amount": flt(allocated_total, 2),
+	}
+	message = (
+		f"Reconciled {reconciled} of {len(collections)} collection Payment Entries "
+		f"({flt(allocated_total, 2)} allocated)"
+	)
+	if failed:
+		message += f"; {failed} failed, see Error Log"
+	frappe.msgprint(message)
+	return result
+
+
+@frappe.whitelist()
+def enqueue_reconcile_unallocated_collections(company=None, petrol_pump=None):
+	frappe.only_for("System Manager")
+	frappe.enqueue(
+		"petrol_pump_v2.petrol_pump_v2.credit_allocation.reconcile_unallocated_collections",
+		queue="long",
+		timeout=3600,
+		company=company,
+		petrol_pump=petrol_pump,
+	)
+	frappe.msgprint("Reconciliation of unallocated collections has been queued")
@@ -0,0 +1,184 @@
+"""Credit exposure of credit customers across all pumps.
+
+Each customer's posted receivable balance (GL, per company) is cached in a
+Redis hash per company. Entries are loaded lazily for the customers a closing
+needs and refreshed only for the parties touched when a Sales Invoice, Payment
+Entry or Journal Entry is submitted or cancelled, after that transaction
+commits. Same-day credit still sitting on unposted Day Closings is added with
+one grouped query, so a customer fuelling at many pumps in one day is checked
+against their limit as a whole.
+"""
+
+import frappe
+from frappe.utils import flt
+
+
+def _cache_key(company):
+	return f"petrol_pump_v2:credit_exposure:{company}"
+
+
+def _posted_balances(company, customers):
+	"""Receivable GL balance per customer, one grouped query."""
+	if not customers:
+		return {}
+	rows = frappe.db.sql(
+		"""
+		SELECT party, SUM(debit - credit)
+		FROM `tabGL Entry`
+		WHERE company = %(company)s AND party_type = 'Customer' AND party IN %(customers)s
+			AND is_cancelled = 0
+		GROUP BY party
+		""",
+		{"company": company, "customers": tuple(customers)},
+	)
+	balances = dict.fromkeys(customers, 0.0)
+	balances.update({party: flt(balance) for party, balance in rows})
+	return balances
+
+
+def get_posted_exposure(company, customers):
+	"""Cached posted balance per customer; cache misses are loaded with one query."""
+	customers = [c for c in set(customers or []) if c]
+	cache = frappe.cache()
+	cached = cache.hgetall(_cache_key(company)) or {}
+	cached = {k.decode() if isinstance(k, bytes) else k: v for k, v in cached.items()}
+	exposure = {c: flt(cached[c]) for c in customers if c in cached}
+
+	missing = [c for c in customers if c not in exposure]
+	for customer, balance in _posted_balances(company, missing).items():
+		cache.hset(_cache_key(company), customer, balance)
+		exposure[customer] = balance
+	return exposure
+
+
+def get_unposted_credit(company, customers, exclude=None):
+	"""Credit on Day Closings whose sales are not yet in the ledger.
+
+	That is draft closings, and submitted Monthly-mode closings whose period
+	has not been posted by a Period Close yet.
+	"""
+	if not customers:
+		return {}
+	rows = frappe.db.sql(
+		"""
+		SELECT cd.customer, SUM(cd.amount)
+		FROM `tabDay Closing Credit Detail` cd
+		JOIN `tabDay Closing` dc ON dc.name = cd.parent AND cd.parenttype = 'Day Closing'
+		JOIN `tabPetrol Pump` pp ON pp.name = dc.petrol_pump
+		WHERE pp.company = %(company)s AND cd.customer IN %(customers)s AND dc.name != %(exclude)s
+			AND (
+				dc.docstatus = 0
+				OR (
+					dc.docstatus = 1 AND dc.gl_posting_mode = 'Monthly'
+					AND NOT EXISTS (
+						SELECT 1 FROM `tabPeriod Close` pc
+						WHERE pc.docstatus = 1 AND pc.petrol_pump = dc.petrol_pump
+							AND dc.reading_date BETWEEN pc.period_start AND pc.period_end
+					)
+				)
+			)
+		GROUP BY cd.customer
+		""",
+		{"company": company, "customers": tuple(set(customers)), "exclude": exclude or ""},
+	)
+	return {customer: flt(amount) for customer, amount in rows}
+
+
+def get_credit_limits(company, customers):
+	"""Customer-level credit limits for the company: {customer: (limit, bypass)}."""
+	if not customers:
+		return {}
+	return {
+		row.parent: (flt(row.credit_limit), row.bypass_credit_limit_check)
+		for row in frappe.get_all(
+			"Customer Credit Limit",
+			filters={"parent": ["in", list(set(customers))], "parenttype": "Customer", "company": company},
+			fields=["parent", "credit_limit", "bypass_credit_limit_check"],
+		)
+		if flt(row.credit_limit) > 0
+	}
+
+
+def validate_credit_exposure(doc):
+	"""Check every credit customer on a Day Closing against their credit limit at once."""
+	credit = {}
+	for row in getattr(doc, "credit_details", []) or []:
+		if row.customer and flt(row.amount) > 0:
+			credit[row.customer] = credit.get(row.customer, 0) + flt(row.amount)
+	if not credit:
+		return
+
+	company = frappe.db.get_value("Petrol Pump", doc.petrol_pump, "company")
+	limits = get_credit_limits(company, credit)
+	customers = [c for c, (_limit, bypass) in limits.items() if not bypass]
+	if not customers:
+		return
+
+	posted = get_posted_exposure(company, customers)
+	unposted = get_unposted_credit(company, customers, exclude=doc.name)
+
+	exceeded = []
+	for customer in customers:
+		exposure = flt(posted.get(customer)) + flt(unposted.get(customer)) + credit[customer]
+		limit = limits[customer][0]
+		if exposure > limit:
+			exceeded.append(
+				f"{customer}: exposure {frappe.format_value(exposure, 'Currency')} "
+				f"exceeds limit {frappe.format_value(limit, 'Currency')}"
+			)
+	if not exceeded:
+		return
+
+	message = "Credit limit exceeded:<br>" + "<br>".join(exceeded)
+	credit_controller = frappe.db.get_single_value("Accounts Settings", "credit_controller")
+	if credit_controller and credit_controller in frappe.get_roles():
+		frappe.msgprint(message, indicator="orange")
+	else:
+		frappe.throw(message)
+
+
+def _customers_in(doc):
+	if doc.doctype == "Sales Invoice":
+		return {doc.customer}
+	if doc.doctype == "Payment Entry":
+		return {doc.party} if doc.party_type == "Customer" else set()
+	return {row.party for row in doc.get("accounts") or [] if row.party_type == "Customer" and row.party}
+
+
+def update_exposure(doc, method=None):
+	"""doc_events hook: refresh the cached balance of the customers a voucher touched once it commits.
+
+	The cache is not part of the transaction, so the customers are queued here
+	and their balances written after commit; a rollback leaves the cache as it
+	was.
+	"""
+	customers = [c for c in _customers_in(doc) if c]
+	if not customers:
+		return
+	if frappe.flags.credit_exposure_pending is None:
+		frappe.flags.credit_exposure_pending = {}
+		frappe.db.after_commit.add(refresh_pending_exposure)
+		frappe.db.after_rollback.add(discard_pending_exposure)
+	frappe.flags.credit_exposure_pending.setdefault(doc.company, set()).update(customers)
+
+
+def refresh_pending_exposure():
+	"""Write the posted balance of the cached customers queued by update_exposure."""
+	pending = frappe.flags.credit_exposure_pending
+	frappe.flags.credit_exposure_pending = None
+	cache = frappe.cache()
+	for company, customers in (pending or {}).items():
+		key = _cache_key(company)
+		cached = [c for c in customers if cache.hget(key, c) is not None]
+		for customer, balance in _posted_balances(company, cached).items():
+			cache.hset(key, customer, balance)
+
+
+def discard_pending_exposure():
+	frappe.flags.credit_exposure_pending = None
+
+
+def clear_exposure_cache(company=None):
+	companies = [company] if company else frappe.get_all("Company", pluck="name")
+	for name in companies:
+		frappe.cache().delete_value(_cache_key(name))
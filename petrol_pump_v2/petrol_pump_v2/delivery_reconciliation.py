@@ -0,0 +1,137 @@
+"""Shortage of tanker deliveries against the supplier's invoice.
+
+A Fuel Delivery records the invoiced quantity and a dip of the tank before
+and after unloading. What the tank actually received is
+
+	received = post-delivery dip - pre-delivery dip + liters sold while unloading
+
+corrected to 15 °C at the product temperature, since depots invoice standard
+liters. The shortage is invoiced minus received; beyond
+TOLERANCE_PERCENT of the invoice it is flagged Short (or Excess).
+
+Deliveries are reconciled in batches: dips entered in mm are converted with
+each tank's calibration chart, loaded once per batch, and all received
+volumes are temperature-corrected in one pass. The Fuel Delivery form
+reconciles a batch of one; the Delivery Shortage Audit recomputes a depot's
+month of deliveries in one run from the recorded dips.
+"""
+
+import frappe
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.tank_calibration import get_charts, interpolate_many
+from petrol_pump_v2.petrol_pump_v2.volume_correction import correct_volumes, measured_temperature
+
+# Transit and measurement losses within this share of the invoice are accepted
+TOLERANCE_PERCENT = 0.5
+
+WITHIN_TOLERANCE = "Within Tolerance"
+SHORT = "Short"
+EXCESS = "Excess"
+
+
+def convert_delivery_dips(deliveries):
+	"""[(pre_dip, post_dip), ...] in liters, in input order.
+
+	Dips entered in mm are converted with the tanks' calibration charts,
+	fetched once for the batch. Where a tank has no chart or a dip falls
+	outside it, the liters recorded on the delivery are kept.
+	"""
+	charts = get_charts(row.fuel_tank for row in deliveries if flt(row.pre_dip_mm) or flt(row.post_dip_mm))
+	by_tank = {}
+	for idx, row in enumerate(deliveries):
+		if row.fuel_tank in charts:
+			by_tank.setdefault(row.fuel_tank, []).append(idx)
+
+	dips = [[flt(row.pre_dip), flt(row.post_dip)] for row in deliveries]
+	for tank, indexes in by_tank.items():
+		chart_dips, volumes = charts[tank]
+		# Pre and post dips of all the tank's deliveries go through one merge
+		values = []
+		for idx in indexes:
+			values += [deliveries[idx].pre_dip_mm, deliveries[idx].post_dip_mm]
+		converted = interpolate_many(chart_dips, volumes, values)
+		for pos, idx in enumerate(indexes):
+			for side, fieldname in enumerate(("pre_dip_mm", "post_dip_mm")):
+				volume = converted[2 * pos + side]
+				if flt(deliveries[idx].get(fieldname)) and volume is not None:
+					dips[idx][side] = volume
+	return [tuple(pair) for pair in dips]
+
+
+def reconcile_deliveries(deliveries):
+	"""Received quantity and shortage of each delivery, in input order.
+
+	`deliveries` are dicts or documents with fuel_type, invoiced_qty,
+	pre_dip, post_dip, sales_during_delivery, temperature_measured and
+	temperature (dips in liters). Returns dicts with received_qty, corrected_received_qty,
+	shortage_qty, shortage_percent and status.
+	"""
+	observed = [
+		flt(row.post_dip) - flt(row.pre_dip) + flt(row.sales_during_delivery) for row in deliveries
+	]
+	corrected = correct_volumes(
+		[
+			(row.fuel_type, liters, measured_temperature(row))
+			for row, liters in zip(deliveries, observed, strict=True)
+		]
+	)
+
+	results = []
+	for row, received, standard in zip(deliveries, observed, corrected, strict=True):
+		invoiced = flt(row.invoiced_qty)
+		shortage = invoiced - standard
+		percent = shortage / invoiced * 100 if invoiced else 0.0
+		if percent > TOLERANCE_PERCENT:
+			status = SHORT
+		elif percent < -TOLERANCE_PERCENT:
+			status = EXCESS
+		else:
+			status = WITHIN_TOLERANCE
+		results.append(
+			{
+				"received_qty": received,
+				"corrected_received_qty": standard,
+				"shortage_qty": shortage,
+				"shortage_percent": percent,
+				"status": status,
+			}
+		)
+	return results
+
+
+def audit_deliveries(from_date, to_date, petrol_pump=None, supplier=None, fuel_tank=None):
+	"""Submitted deliveries of a period, reconciled again from their recorded dips.
+
+	Reads the deliveries with one query and reconciles them as one batch.
+	Each row carries the stored shortage next to the recomputed one, so
+	deliveries whose figures changed since submission (for instance after a
+	calibration chart was corrected) stand out.
+	"""
+	filters = {"docstatus": 1, "delivery_date": ["between", [from_date, to_date]]}
+	if petrol_pump:
+		filters["petrol_pump"] = petrol_pump
+	if supplier:
+		filters["supplier"] = supplier
+	if fuel_tank:
+		filters["fuel_tank"] = fuel_tank
+
+	deliveries = frappe.get_all(
+		"Fuel Delivery",
+		filters=filters,
+		fields=[
+			"name", "delivery_date", "petrol_pump", "fuel_tank", "fuel_type", "supplier",
+			"supplier_invoice_no", "invoiced_qty", "pre_dip_mm", "post_dip_mm", "pre_dip", "post_dip",
+			"sales_during_delivery", "temperature_measured", "temperature", "shortage_qty", "purchase_receipt",
+		],
+		order_by="delivery_date asc, delivery_time asc, name asc",
+	)
+	if not deliveries:
+		return []
+
+	for row, (pre_dip, post_dip) in zip(deliveries, convert_delivery_dips(deliveries), strict=True):
+		row.pre_dip, row.post_dip = pre_dip, post_dip
+	for row, result in zip(deliveries, reconcile_deliveries(deliveries), strict=True):
+		row.recorded_shortage_qty = row.shortage_qty
+		row.update(result)
+	return deliveries
@@ -2,18 +2,63 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate, now_datetime
 
+from petrol_pump_v2.petrol_pump_v2.closing_core import (
+    compute_closing,
+    fuel_types_without_rate,
+    has_backward_reading,
+)
+from petrol_pump_v2.petrol_pump_v2.meter_continuity import (
+    get_chain_heads,
+    validate_continuity,
+)
+from petrol_pump_v2.petrol_pump_v2.credit_allocation import allocate_fifo, get_open_invoices
+from petrol_pump_v2.petrol_pump_v2.credit_exposure import validate_credit_exposure
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import closing_as_of, get_rate, get_rates
+from petrol_pump_v2.petrol_pump_v2.settlement import CASH, plan_settlement
+from petrol_pump_v2.petrol_pump_v2.summarized_posting import (
+    MONTHLY,
+    SUMMARIZED,
+    get_cash_account,
+    post_summary_journal_entry,
+)
+from petrol_pump_v2.petrol_pump_v2.tank_stock import allocate_stock_issue
+from petrol_pump_v2.petrol_pump_v2.doctype.period_close.period_close import validate_period_open
+
+CLOSING_TOTAL_FIELDS = (
+    "total_liters",
+    "total_sales",
+    "credit_sales_liters",
+    "credit_amount",
+    "card_amount",
+    "total_expenses",
+    "total_supplier_payments",
+    "total_credit_collections",
+    "total_fund_transfer_effect",
+    "cash_amount",
+    "cash_in_hand",
+)
+
 class DayClosing(Document):
     def validate(self):
         """Runs on save and submit. Only basic checks here so user can save freely."""
         if not self.petrol_pump:
             return
 
+        validate_period_open(self.petrol_pump, self.reading_date, self.doctype)
         self.validate_prices()
+        # In roll-up mode the meter chain is extended by the Shift Readings
+        if self.docstatus == 0 and not self.rollup_shift_readings:
+            validate_continuity(self)
 
     def before_submit(self):
         """Heavy validations that should only block submit, not save."""
+        if self.rollup_shift_readings:
+            self.validate_shift_readings_submitted()
+        else:
+            validate_continuity(self, throw=True)
         self.validate_stock_availability()
         self.validate_credit_sales()
+        validate_credit_exposure(self)
     
     def validate_prices(self):
         """Ensure all nozzle readings have valid prices"""
@@ -68,7 +113,7 @@ class DayClosing(Document):
         # Sum nozzle sales by fuel type
         nozzle_by_fuel = {}
         for d in self.nozzle_readings or []:
-            liters = flt(d.current_reading) - flt(d.previous_reading)
+            liters = flt(d.dispensed_liters)
             if liters > 0 and d.fuel_type:
                 if d.fuel_type not in nozzle_by_fuel:
                     nozzle_by_fuel[d.fuel_type] = {"liters": 0, "amount": 0}
@@ -118,25 +163,40 @@ class DayClosing(Document):
                 "Credit and card amounts cannot exceed total sales plus credit collections."
             )
 
+    def validate_shift_readings_submitted(self):
+        """Block roll-up while any Shift Reading for the day is still a draft."""
+        drafts = frappe.get_all(
+            "Shift Reading",
+            filters={"petrol_pump": self.petrol_pump, "reading_date": self.reading_date, "docstatus": 0},
+            pluck="name",
+        )
+        if drafts:
+            frappe.throw(
+                f"Submit or delete draft Shift Readings for {self.reading_date} before closing the day: "
+                + ", ".join(drafts)
+            )
+
     def before_save(self):
-        self.calculate_readings()
-        self.calculate_credit_totals()
-        self.calculate_expense_totals()
-        self.calculate_fund_transfer_totals()
-        self.calculate_supplier_payment_totals()
-        self.calculate_credit_collection_totals()
-        self.calculate_card_totals()
-        self.calculate_cash_reconciliation()
+        if self.rollup_shift_readings:
+            self.set_nozzle_readings_from_shifts()
+        self.calculate_totals()
 
     def on_submit(self):
         try:
             self.create_stock_entry()
-            self.create_sales_invoices()
-            self.create_expense_payment_entries()
-            self.create_fund_transfer_entries()
-            self.create_supplier_payment_entries()
-            self.create_credit_collection_payment_entries()
-            self.update_nozzle_last_readings()
+            if self.gl_posting_mode == SUMMARIZED:
+                post_summary_journal_entry(self)
+            elif self.gl_posting_mode == MONTHLY:
+                # GL for the month is posted by Period Close
+                pass
+            else:
+                self.create_sales_invoices()
+                self.create_expense_payment_entries()
+                self.create_fund_transfer_entries()
+                self.create_supplier_payment_entries()
+                self.create_credit_collection_payment_entries()
+            if not self.rollup_shift_readings:
+                self.update_nozzle_last_readings()
             self.set_approval_status()
         except Exception as e:
             frappe.throw(
@@ -155,10 +215,14 @@ class DayClosing(Document):
                 f"Cash in Hand: {frappe.format_value(self.cash_in_hand, 'Currency')}"
             )
     
+    def before_cancel(self):
+        validate_period_open(self.petrol_pump, self.reading_date, self.doctype)
+
     def on_cancel(self):
         """Cancel all auto-created transactions when Day Closing is cancelled"""
         self.cancel_linked_transactions()
-        self.revert_nozzle_readings()
+        if not self.rollup_shift_readings:
+            self.revert_nozzle_readings()
     
     def set_approval_status(self):
         """Set approval status"""
@@ -172,136 +236,75 @@ class DayClosing(Document):
             cost_center = frappe.get_cached_value("Company", company, "cost_center")
         return cost_center
 
+    def set_nozzle_readings_from_shifts(self):
+        """Rebuild nozzle_readings from the day's submitted Shift Readings."""
+        rows = get_shift_rollup_rows(self.petrol_pump, self.reading_date)
+        if not rows:
+            frappe.throw(
+                f"No submitted Shift Readings found for {self.petrol_pump} on {self.reading_date}. "
+                "Submit the shifts first, or turn off Roll Up Shift Readings on the Petrol Pump."
+            )
+        self.set("nozzle_readings", rows)
+
     def get_current_rate(self, fuel_type, petrol_pump=None):
-        if not fuel_type:
-            return 0
-        pump = petrol_pump or self.petrol_pump
-        if not pump:
-            return 0
-        rate = frappe.db.sql(
-            """
-            SELECT fpd.price_per_liter 
-            FROM `tabFuel Price Detail` fpd
-            JOIN `tabFuel Price` fp ON fpd.parent = fp.name
-            WHERE fpd.fuel_type = %s AND fp.petrol_pump = %s AND fp.effective_from <= %s
-            ORDER BY fp.effective_from DESC LIMIT 1
-            """,
-            (fuel_type, pump, now_datetime()),
-        )
-        return rate[0][0] if rate else 0
+        """Rate in force at the end of this closing's reading date."""
+        return get_rate(petrol_pump or self.petrol_pump, fuel_type, closing_as_of(self.reading_date))
 
-    def calculate_readings(self):
-        total_sales = 0
-        total_liters = 0
-        for d in self.nozzle_readings:
-            d.dispensed_liters = flt(d.current_reading) - flt(d.previous_reading)
-            if not d.rate:
-                d.rate = self.get_current_rate(d.fuel_type)
-            d.amount = flt(d.dispensed_liters) * flt(d.rate)
-            total_sales += flt(d.amount)
-            total_liters += flt(d.dispensed_liters)
-        self.total_sales = total_sales
-        self.total_liters = total_liters
-
-    def calculate_expense_totals(self):
-        """Calculate total expenses from expenses child table"""
-        total_expenses = 0.0
-        for expense in getattr(self, "expenses", []) or []:
-            total_expenses += flt(getattr(expense, "amount", 0))
-        self.total_expenses = total_expenses
-
-    def calculate_card_totals(self):
-        """Calculate total card/POS amount from card_sales child table"""
-        total_card = 0.0
-        for row in getattr(self, "card_sales", []) or []:
-            total_card += flt(getattr(row, "amount", 0))
-        self.card_amount = total_card
-
-    def calculate_supplier_payment_totals(self):
-        """Calculate total supplier payments from supplier_payments child table"""
-        total = 0.0
-        for row in getattr(self, "supplier_payments", []) or []:
-            total += flt(getattr(row, "amount", 0))
-        self.total_supplier_payments = total
-
-    def calculate_fund_transfer_totals(self):
-        """Calculate net effect on cash from fund transfer table."""
-        effect = 0.0
-        for row in getattr(self, "fund_transfers", []) or []:
-            amount = flt(getattr(row, "amount", 0))
-            transfer_type = getattr(row, "transfer_type", None)
-            if transfer_type == "Withdraw":
-                effect += amount
-            elif transfer_type == "Deposit":
-                effect -= amount
-        self.total_fund_transfer_effect = effect
-
-    def calculate_credit_collection_totals(self):
-        """Calculate total credit collections from credit_collections child table"""
-        total = 0.0
-        for row in getattr(self, "credit_collections", []) or []:
-            total += flt(getattr(row, "amount", 0))
-        self.total_credit_collections = total
-
-    def calculate_cash_reconciliation(self):
-        """Auto-calculate cash and cash-in-hand.
+    def calculate_totals(self):
+        """Recompute row amounts, sales, credit, card, expense, transfer and cash totals.
 
-        Cash Amount = Total Sales - Credit - Card - Expenses - Supplier Payments + Credit Collections + Net Fund Transfer Effect
-        (net cash received today from all operations)
+        Rates are resolved once per fuel type for rows that have none, meter
+        capacities are loaded only if a reading went backwards, and the
+        arithmetic itself is done by closing_core.compute_closing.
 
+        Cash Amount = Total Sales - Credit - Card - Expenses - Supplier Payments + Credit Collections + Net Fund Transfer Effect
         Cash in Hand = Previous Cash Balance (GL) + Cash Amount
-        (closing cash position at the pump)
         """
-        self.cash_amount = (
-            flt(self.total_sales)
-            - flt(self.credit_amount)
-            - flt(self.card_amount)
-            - flt(self.total_expenses)
-            - flt(self.total_supplier_payments)
-            + flt(self.total_credit_collections)
-            + flt(self.total_fund_transfer_effect)
+        readings = self.nozzle_readings or []
+        credit = getattr(self, "credit_details", []) or []
+        # Rolled-up rows already carry the liters summed across shifts
+        recompute_liters = not self.rollup_shift_readings
+
+        meter_capacities = {}
+        if recompute_liters and has_backward_reading(readings):
+            meter_capacities = {
+                nozzle: head.meter_capacity for nozzle, head in get_chain_heads(self.petrol_pump).items()
+            }
+        rates = get_rates(
+            self.petrol_pump, fuel_types_without_rate(readings, credit), closing_as_of(self.reading_date)
         )
 
-        self.cash_in_hand = flt(self.previous_cash) + flt(self.cash_amount)
-
-    def calculate_credit_totals(self):
-        """Aggregate credit liters and amount from credit_details child table.
-        
-        Also auto-fills rate and calculates amount for each row if not set.
-
-        - Auto-fills rate from active fuel price if fuel_type is set
-        - Auto-calculates amount = liters × rate for each row
-        - Sums liters and amount across all rows
-        - Writes back to credit_sales_liters and credit_amount fields on the parent
-        """
-        total_liters = 0.0
-        total_amount = 0.0
-
-        for d in getattr(self, "credit_details", []) or []:
-            # Auto-fill rate if fuel_type is set but rate is missing
-            if getattr(d, "fuel_type", None) and not getattr(d, "rate", None):
-                rate = self.get_current_rate(getattr(d, "fuel_type"))
-                if rate:
-                    d.rate = rate
-            
-            # Auto-calculate amount if liters and rate are available
-            liters = flt(getattr(d, "liters", 0))
-            rate = flt(getattr(d, "rate", 0))
-            if liters > 0 and rate > 0:
-                d.amount = liters * rate
-            
-            total_liters += liters
-            total_amount += flt(getattr(d, "amount", 0))
+        totals = compute_closing(
+            readings=readings,
+            credit=credit,
+            card=getattr(self, "card_sales", []),
+            expenses=getattr(self, "expenses", []),
+            transfers=getattr(self, "fund_transfers", []),
+            supplier_payments=getattr(self, "supplier_payments", []),
+            collections=getattr(self, "credit_collections", []),
+            rates=rates,
+            meter_capacities=meter_capacities,
+            previous_cash=self.previous_cash,
+            recompute_liters=recompute_liters,
+        )
 
-        self.credit_sales_liters = total_liters
-        self.credit_amount = total_amount
+        for d, liters, rate, amount in zip(
+            readings, totals["reading_liters"], totals["reading_rates"], totals["reading_amounts"]
+        ):
+            d.dispensed_liters = liters
+            d.rate = rate
+            d.amount = amount
+        for d, rate, amount in zip(credit, totals["credit_rates"], totals["credit_amounts"]):
+            if rate:
+                d.rate = rate
+            d.amount = amount
+        for field in CLOSING_TOTAL_FIELDS:
+            self.set(field, totals[field])
 
     def create_stock_entry(self):
-        fuel_consumption = {}
-        for d in self.nozzle_readings:
-            if d.dispensed_liters > 0:
-                fuel_consumption[d.fuel_type] = fuel_consumption.get(d.fuel_type, 0) + d.dispensed_liters
-        if not fuel_consumption:
+        # One line per tank warehouse and fuel type, from the nozzles' tanks
+        issues = allocate_stock_issue(self.petrol_pump, self.nozzle_readings)
+        if not issues:
             return
         cost_center = self.get_pump_cost_center()
         se = frappe.new_doc("Stock Entry")
@@ -310,24 +313,18 @@ class DayClosing(Document):
         se.company = frappe.db.get_value("Petrol Pump", self.petrol_pump, "company")
         se.set_posting_time = 1
         se.posting_date = self.reading_date or nowdate()
-        for fuel_type, liters in fuel_consumption.items():
-            warehouse = frappe.db.get_value(
-                "Fuel Tank",
-                {"petrol_pump": self.petrol_pump, "fuel_type": fuel_type},
-                "warehouse",
-            )
-            if warehouse:
-                # Get actual valuation rate for proper COGS tracking
-                valuation_rate = self.get_valuation_rate(fuel_type, warehouse)
-                
-                se.append("items", {
-                    "s_warehouse": warehouse,
-                    "item_code": fuel_type,
-                    "qty": liters,
-                    "basic_rate": valuation_rate,
-                    "conversion_factor": 1.0,
-                    "cost_center": cost_center,
-                })
+        for (warehouse, fuel_type), liters in issues.items():
+            # Get actual valuation rate for proper COGS tracking
+            valuation_rate = self.get_valuation_rate(fuel_type, warehouse)
+
+            se.append("items", {
+                "s_warehouse": warehouse,
+                "item_code": fuel_type,
+                "qty": liters,
+                "basic_rate": valuation_rate,
+                "conversion_factor": 1.0,
+                "cost_center": cost_center,
+            })
         if se.items:
             se.insert()
             se.submit()
@@ -410,6 +407,7 @@ class DayClosing(Document):
         cost_center = self.get_pump_cost_center()
         
         # Create Sales Invoice for cash sales
+        cash_invoice = None
         if cash_sales_amount > 0 and cash_fuel_sales:
             cash_customer = self.get_or_create_cash_customer(company)
             si = frappe.new_doc("Sales Invoice")
@@ -435,6 +433,7 @@ class DayClosing(Document):
             if si.items:
                 si.insert()
                 si.submit()
+                cash_invoice = si
                 created_invoices.append(si.name)
                 # Store first cash invoice reference for cancellation handling
                 if not self.sales_invoice_ref:
@@ -479,10 +478,8 @@ class DayClosing(Document):
         
         # Create Payment Entries against the cash customer Sales Invoice
         # Cash portion goes to cash account, card portions go to respective bank accounts
-        if cash_sales_amount > 0 and created_invoices:
-            cash_invoice_name = created_invoices[0]
-            cash_invoice_doc = frappe.get_doc("Sales Invoice", cash_invoice_name)
-            self.create_collection_payment_entries(cash_invoice_doc, company)
+        if cash_sales_amount > 0 and cash_invoice:
+            self.create_collection_payment_entries(cash_invoice, company)
     
     def get_or_create_cash_customer(self, company):
         """Get or create a default Cash Customer"""
@@ -504,19 +501,18 @@ class DayClosing(Document):
         return customer_name
     
     def create_collection_payment_entries(self, sales_invoice, company):
-        """Create Payment Entries for cash and card collections against the Cash SI.
-
-        Strategy: use the SI's actual outstanding as the truth.
-        1. Card PEs are created first (exact amounts per bank).
-        2. Cash PE gets whatever outstanding remains on the SI.
-        This avoids rounding mismatches between our totals and the SI grand_total.
+        """Settle the Cash SI with card and cash collections.
+
+        The split is planned in memory from the SI's outstanding amount: each
+        card bank gets its exact amount, cash gets whatever remains, so rounding
+        on the SI grand_total always lands on cash. Account lookups are done once
+        for all banks. The receipt is posted as one Journal Entry against the SI
+        with a debit line per bank / cash account. One Payment Entry per bank is
+        used only when an account is not in company currency.
         """
         company_currency = frappe.db.get_value("Company", company, "default_currency")
         default_receivable_account = frappe.get_cached_value("Company", company, "default_receivable_account")
 
-        created_pe_names = []
-
-        # --- 1. Card/POS Payment Entries first (exact amounts per bank) ---
         card_by_bank = {}
         for row in getattr(self, "card_sales", []) or []:
             if not row.bank_account or flt(row.amount) <= 0:
@@ -525,54 +521,62 @@ class DayClosing(Document):
                 card_by_bank[row.bank_account] = 0
             card_by_bank[row.bank_account] += flt(row.amount)
 
-        for bank_account_name, card_amount in card_by_bank.items():
-            if card_amount <= 0:
-                continue
-
-            outstanding = self._get_si_outstanding(sales_invoice.name)
-            if outstanding <= 0:
-                break
-
-            gl_account = frappe.db.get_value("Bank Account", bank_account_name, "account")
-            if not gl_account:
+        bank_details = {}
+        if card_by_bank:
+            bank_details = {
+                b.name: b
+                for b in frappe.get_all(
+                    "Bank Account",
+                    filters={"name": ["in", list(card_by_bank)]},
+                    fields=["name", "account", "bank"],
+                )
+            }
+        for bank_account_name in card_by_bank:
+            if not (bank_details.get(bank_account_name) or {}).get("account"):
                 frappe.throw(
                     f"Bank Account '<b>{bank_account_name}</b>' does not have a linked GL Account. "
                     "Please set the Account field on the Bank Account document."
                 )
 
-            mode_of_payment = frappe.db.get_value(
-                "Mode of Payment", {"type": "Bank"}, "name"
-            ) or "Bank Draft"
+        outstanding = flt(sales_invoice.outstanding_amount)
+        plan = plan_settlement(outstanding, card_by_bank)
+        if not plan:
+            return
 
-            allocate = min(flt(card_amount), outstanding)
-            pe = self._make_payment_entry(
-                sales_invoice_name=sales_invoice.name,
-                customer=sales_invoice.customer,
-                grand_total=flt(sales_invoice.grand_total),
-                company=company,
-                currency=company_currency,
-                paid_from=default_receivable_account,
-                paid_to=gl_account,
-                amount=allocate,
-                mode_of_payment=mode_of_payment,
+        cash_account = get_cash_account(company)
+        paid_to = {
+            bank_account: bank_details[bank_account].account if bank_account is not CASH else cash_account
+            for bank_account, _amount in plan
+        }
+
+        account_currencies = dict(
+            frappe.get_all(
+                "Account",
+                filters={"name": ["in", list(set(paid_to.values()))]},
+                fields=["name", "account_currency"],
+                as_list=True,
             )
-            if pe:
-                created_pe_names.append(pe.name)
-                bank_label = frappe.db.get_value("Bank Account", bank_account_name, "bank") or bank_account_name
-                frappe.msgprint(f"Payment Entry {pe.name} created for card ({bank_label}): {allocate}")
-
-        # --- 2. Cash PE gets whatever is left on the SI ---
-        outstanding = self._get_si_outstanding(sales_invoice.name)
-        if outstanding > 0:
-            mode_of_payment = frappe.db.get_value("Mode of Payment", {"type": "Cash"}, "name") or "Cash"
-            cash_account = frappe.db.get_value(
-                "Mode of Payment Account",
-                {"parent": mode_of_payment, "company": company},
-                "default_account"
+        )
+        per_bank = frappe.flags.settlement_per_bank or any(
+            account_currencies.get(account, company_currency) != company_currency
+            for account in paid_to.values()
+        )
+
+        if not per_bank:
+            je = self._make_settlement_journal_entry(
+                sales_invoice, company, default_receivable_account, plan, paid_to
             )
-            if not cash_account:
-                cash_account = frappe.get_cached_value("Company", company, "default_cash_account")
+            self.db_set('settlement_entry_ref', je.name)
+            frappe.msgprint(
+                f"Journal Entry {je.name} created for cash and card collections: {flt(sales_invoice.outstanding_amount)}"
+            )
+            return
+
+        bank_mode_of_payment = frappe.db.get_value("Mode of Payment", {"type": "Bank"}, "name") or "Bank Draft"
+        cash_mode_of_payment = frappe.db.get_value("Mode of Payment", {"type": "Cash"}, "name") or "Cash"
 
+        created_pe_names = []
+        for bank_account_name, allocate in plan:
             pe = self._make_payment_entry(
                 sales_invoice_name=sales_invoice.name,
                 customer=sales_invoice.customer,
@@ -580,27 +584,63 @@ class DayClosing(Document):
                 company=company,
                 currency=company_currency,
                 paid_from=default_receivable_account,
-                paid_to=cash_account,
-                amount=outstanding,
-                mode_of_payment=mode_of_payment,
+                paid_to=paid_to[bank_account_name],
+                amount=allocate,
+                mode_of_payment=cash_mode_of_payment if bank_account_name is CASH else bank_mode_of_payment,
+                outstanding=outstanding,
             )
+            outstanding = flt(outstanding - allocate, 2)
             if pe:
                 created_pe_names.append(pe.name)
-                frappe.msgprint(f"Payment Entry {pe.name} created for cash: {outstanding}")
+                if bank_account_name is CASH:
+                    frappe.msgprint(f"Payment Entry {pe.name} created for cash: {allocate}")
+                else:
+                    bank_label = bank_details[bank_account_name].bank or bank_account_name
+                    frappe.msgprint(f"Payment Entry {pe.name} created for card ({bank_label}): {allocate}")
 
         if created_pe_names:
             self.db_set('payment_entry_ref', ', '.join(created_pe_names))
 
-    def _get_si_outstanding(self, si_name):
-        """Get fresh outstanding amount from DB."""
-        return flt(frappe.db.get_value("Sales Invoice", si_name, "outstanding_amount"))
+    def _make_settlement_journal_entry(self, sales_invoice, company, receivable_account, plan, paid_to):
+        """One receipt against the SI: Dr each bank / cash account, Cr the customer receivable."""
+        cost_center = self.get_pump_cost_center()
+        je = frappe.new_doc("Journal Entry")
+        je.voucher_type = "Journal Entry"
+        je.company = company
+        je.posting_date = self.reading_date or nowdate()
+        je.set_posting_time = 1
+        je.cheque_no = self.name
+        je.cheque_date = self.reading_date or nowdate()
+        je.user_remark = f"Cash and card collections from Day Closing {self.name}"
+
+        total = 0
+        for bank_account_name, amount in plan:
+            je.append("accounts", {
+                "account": paid_to[bank_account_name],
+                "debit_in_account_currency": amount,
+                "cost_center": cost_center,
+            })
+            total += amount
+
+        je.append("accounts", {
+            "account": receivable_account,
+            "party_type": "Customer",
+            "party": sales_invoice.customer,
+            "credit_in_account_currency": flt(total, 2),
+            "reference_type": "Sales Invoice",
+            "reference_name": sales_invoice.name,
+            "cost_center": cost_center,
+        })
+
+        je.insert()
+        je.submit()
+        return je
 
     def _make_payment_entry(self, sales_invoice_name, customer, grand_total,
                             company, currency, paid_from, paid_to, amount,
-                            mode_of_payment):
+                            mode_of_payment, outstanding):
         """Create and submit a single Payment Entry."""
-        outstanding = self._get_si_outstanding(sales_invoice_name)
-        allocate = min(flt(amount), outstanding)
+        allocate = min(flt(amount), flt(outstanding))
 
         if allocate <= 0:
             return None
@@ -631,7 +671,7 @@ class DayClosing(Document):
             "reference_doctype": "Sales Invoice",
             "reference_name": sales_invoice_name,
             "total_amount": flt(grand_total),
-            "outstanding_amount": outstanding,
+            "outstanding_amount": flt(outstanding),
             "allocated_amount": flt(allocate),
         })
 
@@ -908,6 +948,8 @@ class DayClosing(Document):
 
         When a credit customer pays back old dues, we receive cash:
         Debit Cash, Credit Receivable (reduces customer outstanding).
+        Each collection is allocated against the customer's oldest outstanding
+        Sales Invoices; any excess stays on the Payment Entry as an advance.
         """
         if not getattr(self, "credit_collections", None) or not self.credit_collections:
             return
@@ -920,19 +962,18 @@ class DayClosing(Document):
         default_receivable_account = frappe.get_cached_value("Company", company, "default_receivable_account")
 
         mode_of_payment = frappe.db.get_value("Mode of Payment", {"type": "Cash"}, "name") or "Cash"
-        cash_account = frappe.db.get_value(
-            "Mode of Payment Account",
-            {"parent": mode_of_payment, "company": company},
-            "default_account"
-        )
-        if not cash_account:
-            cash_account = frappe.get_cached_value("Company", company, "default_cash_account")
+        cash_account = get_cash_account(company)
 
         if not cash_account:
             frappe.throw("Cash account not found. Please configure Mode of Payment or Company default cash account.")
 
         cost_center = self.get_pump_cost_center()
         created_pe_names = []
+        open_invoices = get_open_invoices(
+            company,
+            [row.customer for row in self.credit_collections],
+            default_receivable_account,
+        )
 
         for row in self.credit_collections:
             if not row.customer or flt(row.amount) <= 0:
@@ -959,13 +1000,26 @@ class DayClosing(Document):
             pe.reference_no = self.name
             pe.reference_date = self.reading_date or nowdate()
 
+            allocations, unallocated = allocate_fifo(row.amount, open_invoices.get(row.customer, []))
+            for invoice, allocated, outstanding in allocations:
+                pe.append("references", {
+                    "reference_doctype": "Sales Invoice",
+                    "reference_name": invoice.name,
+                    "total_amount": flt(invoice.grand_total),
+                    "outstanding_amount": outstanding,
+                    "allocated_amount": allocated,
+                })
+
             pe.insert(ignore_permissions=True)
             pe.submit()
             created_pe_names.append(pe.name)
 
             desc_text = f" ({row.description})" if row.description else ""
+            alloc_text = f", {len(allocations)} invoice(s) settled" if allocations else ""
+            advance_text = f", {unallocated} unallocated" if allocations and unallocated else ""
             frappe.msgprint(
-                f"Payment Entry {pe.name} created for credit collection from {row.customer}: {flt(row.amount)}{desc_text}"
+                f"Payment Entry {pe.name} created for credit collection from {row.customer}: "
+                f"{flt(row.amount)}{desc_text}{alloc_text}{advance_text}"
             )
 
         if created_pe_names:
@@ -976,7 +1030,7 @@ class DayClosing(Document):
 
         Mirrors the behaviour in Shift Reading:
         - Match by (petrol_pump, nozzle_name)
-        - Write current_reading into Nozzle.last_reading
+        - Write current_reading into Nozzle.last_reading (the meter chain head)
         """
         for nozzle_reading in self.nozzle_readings or []:
             nozzle_name = getattr(nozzle_reading, "nozzle_number", None)
@@ -992,8 +1046,10 @@ class DayClosing(Document):
                 frappe.db.set_value(
                     "Nozzle",
                     nozzle_docname,
-                    "last_reading",
-                    flt(getattr(nozzle_reading, "current_reading", 0)),
+                    {
+                        "last_reading": flt(getattr(nozzle_reading, "current_reading", 0)),
+                        "last_reading_date": self.reading_date,
+                    },
                 )
     
     def revert_nozzle_readings(self):
@@ -1009,17 +1065,31 @@ class DayClosing(Document):
                 "name",
             )
             if nozzle_docname:
+                # Date of the reading before this one is not kept; clearing it
+                # only skips the out-of-order check for the next closing
                 frappe.db.set_value(
                     "Nozzle",
                     nozzle_docname,
-                    "last_reading",
-                    flt(getattr(nozzle_reading, "previous_reading", 0)),
+                    {
+                        "last_reading": flt(getattr(nozzle_reading, "previous_reading", 0)),
+                        "last_reading_date": None,
+                    },
                 )
         frappe.msgprint("Nozzle readings reverted to previous values")
     
     def cancel_linked_transactions(self):
         """Cancel all auto-created transactions (Stock Entry, Sales Invoice, Payment Entry, Expense Payment Entries)"""
         errors = []
+
+        # Cancel the summarized-mode Journal Entry
+        if getattr(self, "summary_journal_entry_ref", None):
+            try:
+                je = frappe.get_doc("Journal Entry", self.summary_journal_entry_ref)
+                if je.docstatus == 1:
+                    je.cancel()
+                    frappe.msgprint(f"Summary Journal Entry {self.summary_journal_entry_ref} cancelled")
+            except Exception as e:
+                errors.append(f"Summary Journal Entry {self.summary_journal_entry_ref}: {str(e)}")
         
         # Cancel Credit Collection Payment Entries first
         if getattr(self, "credit_collection_entries_ref", None):
@@ -1069,6 +1139,16 @@ class DayClosing(Document):
                 except Exception as e:
                     errors.append(f"Fund Transfer Journal Entry {transfer_ref}: {str(e)}")
         
+        # Cancel the cash + card settlement Journal Entry - must be done before Sales Invoice
+        if getattr(self, "settlement_entry_ref", None):
+            try:
+                je = frappe.get_doc("Journal Entry", self.settlement_entry_ref)
+                if je.docstatus == 1:
+                    je.cancel()
+                    frappe.msgprint(f"Settlement Journal Entry {self.settlement_entry_ref} cancelled")
+            except Exception as e:
+                errors.append(f"Settlement Journal Entry {self.settlement_entry_ref}: {str(e)}")
+
         # Cancel Payment Entries (cash + card collections) - must be done before Sales Invoice
         if self.payment_entry_ref:
             pe_refs = [ref.strip() for ref in str(self.payment_entry_ref).split(',')]
@@ -1107,10 +1187,12 @@ class DayClosing(Document):
         self.db_set('stock_entry_ref', None)
         self.db_set('sales_invoice_ref', None)
         self.db_set('payment_entry_ref', None)
+        self.db_set('settlement_entry_ref', None)
         self.db_set('expense_payment_entries_ref', None)
         self.db_set('fund_transfer_entries_ref', None)
         self.db_set('supplier_payment_entries_ref', None)
         self.db_set('credit_collection_entries_ref', None)
+        self.db_set('summary_journal_entry_ref', None)
 
         if errors:
             frappe.msgprint(
@@ -1123,31 +1205,64 @@ class DayClosing(Document):
 
 @frappe.whitelist()
 def get_current_fuel_rate(fuel_type: str, petrol_pump: str = None, reading_date: str = None):
-    """Get current active fuel price rate for a fuel type at a specific petrol pump"""
+    """Fuel price for a fuel type at a petrol pump, as of the end of reading_date (default: now)"""
     if not fuel_type or not petrol_pump:
         return 0
-    
-    from frappe.utils import now_datetime, getdate
-    if reading_date:
-        effective_date = getdate(reading_date)
-    else:
-        effective_date = now_datetime()
-    
-    rate = frappe.db.sql(
+    return get_rate(petrol_pump, fuel_type, closing_as_of(reading_date))
+
+def get_shift_rollup_rows(petrol_pump, reading_date):
+    """Aggregate the day's submitted Shift Readings into one row per nozzle.
+
+    A single grouped query returns, per nozzle, the first shift's opening
+    reading, the last shift's closing reading and the summed liters and
+    amounts (so rollovers inside a shift are already accounted for). Rate is
+    the liter-weighted average across shifts, which keeps amount exact when
+    the price changed mid-day.
+    """
+    rows = frappe.db.sql(
         """
-        SELECT fpd.price_per_liter 
-        FROM `tabFuel Price Detail` fpd
-        JOIN `tabFuel Price` fp ON fpd.parent = fp.name
-        WHERE fpd.fuel_type = %s AND fp.petrol_pump = %s AND fp.effective_from <= %s
-        ORDER BY fp.effective_from DESC LIMIT 1
+        SELECT
+            nrd.nozzle_number,
+            MAX(nrd.fuel_type) AS fuel_type,
+            SUBSTRING_INDEX(
+                GROUP_CONCAT(nrd.previous_reading ORDER BY sr.creation, nrd.idx SEPARATOR '|'), '|', 1
+            ) AS previous_reading,
+            SUBSTRING_INDEX(
+                GROUP_CONCAT(nrd.current_reading ORDER BY sr.creation, nrd.idx SEPARATOR '|'), '|', -1
+            ) AS current_reading,
+            SUM(nrd.dispensed_liters) AS dispensed_liters,
+            SUM(nrd.amount) AS amount
+        FROM `tabShift Reading` sr
+        JOIN `tabNozzle Reading Detail` nrd
+            ON nrd.parent = sr.name AND nrd.parenttype = 'Shift Reading'
+        WHERE sr.petrol_pump = %s AND sr.reading_date = %s AND sr.docstatus = 1
+        GROUP BY nrd.nozzle_number
+        ORDER BY MIN(nrd.idx)
         """,
-        (fuel_type, petrol_pump, effective_date),
+        (petrol_pump, reading_date),
+        as_dict=True,
     )
-    return rate[0][0] if rate and rate[0] else 0
+
+    result = []
+    for r in rows:
+        liters = flt(r.dispensed_liters)
+        result.append({
+            "nozzle_number": r.nozzle_number,
+            "fuel_type": r.fuel_type,
+            "previous_reading": flt(r.previous_reading),
+            "current_reading": flt(r.current_reading),
+            "dispensed_liters": liters,
+            "rate": flt(r.amount) / liters if liters else 0,
+            "amount": flt(r.amount),
+        })
+    return result
 
 @frappe.whitelist()
 def get_active_nozzles_for_day_closing(petrol_pump: str, reading_date: str = None):
-    """Get active nozzles with previous reading from last Day Closing or Nozzle.last_reading"""
+    """Get active nozzles with previous reading from last Day Closing or Nozzle.last_reading.
+
+    For pumps that roll up Shift Readings, returns the aggregated shift rows instead.
+    """
     rows = []
     if not petrol_pump:
         return rows
@@ -1157,6 +1272,9 @@ def get_active_nozzles_for_day_closing(petrol_pump: str, reading_date: str = Non
         reading_date_obj = getdate(reading_date)
     else:
         reading_date_obj = getdate(nowdate())
+
+    if frappe.db.get_value("Petrol Pump", petrol_pump, "rollup_shift_readings"):
+        return get_shift_rollup_rows(petrol_pump, reading_date_obj)
     
     # Get all active nozzles
     nozzles = frappe.get_all(
@@ -1202,7 +1320,7 @@ def get_active_nozzles_for_day_closing(petrol_pump: str, reading_date: str = Non
             "fuel_type": n.fuel_type,
             "previous_reading": previous_reading,
             "current_reading": 0,
-            "rate": DayClosing.get_current_rate(DayClosing, n.fuel_type, petrol_pump),
+            "rate": get_rate(petrol_pump, n.fuel_type, closing_as_of(reading_date)),
         })
     
     return rows
@@ -1320,4 +1438,24 @@ def get_previous_cash(petrol_pump: str, reading_date: str = None):
         WHERE {conditions}
     """.format(conditions=conditions), params)
 
-    return flt(balance[0][0]) if balance else 0
+    return (flt(balance[0][0]) if balance else 0) + get_unposted_monthly_cash(petrol_pump, reading_date_obj)
+
+
+def get_unposted_monthly_cash(petrol_pump, reading_date):
+    """Net cash of Monthly-mode Day Closings before reading_date not yet in the GL.
+
+    Monthly closings post nothing until their Period Close is submitted, so
+    while the period is open their cash is taken from the stored totals.
+    """
+    unposted = frappe.db.sql("""
+        SELECT COALESCE(SUM(dc.cash_amount), 0)
+        FROM `tabDay Closing` dc
+        WHERE dc.docstatus = 1 AND dc.petrol_pump = %(petrol_pump)s
+            AND dc.gl_posting_mode = %(monthly)s AND dc.reading_date < %(reading_date)s
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabPeriod Close` pc
+                WHERE pc.docstatus = 1 AND pc.petrol_pump = dc.petrol_pump
+                    AND dc.reading_date BETWEEN pc.period_start AND pc.period_end
+            )
+    """, {"petrol_pump": petrol_pump, "monthly": MONTHLY, "reading_date": reading_date})
+    return flt(unposted[0][0]) if unposted else 0
@@ -1,7 +1,9 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate
-from erpnext.stock.utils import get_stock_balance
+
+from petrol_pump_v2.petrol_pump_v2.tank_stock import get_tank_stock, stock_as_of
+from petrol_pump_v2.petrol_pump_v2.volume_correction import correct_volumes, measured_temperature
 
 class DipReading(Document):
     def before_save(self):
@@ -18,17 +20,13 @@ class DipReading(Document):
     def calculate_difference(self):
         """Calculate difference between physical dip and system stock"""
         if self.fuel_tank:
-            # Get system stock from warehouse using ERPNext utility
-            tank_doc = frappe.get_doc("Fuel Tank", self.fuel_tank)
-            if tank_doc.warehouse and tank_doc.fuel_type:
-                self.system_stock = get_stock_balance(
-                    item_code=tank_doc.fuel_type,
-                    warehouse=tank_doc.warehouse,
-                    posting_date=self.reading_date or nowdate()
-                )
-            else:
-                self.system_stock = 0
-            self.difference = flt(self.measured_dip) - flt(self.system_stock)
+            # System stock of the tank's warehouse as of the reading date, one query
+            tank = get_tank_stock(tanks=[self.fuel_tank], as_of=stock_as_of(self.reading_date))
+            self.system_stock = flt(tank[0].qty) if tank else 0
+            # Compare at 15 °C so temperature swings do not show up as variance
+            fuel_type = tank[0].fuel_type if tank else None
+            self.corrected_dip = correct_volumes([(fuel_type, self.measured_dip, measured_temperature(self))])[0]
+            self.difference = flt(self.corrected_dip) - flt(self.system_stock)
     
     def create_stock_reconciliation(self):
         """Create Stock Reconciliation for variance (proper method as per blueprint)"""
@@ -59,7 +57,7 @@ class DipReading(Document):
         stock_recon.append("items", {
             "item_code": tank_doc.fuel_type,
             "warehouse": tank_doc.warehouse,
-            "qty": flt(self.measured_dip),  # Set to actual measured quantity
+            "qty": flt(self.measured_dip),  # Set to actual measured quantity; the 15 °C figure is only for the variance
             "valuation_rate": valuation_rate,
             "current_qty": flt(self.system_stock),
             "current_valuation_rate": valuation_rate
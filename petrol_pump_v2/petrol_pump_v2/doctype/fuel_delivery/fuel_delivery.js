@@ -0,0 +1,18 @@
+frappe.ui.form.on('Fuel Delivery', {
+	setup(frm) {
+		frm.set_query('fuel_tank', function () {
+			return { filters: { petrol_pump: frm.doc.petrol_pump } };
+		});
+	},
+
+	refresh(frm) {
+		if (frm.doc.status) {
+			const colors = { 'Within Tolerance': 'green', 'Short': 'red', 'Excess': 'orange' };
+			frm.page.set_indicator(__(frm.doc.status), colors[frm.doc.status]);
+		}
+	},
+
+	petrol_pump(frm) {
+		if (frm.doc.fuel_tank) frm.set_value('fuel_tank', '');
+	}
+});
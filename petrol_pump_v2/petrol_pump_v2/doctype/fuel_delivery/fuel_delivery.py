@@ -0,0 +1,91 @@
+# Copyright (c) 2026, solitive and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.delivery_reconciliation import WITHIN_TOLERANCE, reconcile_deliveries
+from petrol_pump_v2.petrol_pump_v2.tank_calibration import dips_to_liters
+
+
+class FuelDelivery(Document):
+	"""A tanker delivery into one Fuel Tank, checked against the supplier's invoice.
+
+	On submit the quantity the tank actually received, at 15 °C, is taken
+	into stock with a Purchase Receipt into the tank's warehouse, so dip
+	variances and the wet-stock reconciliation see the delivery as a
+	receipt rather than an unexplained gain. The shortage against the
+	invoice stays on the delivery for the supplier claim.
+	"""
+
+	def validate(self):
+		tank = frappe.db.get_value(
+			"Fuel Tank", self.fuel_tank, ["petrol_pump", "fuel_type", "warehouse", "capacity"], as_dict=True
+		)
+		if tank.petrol_pump != self.petrol_pump:
+			frappe.throw(f"Fuel Tank {self.fuel_tank} does not belong to Petrol Pump {self.petrol_pump}")
+		if not tank.warehouse:
+			frappe.throw(f"Fuel Tank {self.fuel_tank} does not have a warehouse configured")
+		self.fuel_type = tank.fuel_type
+		if flt(self.invoiced_qty) <= 0:
+			frappe.throw("Invoiced Qty must be greater than zero")
+
+		self.convert_dips()
+		if flt(self.post_dip) <= flt(self.pre_dip):
+			frappe.throw("Post-delivery dip must be higher than the pre-delivery dip")
+		if tank.capacity and flt(self.post_dip) > flt(tank.capacity):
+			frappe.throw(
+				f"Post-delivery dip of {flt(self.post_dip):g} L exceeds the capacity of Fuel Tank "
+				f"{self.fuel_tank} ({flt(tank.capacity):g} L)"
+			)
+		self.update(reconcile_deliveries([self])[0])
+
+	def convert_dips(self):
+		"""Liters of the dips entered in mm, from the tank's calibration chart in one pass."""
+		fields = [fieldname for fieldname in ("pre_dip", "post_dip") if flt(self.get(f"{fieldname}_mm")) > 0]
+		if not fields:
+			return
+		liters = dips_to_liters([(self.fuel_tank, self.get(f"{fieldname}_mm")) for fieldname in fields])
+		for fieldname, volume in zip(fields, liters, strict=True):
+			self.set(fieldname, volume)
+
+	def on_submit(self):
+		self.create_purchase_receipt()
+		if self.status != WITHIN_TOLERANCE:
+			frappe.msgprint(
+				f"Delivery is {self.status.lower()} by {abs(flt(self.shortage_qty)):.2f} L "
+				f"({abs(flt(self.shortage_percent)):.2f}% of invoice)",
+				indicator="orange",
+			)
+
+	def on_cancel(self):
+		self.cancel_purchase_receipt()
+
+	def create_purchase_receipt(self):
+		"""Receive the standard liters delivered into the tank's warehouse."""
+		receipt = frappe.new_doc("Purchase Receipt")
+		receipt.supplier = self.supplier
+		receipt.company = frappe.db.get_value("Petrol Pump", self.petrol_pump, "company")
+		receipt.set_posting_time = 1
+		receipt.posting_date = self.delivery_date
+		receipt.posting_time = self.delivery_time
+		receipt.supplier_delivery_note = self.supplier_invoice_no
+		receipt.append("items", {
+			"item_code": self.fuel_type,
+			"warehouse": frappe.db.get_value("Fuel Tank", self.fuel_tank, "warehouse"),
+			"qty": flt(self.corrected_received_qty),
+			"rate": flt(self.rate),
+			"conversion_factor": 1.0,
+		})
+		receipt.insert()
+		receipt.submit()
+		self.db_set("purchase_receipt", receipt.name)
+
+	def cancel_purchase_receipt(self):
+		if not self.purchase_receipt:
+			return
+		receipt = frappe.get_doc("Purchase Receipt", self.purchase_receipt)
+		if receipt.docstatus == 1:
+			receipt.cancel()
+			frappe.msgprint(f"Purchase Receipt {self.purchase_receipt} cancelled")
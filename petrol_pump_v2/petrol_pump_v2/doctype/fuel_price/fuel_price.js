@@ -1,4 +1,19 @@
 frappe.ui.form.on('Fuel Price', {
+	refresh(frm) {
+		if (frm.is_new() || !frm.doc.petrol_pump) return;
+
+		frm.add_custom_button(__('Re-price Draft Closings'), function () {
+			frappe.call({
+				method: 'petrol_pump_v2.petrol_pump_v2.fuel_pricing.reprice_drafts',
+				args: {
+					petrol_pump: frm.doc.petrol_pump,
+					from_date: frm.doc.effective_from
+				},
+				freeze: true
+			});
+		});
+	},
+
 	petrol_pump(frm) {
 		if (!frm.doc.petrol_pump) return;
 
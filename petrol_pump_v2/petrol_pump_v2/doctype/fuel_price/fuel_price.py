@@ -1,13 +1,23 @@
 import frappe
 from frappe.model.document import Document
 
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import apply_activation, clear_price_cache
+
 
 class FuelPrice(Document):
     def before_save(self):
-        """Deactivate other active Fuel Price records for the same petrol pump"""
-        if self.is_active:
-            frappe.db.sql("""
-                UPDATE `tabFuel Price`
-                SET is_active = 0
-                WHERE petrol_pump = %s AND name != %s AND is_active = 1
-            """, (self.petrol_pump, self.name))
+        apply_activation(self)
+
+    def on_update(self):
+        clear_price_cache(self.petrol_pump)
+        before = self.get_doc_before_save()
+        if before and before.petrol_pump != self.petrol_pump:
+            clear_price_cache(before.petrol_pump)
+
+    def on_trash(self):
+        clear_price_cache(self.petrol_pump)
+
+
+def on_doctype_update():
+    frappe.db.add_index("Fuel Price", ["pending_activation", "effective_from"])
+    frappe.db.add_index("Fuel Price", ["petrol_pump", "is_active"])
@@ -1,7 +1,8 @@
 import frappe
 from frappe.model.document import Document
-from frappe.utils import flt
-from erpnext.stock.utils import get_stock_balance
+from frappe.utils import now_datetime
+
+from petrol_pump_v2.petrol_pump_v2.tank_stock import clear_tank_keys_cache, get_ledger_balance
 
 class FuelTank(Document):
     def validate(self):
@@ -86,23 +87,20 @@ class FuelTank(Document):
                 )
     
     def update_current_stock(self):
-        """Update current stock from warehouse bin with proper error handling"""
+        """Update current stock and value from the stock ledger with proper error handling"""
         if not self.warehouse or not self.fuel_type:
             self.current_stock = 0
+            self.stock_value = 0
             return
-        
+
         try:
-            # Use ERPNext utility function for accurate stock balance
-            stock_qty = get_stock_balance(
-                item_code=self.fuel_type,
-                warehouse=self.warehouse
-            )
-            self.current_stock = flt(stock_qty)
-            
+            self.current_stock, self.stock_value = get_ledger_balance(self.fuel_type, self.warehouse)
+            self.stock_updated_on = now_datetime()
+
         except Exception as e:
             error_msg = f"Error updating fuel tank stock for {self.name}: {str(e)}"
             frappe.log_error(error_msg, "Fuel Tank Stock Update Error")
-            
+
             # Show user-friendly message
             frappe.msgprint(
                 f"Could not fetch current stock. Please ensure Warehouse '{self.warehouse}' and Item '{self.fuel_type}' are properly configured. "
@@ -110,6 +108,13 @@ class FuelTank(Document):
                 indicator="red",
                 alert=True
             )
-            
+
             # Set to 0 but don't silently fail
-            self.current_stock = 0
\ No newline at end of file
+            self.current_stock = 0
+            self.stock_value = 0
+
+    def on_update(self):
+        clear_tank_keys_cache()
+
+    def on_trash(self):
+        clear_tank_keys_cache()
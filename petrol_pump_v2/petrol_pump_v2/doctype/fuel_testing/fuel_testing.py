@@ -1,10 +1,20 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate, get_datetime
-from erpnext.stock.utils import get_stock_balance
+
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import get_rates
+from petrol_pump_v2.petrol_pump_v2.tank_stock import get_tank_stock, stock_as_of
 
 
 class FuelTesting(Document):
+	"""Test liters drawn through nozzles, e.g. on a calibration day.
+
+	Nozzles, the pump's tanks with their stock and valuation rates, and fuel
+	rates are loaded once per request with set queries, however many nozzles
+	are tested. Meter updates are a single UPDATE and the stock issue a
+	single Stock Entry with one line per tank warehouse.
+	"""
+
 	def before_save(self):
 		self.populate_nozzle_details()
 		self.calculate_totals()
@@ -19,15 +29,45 @@ class FuelTesting(Document):
 		self.cancel_stock_entry()
 		self.revert_nozzle_readings()
 
+	def load_references(self):
+		"""Preload the tested nozzles and the pump's tanks with their stock, one query each"""
+		names = list({row.nozzle for row in self.fuel_testing_details if row.nozzle})
+		self._nozzles = {
+			nozzle.name: nozzle
+			for nozzle in frappe.get_all(
+				"Nozzle",
+				filters={"name": ["in", names]},
+				fields=["name", "nozzle_name", "fuel_type", "fuel_tank", "last_reading"],
+			)
+		} if names else {}
+		self._tanks = get_tank_stock(
+			petrol_pump=self.petrol_pump, as_of=stock_as_of(self.test_date)
+		) if self.petrol_pump else []
+
+	def get_nozzles(self):
+		if getattr(self, "_nozzles", None) is None:
+			self.load_references()
+		return self._nozzles
+
+	def get_tanks(self):
+		if getattr(self, "_tanks", None) is None:
+			self.load_references()
+		return self._tanks
+
 	def populate_nozzle_details(self):
 		"""Auto-fill fuel_type, rate, amount from selected nozzle"""
+		self.load_references()
+		nozzles = self.get_nozzles()
 		for row in self.fuel_testing_details:
-			if row.nozzle:
-				nozzle_doc = frappe.get_cached_doc("Nozzle", row.nozzle)
-				row.fuel_type = nozzle_doc.fuel_type
+			if row.nozzle in nozzles:
+				row.fuel_type = nozzles[row.nozzle].fuel_type
 
+		fuel_types = {row.fuel_type for row in self.fuel_testing_details if row.nozzle and row.fuel_type}
+		rates = get_rates(self.petrol_pump, fuel_types, get_datetime(self.test_date or nowdate()))
+		for row in self.fuel_testing_details:
+			if row.nozzle:
 				if row.fuel_type:
-					row.rate = self.get_current_rate(row.fuel_type)
+					row.rate = rates.get(row.fuel_type, 0)
 				row.amount = flt(row.test_liters) * flt(row.rate)
 
 	def calculate_totals(self):
@@ -36,79 +76,115 @@ class FuelTesting(Document):
 			total_liters += flt(detail.test_liters)
 		self.total_test_liters = total_liters
 
+	def get_stock_issues(self):
+		"""{(warehouse, fuel_type): liters} of test liters, per tank the nozzles draw from.
+
+		Nozzles not linked to a tank of their fuel fall back to the pump's first
+		tank of the fuel type; fuel types without a tank are returned with no
+		warehouse.
+		"""
+		nozzles = self.get_nozzles()
+		tanks = {tank.name: tank for tank in self.get_tanks() if tank.warehouse}
+		first_by_fuel_type = {}
+		for tank in tanks.values():
+			first_by_fuel_type.setdefault(tank.fuel_type, tank.warehouse)
+
+		issues = {}
+		for detail in self.fuel_testing_details:
+			if flt(detail.test_liters) <= 0 or not detail.fuel_type:
+				continue
+			tank = tanks.get(nozzles[detail.nozzle].fuel_tank) if detail.nozzle in nozzles else None
+			if tank and tank.fuel_type == detail.fuel_type:
+				warehouse = tank.warehouse
+			else:
+				warehouse = first_by_fuel_type.get(detail.fuel_type)
+			key = (warehouse, detail.fuel_type)
+			issues[key] = issues.get(key, 0) + flt(detail.test_liters)
+		return issues
+
+	def get_tank_balances(self):
+		"""{(warehouse, fuel_type): tank stock row} from the preloaded tanks"""
+		return {(tank.warehouse, tank.fuel_type): tank for tank in self.get_tanks() if tank.warehouse}
+
 	def validate_stock_availability(self):
 		if not self.petrol_pump:
 			return
 
-		fuel_consumption = {}
-		for detail in self.fuel_testing_details:
-			if flt(detail.test_liters) > 0 and detail.fuel_type:
-				fuel_type = detail.fuel_type
-				liters = flt(detail.test_liters)
-				fuel_consumption[fuel_type] = fuel_consumption.get(fuel_type, 0) + liters
-
-		for fuel_type, liters_to_test in fuel_consumption.items():
-			tank = frappe.get_all("Fuel Tank",
-				filters={"petrol_pump": self.petrol_pump, "fuel_type": fuel_type},
-				fields=["name", "warehouse", "tank_name"]
-			)
-			if not tank or not tank[0].warehouse:
+		balances = self.get_tank_balances()
+		for (warehouse, fuel_type), liters_to_test in self.get_stock_issues().items():
+			if not warehouse:
 				fuel_name = frappe.db.get_value("Fuel Type", fuel_type, "fuel_type_name") or fuel_type
 				frappe.throw(f"No Fuel Tank with warehouse found for {fuel_name} at {self.petrol_pump}")
 
-			warehouse = tank[0].warehouse
-			available_qty = get_stock_balance(
-				item_code=fuel_type,
-				warehouse=warehouse
-			)
-
-			if flt(available_qty) < flt(liters_to_test):
+			available_qty = flt(balances[(warehouse, fuel_type)].qty)
+			if available_qty < flt(liters_to_test):
 				fuel_name = frappe.db.get_value("Fuel Type", fuel_type, "fuel_type_name") or fuel_type
-				tank_name = tank[0].tank_name or tank[0].name
 				frappe.throw(
-					f"Insufficient stock for testing {fuel_name} in {tank_name} ({warehouse}). "
+					f"Insufficient stock for testing {fuel_name} in {balances[(warehouse, fuel_type)].name} ({warehouse}). "
 					f"Available: {available_qty:.2f} L, Required: {liters_to_test:.2f} L"
 				)
 
-	def update_nozzle_readings(self):
-		"""Increase nozzle last_reading by test_liters on submit"""
+	def shift_nozzle_readings(self, sign):
+		"""Move every tested nozzle's last_reading by sign x its test liters in one UPDATE.
+
+		Returns {nozzle: liters}. Readings never go below zero.
+		"""
+		offsets = {}
 		for row in self.fuel_testing_details:
 			if row.nozzle and flt(row.test_liters) > 0:
-				current_reading = flt(frappe.db.get_value("Nozzle", row.nozzle, "last_reading"))
-				new_reading = current_reading + flt(row.test_liters)
-				frappe.db.set_value("Nozzle", row.nozzle, "last_reading", new_reading)
-				nozzle_name = frappe.db.get_value("Nozzle", row.nozzle, "nozzle_name") or row.nozzle
-				frappe.msgprint(
-					f"Nozzle {nozzle_name}: Reading updated from {current_reading:.2f} to {new_reading:.2f}",
-					indicator="green"
-				)
+				offsets[row.nozzle] = offsets.get(row.nozzle, 0) + flt(row.test_liters)
+		if not offsets:
+			return offsets
+
+		cases = " ".join(["WHEN %s THEN %s"] * len(offsets))
+		values = [value for nozzle, liters in offsets.items() for value in (nozzle, sign * liters)]
+		frappe.db.sql(
+			f"""
+			UPDATE `tabNozzle`
+			SET last_reading = GREATEST(last_reading + CASE name {cases} ELSE 0 END, 0)
+			WHERE name IN %s
+			""",
+			(*values, tuple(offsets)),
+		)
+		return offsets
+
+	def nozzle_reading_changes(self, offsets, sign):
+		"""Lines of "nozzle: from -> to" for the message after a meter update"""
+		nozzles = self.get_nozzles()
+		lines = []
+		for nozzle, liters in offsets.items():
+			current_reading = flt(nozzles[nozzle].last_reading) if nozzle in nozzles else 0
+			new_reading = max(current_reading + sign * liters, 0)
+			nozzle_name = nozzles[nozzle].nozzle_name if nozzle in nozzles else nozzle
+			lines.append(f"Nozzle {nozzle_name or nozzle}: {current_reading:.2f} to {new_reading:.2f}")
+		return lines
+
+	def update_nozzle_readings(self):
+		"""Increase nozzle last_reading by test_liters on submit"""
+		self.get_nozzles()
+		offsets = self.shift_nozzle_readings(1)
+		if offsets:
+			frappe.msgprint(
+				"<br>".join(["Nozzle readings updated:", *self.nozzle_reading_changes(offsets, 1)]),
+				indicator="green"
+			)
 
 	def revert_nozzle_readings(self):
 		"""Decrease nozzle last_reading by test_liters on cancel"""
-		for row in self.fuel_testing_details:
-			if row.nozzle and flt(row.test_liters) > 0:
-				current_reading = flt(frappe.db.get_value("Nozzle", row.nozzle, "last_reading"))
-				reverted_reading = current_reading - flt(row.test_liters)
-				# Ensure reading doesn't go below zero
-				reverted_reading = max(reverted_reading, 0)
-				frappe.db.set_value("Nozzle", row.nozzle, "last_reading", reverted_reading)
-				nozzle_name = frappe.db.get_value("Nozzle", row.nozzle, "nozzle_name") or row.nozzle
-				frappe.msgprint(
-					f"Nozzle {nozzle_name}: Reading reverted from {current_reading:.2f} to {reverted_reading:.2f}",
-					indicator="orange"
-				)
+		self.get_nozzles()
+		offsets = self.shift_nozzle_readings(-1)
+		if offsets:
+			frappe.msgprint(
+				"<br>".join(["Nozzle readings reverted:", *self.nozzle_reading_changes(offsets, -1)]),
+				indicator="orange"
+			)
 
 	def create_testing_stock_entry(self):
-		fuel_consumption = {}
-		for detail in self.fuel_testing_details:
-			if flt(detail.test_liters) > 0 and detail.fuel_type:
-				fuel_type = detail.fuel_type
-				liters = flt(detail.test_liters)
-				fuel_consumption[fuel_type] = fuel_consumption.get(fuel_type, 0) + liters
-
-		if not fuel_consumption:
+		issues = {key: liters for key, liters in self.get_stock_issues().items() if key[0]}
+		if not issues:
 			return
 
+		balances = self.get_tank_balances()
 		stock_entry = frappe.new_doc("Stock Entry")
 		stock_entry.stock_entry_type = "Material Issue"
 		stock_entry.purpose = "Material Issue"
@@ -117,41 +193,19 @@ class FuelTesting(Document):
 		stock_entry.posting_date = self.test_date or nowdate()
 		stock_entry.add_comment("Comment", f"Fuel Testing - {self.name}")
 
-		for fuel_type, liters in fuel_consumption.items():
-			warehouse = frappe.db.get_value("Fuel Tank",
-				{"petrol_pump": self.petrol_pump, "fuel_type": fuel_type},
-				"warehouse")
-
-			if warehouse:
-				valuation_rate = self.get_valuation_rate(fuel_type, warehouse)
-
-				stock_entry.append("items", {
-					"s_warehouse": warehouse,
-					"item_code": fuel_type,
-					"qty": liters,
-					"basic_rate": valuation_rate,
-					"conversion_factor": 1.0
-				})
-
-		if stock_entry.items:
-			stock_entry.insert()
-			stock_entry.submit()
-			self.db_set('stock_entry_ref', stock_entry.name)
-			frappe.msgprint(f"Stock Entry {stock_entry.name} created for fuel testing")
-
-	def get_valuation_rate(self, item_code, warehouse):
-		"""Get current valuation rate for accurate COGS tracking"""
-		valuation_rate = frappe.db.get_value(
-			"Stock Ledger Entry",
-			{
-				"item_code": item_code,
-				"warehouse": warehouse,
-				"is_cancelled": 0
-			},
-			"valuation_rate",
-			order_by="posting_date desc, posting_time desc, creation desc"
-		)
-		return flt(valuation_rate) if valuation_rate else 0
+		for (warehouse, fuel_type), liters in issues.items():
+			stock_entry.append("items", {
+				"s_warehouse": warehouse,
+				"item_code": fuel_type,
+				"qty": liters,
+				"basic_rate": flt(balances[(warehouse, fuel_type)].valuation_rate),
+				"conversion_factor": 1.0
+			})
+
+		stock_entry.insert()
+		stock_entry.submit()
+		self.db_set('stock_entry_ref', stock_entry.name)
+		frappe.msgprint(f"Stock Entry {stock_entry.name} created for fuel testing")
 
 	def cancel_stock_entry(self):
 		"""Cancel linked Stock Entry"""
@@ -163,15 +217,3 @@ class FuelTesting(Document):
 					frappe.msgprint(f"Stock Entry {self.stock_entry_ref} cancelled")
 			except Exception as e:
 				frappe.throw(f"Error cancelling Stock Entry: {str(e)}")
-
-	def get_current_rate(self, fuel_type):
-		if not self.petrol_pump:
-			return 0
-		rate = frappe.db.sql("""
-			SELECT fpd.price_per_liter
-			FROM `tabFuel Price Detail` fpd
-			JOIN `tabFuel Price` fp ON fpd.parent = fp.name
-			WHERE fpd.fuel_type = %s AND fp.petrol_pump = %s AND fp.effective_from <= %s
-			ORDER BY fp.effective_from DESC LIMIT 1
-		""", (fuel_type, self.petrol_pump, get_datetime(self.test_date or nowdate())))
-		return rate[0][0] if rate else 0
@@ -0,0 +1,73 @@
+# Copyright (c) 2026, solitive and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt, today
+
+TEST_PUMP = "_Test Fuel Testing Pump"
+TEST_TANK = "_Test Fuel Testing Tank"
+TEST_FUEL = "_Test Fuel Testing Fuel"
+NOZZLES = 24
+TEST_LITERS = 5
+
+# Nozzles, tanks with stock, fuel rates
+PRELOAD_QUERY_BUDGET = 3
+
+
+class TestFuelTesting(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		# Written straight to the tables: only the Fuel Testing queries are under test
+		frappe.get_doc({"doctype": "Petrol Pump", "name": TEST_PUMP, "petrol_pump_name": TEST_PUMP}).db_insert()
+		frappe.get_doc({
+			"doctype": "Fuel Tank", "name": TEST_TANK, "tank_name": TEST_TANK,
+			"petrol_pump": TEST_PUMP, "fuel_type": TEST_FUEL, "warehouse": "_Test Fuel Testing Warehouse",
+		}).db_insert()
+		cls.nozzles = []
+		for i in range(NOZZLES):
+			nozzle = frappe.get_doc({
+				"doctype": "Nozzle", "name": f"_Test FT Nozzle {i}", "nozzle_name": f"T{i}",
+				"petrol_pump": TEST_PUMP, "fuel_tank": TEST_TANK, "fuel_type": TEST_FUEL,
+				"last_reading": 1000 + i, "is_active": 1,
+			})
+			nozzle.db_insert()
+			cls.nozzles.append(nozzle.name)
+
+	def make_testing(self, nozzles):
+		return frappe.get_doc({
+			"doctype": "Fuel Testing",
+			"petrol_pump": TEST_PUMP,
+			"test_date": today(),
+			"fuel_testing_details": [{"nozzle": nozzle, "test_liters": TEST_LITERS} for nozzle in nozzles],
+		})
+
+	def get_readings(self):
+		return dict(frappe.get_all(
+			"Nozzle", filters={"name": ["in", self.nozzles]}, fields=["name", "last_reading"], as_list=True
+		))
+
+	def test_preload_queries_do_not_grow_with_nozzles(self):
+		for nozzles in (self.nozzles[:2], self.nozzles):
+			doc = self.make_testing(nozzles)
+			with self.assertQueryCount(PRELOAD_QUERY_BUDGET):
+				doc.populate_nozzle_details()
+				doc.get_stock_issues()
+			self.assertTrue(all(row.fuel_type == TEST_FUEL for row in doc.fuel_testing_details))
+			self.assertEqual(doc.get_stock_issues(), {("_Test Fuel Testing Warehouse", TEST_FUEL): TEST_LITERS * len(nozzles)})
+
+	def test_meter_updates_are_one_statement(self):
+		before = self.get_readings()
+		doc = self.make_testing(self.nozzles)
+		doc.load_references()
+
+		with self.assertQueryCount(1):
+			doc.update_nozzle_readings()
+		after = self.get_readings()
+		for nozzle in self.nozzles:
+			self.assertEqual(flt(after[nozzle]), flt(before[nozzle]) + TEST_LITERS)
+
+		with self.assertQueryCount(1):
+			doc.revert_nozzle_readings()
+		self.assertEqual(self.get_readings(), before)
@@ -1,54 +1,117 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
-from erpnext.stock.utils import get_stock_balance
+
+from petrol_pump_v2.petrol_pump_v2.tank_stock import get_tank_stock
 
 class FuelTransfer(Document):
     def validate(self):
         """Validate stock availability and fuel type consistency"""
+        self._tanks = self.load_tanks()
         self.validate_fuel_type_consistency()
         self.validate_stock_availability()
     
     def before_save(self):
         # Auto-set fuel_type from source tank
         if self.from_fuel_tank and not self.fuel_type:
-            from_tank = frappe.get_doc("Fuel Tank", self.from_fuel_tank)
-            self.fuel_type = from_tank.fuel_type
+            self.fuel_type = self.get_tanks()[self.from_fuel_tank].fuel_type
+    
+    def get_movements(self):
+        """(label, from_tank, to_tank, quantity) of each movement, in posting order"""
+        if self.transfer_mode == "Batch":
+            return [
+                (f"Row {row.idx}", row.from_fuel_tank, row.to_fuel_tank, flt(row.quantity))
+                for row in self.movements or []
+            ]
+        return [("Transfer", self.from_fuel_tank, self.to_fuel_tank, flt(self.quantity))]
+    
+    def load_tanks(self):
+        """All tanks of the transfer with their pump's company, in one query"""
+        names = {tank for _label, from_tank, to_tank, _qty in self.get_movements() for tank in (from_tank, to_tank) if tank}
+        if not names:
+            return {}
+        tanks = frappe.db.sql(
+            """
+            SELECT ft.name, ft.tank_name, ft.fuel_type, ft.warehouse, ft.petrol_pump, pp.company
+            FROM `tabFuel Tank` ft
+            LEFT JOIN `tabPetrol Pump` pp ON pp.name = ft.petrol_pump
+            WHERE ft.name IN %s
+            """,
+            (tuple(names),),
+            as_dict=True,
+        )
+        return {tank.name: tank for tank in tanks}
+    
+    def get_tanks(self):
+        if getattr(self, "_tanks", None) is None:
+            self._tanks = self.load_tanks()
+        return self._tanks
     
     def validate_fuel_type_consistency(self):
         """Ensure source and destination tanks have same fuel type"""
-        from_tank = frappe.get_doc("Fuel Tank", self.from_fuel_tank)
-        to_tank = frappe.get_doc("Fuel Tank", self.to_fuel_tank)
+        tanks = self.get_tanks()
+        company = frappe.db.get_value("Petrol Pump", self.from_petrol_pump, "company")
+        total_quantity = 0.0
+        
+        for label, from_tank, to_tank, quantity in self.get_movements():
+            if from_tank not in tanks or to_tank not in tanks:
+                frappe.throw(f"{label}: select both a source and a destination Fuel Tank")
+            if from_tank == to_tank:
+                frappe.throw(f"{label}: source and destination tank are the same ({tanks[from_tank].tank_name})")
+            if quantity <= 0:
+                frappe.throw(f"{label}: quantity must be greater than zero")
+            
+            source, destination = tanks[from_tank], tanks[to_tank]
+            if source.fuel_type != destination.fuel_type:
+                frappe.throw(
+                    f"Cannot transfer fuel between different fuel types. "
+                    f"Source tank ({source.tank_name}) has {source.fuel_type}, "
+                    f"but destination tank ({destination.tank_name}) has {destination.fuel_type}."
+                )
+            # All lines go into one Stock Entry of the sending pump's company
+            for tank in (source, destination):
+                if tank.company != company:
+                    frappe.throw(
+                        f"{label}: tank {tank.tank_name} belongs to {tank.company}, "
+                        f"not to {company} of Petrol Pump {self.from_petrol_pump}"
+                    )
+            total_quantity += quantity
         
-        if from_tank.fuel_type != to_tank.fuel_type:
-            frappe.throw(
-                f"Cannot transfer fuel between different fuel types. "
-                f"Source tank ({from_tank.tank_name}) has {from_tank.fuel_type}, "
-                f"but destination tank ({to_tank.tank_name}) has {to_tank.fuel_type}."
-            )
+        if self.transfer_mode == "Batch":
+            self.total_quantity = total_quantity
+        else:
+            self.fuel_type = tanks[self.from_fuel_tank].fuel_type
     
     def validate_stock_availability(self):
-        """Validate sufficient stock in source tank before transfer"""
-        if not self.from_fuel_tank or not self.quantity:
-            return
+        """Validate sufficient stock in every source tank before transfer
         
-        from_tank = frappe.get_doc("Fuel Tank", self.from_fuel_tank)
+        Stock of all tanks is read with one query and the movements are
+        applied in posting order, so fuel moved into a tank earlier in the
+        batch can be moved on by a later line.
+        """
+        tanks = self.get_tanks()
+        for tank in tanks.values():
+            if not tank.warehouse:
+                frappe.throw(f"Tank {tank.tank_name} does not have a warehouse configured")
         
-        if not from_tank.warehouse:
-            frappe.throw(f"Source tank {from_tank.tank_name} does not have a warehouse configured")
-        
-        # Get available stock in source warehouse
-        available_qty = get_stock_balance(
-            item_code=self.fuel_type,
-            warehouse=from_tank.warehouse
-        )
-        
-        if flt(available_qty) < flt(self.quantity):
-            frappe.throw(
-                f"Insufficient stock in source tank {from_tank.tank_name}. "
-                f"Available: {available_qty} liters, Requested: {self.quantity} liters. "
-                f"Short by: {flt(self.quantity) - flt(available_qty)} liters."
-            )
+        balances = {
+            (row.fuel_type, row.warehouse): flt(row.qty)
+            for row in get_tank_stock(tanks=list(tanks), as_of=self.transfer_date)
+        }
+        for label, from_tank, to_tank, quantity in self.get_movements():
+            source, destination = tanks[from_tank], tanks[to_tank]
+            source_key = (source.fuel_type, source.warehouse)
+            available_qty = balances.get(source_key, 0.0)
+            
+            if available_qty < quantity:
+                frappe.throw(
+                    f"{label}: insufficient stock in source tank {source.tank_name}. "
+                    f"Available: {available_qty} liters, Requested: {quantity} liters. "
+                    f"Short by: {quantity - available_qty} liters."
+                )
+            balances[source_key] = available_qty - quantity
+            destination_key = (destination.fuel_type, destination.warehouse)
+            balances[destination_key] = balances.get(destination_key, 0.0) + quantity
     
     def on_submit(self):
         self.create_stock_entry()
@@ -58,50 +121,40 @@ class FuelTransfer(Document):
         self.cancel_stock_entry()
     
     def create_stock_entry(self):
-        """Create stock entry for fuel transfer with proper valuation"""
+        """Create one stock entry for the transfer, with one line per movement and proper valuation"""
+        tanks = self.get_tanks()
         stock_entry = frappe.new_doc("Stock Entry")
         stock_entry.stock_entry_type = "Material Transfer"
         stock_entry.purpose = "Material Transfer"
         
-        from_tank = frappe.get_doc("Fuel Tank", self.from_fuel_tank)
-        to_tank = frappe.get_doc("Fuel Tank", self.to_fuel_tank)
-        
         stock_entry.company = frappe.db.get_value("Petrol Pump", self.from_petrol_pump, "company")
         stock_entry.set_posting_time = 1
         stock_entry.posting_date = self.transfer_date
         
-        # Get actual valuation rate for proper cost tracking
-        valuation_rate = self.get_valuation_rate(self.fuel_type, from_tank.warehouse)
+        # Get actual valuation rates of all source tanks for proper cost tracking
+        valuation_rates = {
+            (row.fuel_type, row.warehouse): flt(row.valuation_rate)
+            for row in get_tank_stock(tanks=list(tanks), as_of=self.transfer_date)
+        }
         
-        # Add transfer item
-        stock_entry.append("items", {
-            "s_warehouse": from_tank.warehouse,
-            "t_warehouse": to_tank.warehouse,
-            "item_code": self.fuel_type,
-            "qty": self.quantity,
-            "basic_rate": valuation_rate,
-            "conversion_factor": 1.0
-        })
+        total_quantity = 0.0
+        for _label, from_tank, to_tank, quantity in self.get_movements():
+            source, destination = tanks[from_tank], tanks[to_tank]
+            stock_entry.append("items", {
+                "s_warehouse": source.warehouse,
+                "t_warehouse": destination.warehouse,
+                "item_code": source.fuel_type,
+                "qty": quantity,
+                "basic_rate": valuation_rates.get((source.fuel_type, source.warehouse), 0),
+                "conversion_factor": 1.0
+            })
+            total_quantity += quantity
         
         stock_entry.insert()
         stock_entry.submit()
         self.db_set('stock_entry_ref', stock_entry.name)
         
-        frappe.msgprint(f"Stock Entry {stock_entry.name} created for fuel transfer of {self.quantity} liters")
-    
-    def get_valuation_rate(self, item_code, warehouse):
-        """Get current valuation rate for accurate cost tracking"""
-        valuation_rate = frappe.db.get_value(
-            "Stock Ledger Entry",
-            {
-                "item_code": item_code,
-                "warehouse": warehouse,
-                "is_cancelled": 0
-            },
-            "valuation_rate",
-            order_by="posting_date desc, posting_time desc, creation desc"
-        )
-        return flt(valuation_rate) if valuation_rate else 0
+        frappe.msgprint(f"Stock Entry {stock_entry.name} created for fuel transfer of {total_quantity} liters")
     
     def cancel_stock_entry(self):
         """Cancel linked Stock Entry"""
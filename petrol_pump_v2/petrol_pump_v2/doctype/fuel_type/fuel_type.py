@@ -1,6 +1,8 @@
 from frappe.model.document import Document
 import frappe
 
+from petrol_pump_v2.petrol_pump_v2.volume_correction import clear_correction_table
+
 
 class FuelType(Document):
     def after_insert(self):
@@ -13,6 +15,7 @@ class FuelType(Document):
     def on_update(self):
         # Ensure item always exists even if Fuel Type was imported/renamed
         self._ensure_item_exists()
+        clear_correction_table(self.name)
 
     def _ensure_item_exists(self):
         item_code = self.name
@@ -0,0 +1,100 @@
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, get_datetime, now_datetime
+
+EVENT_TYPES = ("Reading", "Price Change", "Rollover", "Reset")
+
+
+class NozzleMeterReading(Document):
+	"""Raw totalizer reading pushed by a forecourt controller (or the simulator)."""
+
+	def validate(self):
+		if self.event_type and self.event_type not in EVENT_TYPES:
+			frappe.throw(f"Invalid Event Type {self.event_type}")
+		if self.nozzle and not self.petrol_pump:
+			self.petrol_pump = frappe.db.get_value("Nozzle", self.nozzle, "petrol_pump")
+
+
+def on_doctype_update():
+	frappe.db.add_index("Nozzle Meter Reading", ["nozzle", "reading_time"])
+
+
+@frappe.whitelist(methods=["POST"])
+def ingest_meter_readings(readings, source: str = None):
+	"""Bulk-insert totalizer readings from a forecourt controller.
+
+	`readings` is a list (or JSON string) of dicts with keys nozzle, reading_time,
+	totalizer and optionally price_per_liter / event_type. Nozzles are resolved
+	with one query and rows are written with a single multi-row INSERT, so a
+	batch costs two round trips however many readings it carries.
+	"""
+	if isinstance(readings, str):
+		readings = json.loads(readings)
+	if not readings:
+		return {"inserted": 0, "skipped": []}
+
+	frappe.has_permission("Nozzle Meter Reading", "create", throw=True)
+
+	nozzle_names = {r.get("nozzle") for r in readings if r.get("nozzle")}
+	pump_by_nozzle = dict(
+		frappe.get_all(
+			"Nozzle",
+			filters={"name": ["in", list(nozzle_names)]},
+			fields=["name", "petrol_pump"],
+			as_list=True,
+		)
+	)
+
+	now = now_datetime()
+	user = frappe.session.user
+	values = []
+	skipped = []
+	for idx, r in enumerate(readings):
+		nozzle = r.get("nozzle")
+		if nozzle not in pump_by_nozzle:
+			skipped.append({"idx": idx, "nozzle": nozzle, "reason": "Unknown Nozzle"})
+			continue
+		event_type = r.get("event_type") or "Reading"
+		if event_type not in EVENT_TYPES:
+			skipped.append({"idx": idx, "nozzle": nozzle, "reason": f"Invalid Event Type {event_type}"})
+			continue
+		values.append(
+			(
+				frappe.generate_hash(length=12),
+				now,
+				now,
+				user,
+				user,
+				pump_by_nozzle[nozzle],
+				nozzle,
+				get_datetime(r.get("reading_time")) if r.get("reading_time") else now,
+				flt(r.get("totalizer")),
+				flt(r.get("price_per_liter")),
+				event_type,
+				r.get("source") or source,
+			)
+		)
+
+	if values:
+		frappe.db.bulk_insert(
+			"Nozzle Meter Reading",
+			fields=[
+				"name",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"petrol_pump",
+				"nozzle",
+				"reading_time",
+				"totalizer",
+				"price_per_liter",
+				"event_type",
+				"source",
+			],
+			values=values,
+		)
+
+	return {"inserted": len(values), "skipped": skipped}
@@ -0,0 +1,243 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, get_first_day, get_last_day, getdate
+
+from petrol_pump_v2.petrol_pump_v2.summarized_posting import (
+	MONTHLY,
+	build_summary_lines,
+	get_summary_accounts,
+	make_summary_journal_entry,
+)
+
+# Day Closing child tables rolled into the consolidated entry: (table field, child doctype, group by)
+CHILD_GROUPS = (
+	("credit_details", "Day Closing Credit Detail", ("customer",)),
+	("card_sales", "Day Closing Card Detail", ("bank_account",)),
+	("expenses", "Day Closing Expense Detail", ("expense_account",)),
+	("fund_transfers", "Day Closing Fund Transfer", ("transfer_type", "bank_account")),
+	("supplier_payments", "Day Closing Supplier Payment", ("supplier",)),
+	("credit_collections", "Day Closing Credit Collection", ("customer",)),
+)
+
+TOTAL_FIELDS = (
+	"total_liters",
+	"total_sales",
+	"credit_amount",
+	"card_amount",
+	"cash_amount",
+	"total_expenses",
+	"total_supplier_payments",
+	"total_credit_collections",
+	"total_fund_transfer_effect",
+)
+
+
+class PeriodClose(Document):
+	"""Monthly consolidation of a pump's submitted Day Closings."""
+
+	def validate(self):
+		self.set_period()
+		self.validate_duplicate()
+		self.set_lock_period()
+		self.set_totals()
+
+	def before_submit(self):
+		self.validate_no_draft_closings()
+
+	def on_submit(self):
+		if self.gl_posting_mode == MONTHLY:
+			self.post_consolidated_entry()
+
+	def on_cancel(self):
+		if self.consolidated_journal_entry_ref:
+			je = frappe.get_doc("Journal Entry", self.consolidated_journal_entry_ref)
+			if je.docstatus == 1:
+				je.cancel()
+				frappe.msgprint(f"Consolidated Journal Entry {je.name} cancelled")
+			self.db_set("consolidated_journal_entry_ref", None)
+
+	def set_period(self):
+		self.period_start = get_first_day(self.period_start)
+		self.period_end = get_last_day(self.period_start)
+
+	def validate_duplicate(self):
+		existing = frappe.db.get_value(
+			"Period Close",
+			{
+				"petrol_pump": self.petrol_pump,
+				"period_start": self.period_start,
+				"docstatus": ["<", 2],
+				"name": ["!=", self.name],
+			},
+			"name",
+		)
+		if existing:
+			frappe.throw(
+				f"Period Close {existing} already exists for {self.petrol_pump} "
+				f"({getdate(self.period_start).strftime('%B %Y')})"
+			)
+
+	def set_lock_period(self):
+		"""Monthly-mode closings reach the GL only through this Period Close, so their period stays locked."""
+		if self.lock_period:
+			return
+		if self.gl_posting_mode == MONTHLY or frappe.db.exists(
+			"Day Closing",
+			{
+				"petrol_pump": self.petrol_pump,
+				"reading_date": ["between", [self.period_start, self.period_end]],
+				"gl_posting_mode": MONTHLY,
+				"docstatus": 1,
+			},
+		):
+			self.lock_period = 1
+			frappe.msgprint("Lock Period is always on for a period with Monthly-mode Day Closings", alert=True)
+
+	def validate_no_draft_closings(self):
+		drafts = frappe.get_all(
+			"Day Closing",
+			filters={
+				"petrol_pump": self.petrol_pump,
+				"reading_date": ["between", [self.period_start, self.period_end]],
+				"docstatus": 0,
+			},
+			pluck="name",
+		)
+		if drafts:
+			frappe.throw(
+				"Submit or delete the draft Day Closings in this period before closing it:<br>"
+				+ "<br>".join(drafts)
+			)
+
+	def _closing_filter(self):
+		return (
+			"dc.docstatus = 1 AND dc.petrol_pump = %(petrol_pump)s "
+			"AND dc.reading_date BETWEEN %(period_start)s AND %(period_end)s"
+		)
+
+	def _values(self):
+		return {
+			"petrol_pump": self.petrol_pump,
+			"period_start": self.period_start,
+			"period_end": self.period_end,
+		}
+
+	def set_totals(self):
+		"""Store the month's totals: one grouped query on Day Closing, one on the nozzle rows."""
+		totals = frappe.db.sql(
+			f"""
+			SELECT COUNT(DISTINCT dc.reading_date) AS operating_days,
+				{", ".join(f"SUM(dc.{f}) AS {f}" for f in TOTAL_FIELDS)}
+			FROM `tabDay Closing` dc
+			WHERE {self._closing_filter()}
+			""",
+			self._values(),
+			as_dict=True,
+		)[0]
+		self.operating_days = totals.operating_days or 0
+		for field in TOTAL_FIELDS:
+			self.set(field, flt(totals.get(field)))
+
+		self.set("fuel_summary", [])
+		for row in self.get_fuel_sales():
+			self.append(
+				"fuel_summary",
+				{
+					"fuel_type": row.fuel_type,
+					"liters": flt(row.liters),
+					"amount": flt(row.amount),
+					"average_rate": flt(row.amount) / flt(row.liters) if flt(row.liters) else 0,
+				},
+			)
+
+	def get_fuel_sales(self, gl_posting_mode=None):
+		condition = " AND dc.gl_posting_mode = %(gl_posting_mode)s" if gl_posting_mode else ""
+		return frappe.db.sql(
+			f"""
+			SELECT nrd.fuel_type, SUM(nrd.dispensed_liters) AS liters, SUM(nrd.amount) AS amount
+			FROM `tabNozzle Reading Detail` nrd
+			JOIN `tabDay Closing` dc ON dc.name = nrd.parent AND nrd.parenttype = 'Day Closing'
+			WHERE {self._closing_filter()}{condition}
+			GROUP BY nrd.fuel_type
+			ORDER BY nrd.fuel_type
+			""",
+			{**self._values(), "gl_posting_mode": gl_posting_mode},
+			as_dict=True,
+		)
+
+	def get_consolidated_closing(self):
+		"""The month's Monthly-mode closings folded into one Day Closing-shaped dict.
+
+		Each child table is read with one grouped query, so the result can be fed
+		straight to build_summary_lines.
+		"""
+		values = {**self._values(), "gl_posting_mode": MONTHLY}
+		where = f"{self._closing_filter()} AND dc.gl_posting_mode = %(gl_posting_mode)s"
+
+		closing = frappe._dict(
+			petrol_pump=self.petrol_pump,
+			nozzle_readings=self.get_fuel_sales(MONTHLY),
+			total_sales=flt(
+				frappe.db.sql(f"SELECT SUM(dc.total_sales) FROM `tabDay Closing` dc WHERE {where}", values)[0][0]
+			),
+		)
+		for table_field, child_doctype, group_by in CHILD_GROUPS:
+			columns = ", ".join(f"child.{f}" for f in group_by)
+			closing[table_field] = frappe.db.sql(
+				f"""
+				SELECT {columns}, SUM(child.amount) AS amount
+				FROM `tab{child_doctype}` child
+				JOIN `tabDay Closing` dc ON dc.name = child.parent AND child.parenttype = 'Day Closing'
+				WHERE {where}
+				GROUP BY {columns}
+				""",
+				values,
+				as_dict=True,
+			)
+		return closing
+
+	def post_consolidated_entry(self):
+		"""Post the month's sales, collections and cash movements as one Journal Entry."""
+		closing = self.get_consolidated_closing()
+		cost_center = frappe.db.get_value("Petrol Pump", self.petrol_pump, "cost_center") or (
+			frappe.get_cached_value("Company", self.company, "cost_center")
+		)
+		lines = build_summary_lines(closing, get_summary_accounts(closing, self.company, cost_center))
+		if not lines:
+			return
+
+		je = make_summary_journal_entry(
+			self.company,
+			self.period_end,
+			lines,
+			self.name,
+			f"Consolidated posting for Period Close {self.name} ({self.petrol_pump})",
+		)
+		self.db_set("consolidated_journal_entry_ref", je.name)
+		frappe.msgprint(f"Journal Entry {je.name} created for Period Close ({len(lines)} lines)")
+
+
+def on_doctype_update():
+	frappe.db.add_index("Period Close", ["petrol_pump", "period_start"])
+
+
+def validate_period_open(petrol_pump, posting_date, doctype="Day Closing"):
+	"""Block changes to documents dated inside a locked, submitted Period Close."""
+	if not (petrol_pump and posting_date):
+		return
+	period_close = frappe.db.get_value(
+		"Period Close",
+		{
+			"petrol_pump": petrol_pump,
+			"docstatus": 1,
+			"lock_period": 1,
+			"period_start": ["<=", posting_date],
+			"period_end": [">=", posting_date],
+		},
+		"name",
+	)
+	if period_close:
+		frappe.throw(
+			f"{doctype} dated {posting_date} falls in a period closed by Period Close "
+			f"<b>{period_close}</b>. Cancel the Period Close to make changes."
+		)
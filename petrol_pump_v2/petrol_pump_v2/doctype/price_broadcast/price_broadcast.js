@@ -0,0 +1,34 @@
+frappe.ui.form.on('Price Broadcast', {
+	refresh(frm) {
+		if (frm.doc.docstatus !== 0 || frm.is_new()) return;
+
+		frm.add_custom_button(__('Preview Changes'), function () {
+			frm.call('preview_changes').then(function (r) {
+				let rows = r.message || [];
+				if (!rows.length) {
+					frappe.msgprint(__('No pump\'s prices would change.'));
+					return;
+				}
+				let html = '<table class="table table-bordered"><thead><tr>'
+					+ '<th>' + __('Petrol Pump') + '</th><th>' + __('Fuel Type') + '</th>'
+					+ '<th>' + __('Current Rate') + '</th><th>' + __('New Rate') + '</th>'
+					+ '<th>' + __('Status') + '</th></tr></thead><tbody>';
+				rows.forEach(function (row) {
+					html += '<tr><td>' + frappe.utils.escape_html(row.petrol_pump) + '</td>'
+						+ '<td>' + frappe.utils.escape_html(row.fuel_type) + '</td>'
+						+ '<td>' + (row.old_rate == null ? '-' : format_currency(row.old_rate)) + '</td>'
+						+ '<td>' + format_currency(row.new_rate) + '</td>'
+						+ '<td>' + __(row.status) + '</td></tr>';
+				});
+				html += '</tbody></table>';
+				frappe.msgprint({ title: __('Price Changes'), message: html, wide: true });
+			});
+		});
+	},
+
+	pump_selector(frm) {
+		if (frm.doc.pump_selector !== 'Selected Pumps') frm.clear_table('pumps');
+		if (frm.doc.pump_selector !== 'Company') frm.set_value('company', null);
+		frm.refresh_field('pumps');
+	}
+});
@@ -0,0 +1,194 @@
+# Copyright (c) 2026, solitive and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, get_datetime, now, now_datetime
+
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import (
+	deactivate_superseded_prices,
+	get_active_prices,
+	prewarm_price_cache,
+)
+
+FUEL_PRICE_SERIES = "FPRICE-"
+
+
+class PriceBroadcast(Document):
+	"""Publish one set of fuel prices to many pumps in a single transaction.
+
+	Every pump gets a new Fuel Price carrying the broadcast rates for the fuel
+	types it stocks, plus its current rates for the fuel types it stocks but the
+	broadcast leaves out. Fuel Prices are written with two bulk inserts and the
+	prices they supersede are deactivated with one UPDATE, whatever the network
+	size.
+	"""
+
+	def validate(self):
+		self.validate_prices()
+		if self.pump_selector == "Company" and not self.company:
+			frappe.throw("Company is required when broadcasting to a Company's pumps")
+		if self.pump_selector == "Selected Pumps" and not self.pumps:
+			frappe.throw("Add at least one Petrol Pump")
+
+	def validate_prices(self):
+		if not self.prices:
+			frappe.throw("Add at least one fuel price to broadcast")
+		seen = set()
+		for row in self.prices:
+			if row.fuel_type in seen:
+				frappe.throw(f"Row {row.idx}: Fuel Type {row.fuel_type} is listed more than once")
+			if flt(row.price_per_liter) <= 0:
+				frappe.throw(f"Row {row.idx}: Price per Liter must be greater than zero")
+			seen.add(row.fuel_type)
+
+	def get_target_pumps(self):
+		if self.pump_selector == "Selected Pumps":
+			return list(dict.fromkeys(row.petrol_pump for row in self.pumps if row.petrol_pump))
+		filters = {"is_active": 1}
+		if self.pump_selector == "Company":
+			filters["company"] = self.company
+		return frappe.get_all("Petrol Pump", filters=filters, pluck="name", order_by="name")
+
+	def get_changes(self):
+		"""{petrol_pump: [(fuel_type, old_rate, new_rate, status), ...]}, read with two queries."""
+		pumps = self.get_target_pumps()
+		if not pumps:
+			return {}
+
+		stocked = {}
+		for petrol_pump, fuel_type in frappe.get_all(
+			"Fuel Tank",
+			filters={"petrol_pump": ["in", pumps], "fuel_type": ["is", "set"]},
+			fields=["petrol_pump", "fuel_type"],
+			distinct=True,
+			as_list=True,
+		):
+			stocked.setdefault(petrol_pump, set()).add(fuel_type)
+
+		active = get_active_prices(pumps)
+		broadcast = {row.fuel_type: flt(row.price_per_liter) for row in self.prices}
+
+		changes = {}
+		for petrol_pump in pumps:
+			current = active.get(petrol_pump, {})
+			lines = []
+			for fuel_type in sorted(stocked.get(petrol_pump, ())):
+				old_rate = current.get(fuel_type)
+				if fuel_type not in broadcast:
+					if old_rate:
+						lines.append((fuel_type, old_rate, old_rate, "Carried Forward"))
+					continue
+				new_rate = broadcast[fuel_type]
+				if old_rate is None:
+					status = "New"
+				elif flt(old_rate) == new_rate:
+					status = "Unchanged"
+				else:
+					status = "Changed"
+				lines.append((fuel_type, old_rate, new_rate, status))
+			if any(line[3] in ("New", "Changed") for line in lines):
+				changes[petrol_pump] = lines
+		return changes
+
+	@frappe.whitelist()
+	def preview_changes(self):
+		"""Dry run: the per-pump diff the broadcast would apply. Nothing is written."""
+		return [
+			{
+				"petrol_pump": petrol_pump,
+				"fuel_type": fuel_type,
+				"old_rate": old_rate,
+				"new_rate": new_rate,
+				"status": status,
+			}
+			for petrol_pump, lines in self.get_changes().items()
+			for fuel_type, old_rate, new_rate, status in lines
+		]
+
+	def on_submit(self):
+		changes = self.get_changes()
+		if not changes:
+			frappe.throw("No pump's prices would change; nothing to broadcast")
+
+		pumps = list(changes)
+		future = get_datetime(self.effective_from) > now_datetime()
+		if not future:
+			deactivate_superseded_prices(
+				{petrol_pump: {line[0] for line in lines} for petrol_pump, lines in changes.items()}
+			)
+
+		names = reserve_names(FUEL_PRICE_SERIES, len(pumps))
+		timestamp = now()
+		owner = frappe.session.user
+		parents = []
+		details = []
+		for name, petrol_pump in zip(names, pumps, strict=True):
+			parents.append(
+				(
+					name, timestamp, timestamp, owner, owner, 0, FUEL_PRICE_SERIES,
+					petrol_pump, self.effective_from, 0 if future else 1, 1 if future else 0, self.name,
+				)
+			)
+			for idx, (fuel_type, _old_rate, new_rate, _status) in enumerate(changes[petrol_pump], 1):
+				details.append(
+					(
+						frappe.generate_hash(length=10), timestamp, timestamp, owner, owner, 0, idx,
+						name, "Fuel Price", "fuel_prices", fuel_type, new_rate,
+					)
+				)
+
+		frappe.db.bulk_insert(
+			"Fuel Price",
+			fields=[
+				"name", "creation", "modified", "owner", "modified_by", "docstatus", "naming_series",
+				"petrol_pump", "effective_from", "is_active", "pending_activation", "price_broadcast",
+			],
+			values=parents,
+		)
+		frappe.db.bulk_insert(
+			"Fuel Price Detail",
+			fields=[
+				"name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+				"parent", "parenttype", "parentfield", "fuel_type", "price_per_liter",
+			],
+			values=details,
+		)
+
+		prewarm_price_cache(pumps)
+
+		self.pumps_affected = len(pumps)
+		self.prices_created = len(parents)
+		summary = []
+		for petrol_pump in pumps:
+			moved = [
+				f"{fuel_type} {flt(old_rate):g} -> {new_rate:g}" if status == "Changed" else f"{fuel_type} {new_rate:g} (new)"
+				for fuel_type, old_rate, new_rate, status in changes[petrol_pump]
+				if status in ("Changed", "New")
+			]
+			summary.append(f"{petrol_pump}: " + ", ".join(moved))
+		self.change_summary = "\n".join(summary)
+		self.db_set(
+			{
+				"pumps_affected": self.pumps_affected,
+				"prices_created": self.prices_created,
+				"change_summary": self.change_summary,
+			}
+		)
+
+	def on_cancel(self):
+		"""Fuel Prices created by the broadcast are kept: closings may already be priced from them."""
+		frappe.msgprint(
+			"Note: The Fuel Price records created by this broadcast were not deleted. "
+			"Create a new Fuel Price or broadcast to change the rates again.",
+			indicator="orange",
+		)
+
+
+def reserve_names(series, count):
+	"""Reserve `count` consecutive names of a naming series with one UPDATE."""
+	if not frappe.db.exists("Series", series):
+		frappe.db.sql("INSERT INTO `tabSeries` (name, current) VALUES (%s, 0)", series)
+	frappe.db.sql("UPDATE `tabSeries` SET current = current + %s WHERE name = %s", (count, series))
+	last = cint(frappe.db.sql("SELECT current FROM `tabSeries` WHERE name = %s", series)[0][0])
+	return [f"{series}{i:05d}" for i in range(last - count + 1, last + 1)]
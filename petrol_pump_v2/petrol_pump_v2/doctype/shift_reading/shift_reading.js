@@ -17,7 +17,11 @@ frappe.ui.form.on('Shift Reading', {
 function populate_all_nozzles(frm) {
   frappe.call({
     method: 'petrol_pump_v2.petrol_pump_v2.doctype.shift_reading.shift_reading.get_active_nozzles',
-    args: { petrol_pump: frm.doc.petrol_pump },
+    args: {
+      petrol_pump: frm.doc.petrol_pump,
+      reading_date: frm.doc.reading_date,
+      shift: frm.doc.shift,
+    },
   }).then((r) => {
     const rows = r.message || [];
     (rows || []).forEach((row) => {
@@ -102,9 +106,17 @@ frappe.ui.form.on('Nozzle Reading Detail', {
   },
   current_reading(frm, cdt, cdn) {
     const row = locals[cdt][cdn];
-    if (row.current_reading < row.previous_reading) {
-      frappe.msgprint(__('Current Reading cannot be less than Previous Reading'));
-      row.current_reading = row.previous_reading;
+    if ((row.current_reading || 0) < (row.previous_reading || 0)) {
+      // Rollover and meter replacement are valid backward readings; the server
+      // works out dispensed liters and checks continuity on save
+      if (!row.meter_event) {
+        frappe.show_alert({
+          message: __('Current Reading is below Previous Reading. Set Meter Event if the meter rolled over or was replaced.'),
+          indicator: 'orange',
+        });
+      }
+      frm.refresh_field('nozzle_readings');
+      return;
     }
     row.dispensed_liters = (row.current_reading || 0) - (row.previous_reading || 0);
     row.amount = (row.dispensed_liters || 0) * (row.rate || 0);
@@ -1,12 +1,30 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate, now_datetime
-from erpnext.stock.utils import get_stock_balance
+
+from petrol_pump_v2.petrol_pump_v2.closing_core import (
+    compute_closing,
+    fuel_types_without_rate,
+    has_backward_reading,
+)
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import get_rate, get_rates, shift_as_of
+from petrol_pump_v2.petrol_pump_v2.meter_continuity import (
+    get_chain_heads,
+    validate_continuity,
+)
+from petrol_pump_v2.petrol_pump_v2.tank_stock import allocate_stock_issue
+from petrol_pump_v2.petrol_pump_v2.doctype.period_close.period_close import validate_period_open
 
 class ShiftReading(Document):
     def validate(self):
-        """Validate prices for all nozzle readings"""
+        """Validate prices and meter continuity for all nozzle readings"""
+        validate_period_open(self.petrol_pump, self.reading_date, self.doctype)
         self.validate_prices()
+        if self.docstatus == 0:
+            validate_continuity(self)
+
+    def before_submit(self):
+        validate_continuity(self, throw=True)
     
     def validate_prices(self):
         """Ensure all nozzle readings have valid prices"""
@@ -27,12 +45,33 @@ class ShiftReading(Document):
         self.update_nozzle_last_readings()
         self.close_shift()
     
+    def before_cancel(self):
+        validate_period_open(self.petrol_pump, self.reading_date, self.doctype)
+
     def on_cancel(self):
         """Cancel linked Stock Entry and revert nozzle readings"""
+        self.validate_not_rolled_up()
         self.cancel_stock_entry()
         self.revert_nozzle_readings()
         self.reopen_shift()
     
+    def validate_not_rolled_up(self):
+        """A shift already rolled up into a submitted Day Closing cannot be cancelled."""
+        day_closing = frappe.db.get_value(
+            "Day Closing",
+            {
+                "petrol_pump": self.petrol_pump,
+                "reading_date": self.reading_date,
+                "rollup_shift_readings": 1,
+                "docstatus": 1,
+            },
+            "name",
+        )
+        if day_closing:
+            frappe.throw(
+                f"Shift Reading is rolled up into Day Closing {day_closing}. Cancel the Day Closing first."
+            )
+    
     def populate_nozzle_readings(self):
         """Auto-populate nozzle readings table from standalone Nozzles"""
         if not self.nozzle_readings and self.petrol_pump:
@@ -44,6 +83,7 @@ class ShiftReading(Document):
                 filters={"petrol_pump": self.petrol_pump, "is_active": 1},
                 fields=["name", "nozzle_name", "fuel_type", "last_reading"],
             )
+            rates = get_rates(self.petrol_pump, {n.fuel_type for n in nozzles}, self.get_price_as_of())
 
             for n in nozzles:
                 self.append("nozzle_readings", {
@@ -53,66 +93,53 @@ class ShiftReading(Document):
                     "fuel_type": n.fuel_type,
                     "previous_reading": n.last_reading or 0,
                     "current_reading": 0,
-                    "rate": self.get_current_rate(n.fuel_type),
+                    "rate": rates.get(n.fuel_type, 0),
                 })
     
     def calculate_readings(self):
         """Calculate dispensed liters and amounts"""
-        total_sales = 0
-        total_liters = 0
-        
-        for nozzle_reading in self.nozzle_readings:
-            # Calculate dispensed liters
-            nozzle_reading.dispensed_liters = flt(nozzle_reading.current_reading) - flt(nozzle_reading.previous_reading)
-            
-            # Calculate amount
-            if not nozzle_reading.rate:
-                nozzle_reading.rate = self.get_current_rate(nozzle_reading.fuel_type)
-            
-            nozzle_reading.amount = flt(nozzle_reading.dispensed_liters) * flt(nozzle_reading.rate)
-            
-            total_sales += flt(nozzle_reading.amount)
-            total_liters += flt(nozzle_reading.dispensed_liters)
-        
-        self.total_sales = total_sales
-        self.total_liters = total_liters
+        readings = self.nozzle_readings or []
+        # Meter capacity is only needed when a reading went backwards (rollover)
+        meter_capacities = {}
+        if has_backward_reading(readings):
+            meter_capacities = {
+                nozzle: head.meter_capacity for nozzle, head in get_chain_heads(self.petrol_pump).items()
+            }
+        rates = {}
+        missing = fuel_types_without_rate(readings)
+        if missing:
+            rates = get_rates(self.petrol_pump, missing, self.get_price_as_of())
+
+        totals = compute_closing(readings=readings, rates=rates, meter_capacities=meter_capacities)
+        for nozzle_reading, liters, rate, amount in zip(
+            readings, totals["reading_liters"], totals["reading_rates"], totals["reading_amounts"]
+        ):
+            nozzle_reading.dispensed_liters = liters
+            nozzle_reading.rate = rate
+            nozzle_reading.amount = amount
+
+        self.total_sales = totals["total_sales"]
+        self.total_liters = totals["total_liters"]
     
     def get_current_rate(self, fuel_type, petrol_pump=None):
-        """Get current active fuel price for a specific petrol pump"""
-        if not fuel_type:
-            return 0
-        pump = petrol_pump or self.petrol_pump
-        if not pump:
-            return 0
-        rate = frappe.db.sql(
-            """
-            SELECT fpd.price_per_liter 
-            FROM `tabFuel Price Detail` fpd
-            JOIN `tabFuel Price` fp ON fpd.parent = fp.name
-            WHERE fpd.fuel_type = %s AND fp.petrol_pump = %s AND fp.effective_from <= %s
-            ORDER BY fp.effective_from DESC LIMIT 1
-            """,
-            (fuel_type, pump, now_datetime()),
-        )
-        return rate[0][0] if rate else 0
+        """Fuel price in force at the start of this shift (or the end of the reading date)"""
+        return get_rate(petrol_pump or self.petrol_pump, fuel_type, self.get_price_as_of())
+
+    def get_price_as_of(self):
+        shift_start = frappe.db.get_value("Shift", self.shift, "start_time") if self.shift else None
+        return shift_as_of(self.reading_date, shift_start)
     
     def create_stock_entry(self):
         """Create stock entry for fuel consumption"""
-        # Group consumption by fuel type
-        fuel_consumption = {}
-        
-        for nozzle_reading in self.nozzle_readings:
-            if nozzle_reading.dispensed_liters > 0:
-                fuel_type = nozzle_reading.fuel_type
-                liters = nozzle_reading.dispensed_liters
-                
-                if fuel_type in fuel_consumption:
-                    fuel_consumption[fuel_type] += liters
-                else:
-                    fuel_consumption[fuel_type] = liters
-        
+        # Roll-up pumps issue stock once per day from Day Closing
+        if frappe.db.get_value("Petrol Pump", self.petrol_pump, "rollup_shift_readings"):
+            return
+
+        # One line per tank warehouse and fuel type, from the nozzles' tanks
+        issues = allocate_stock_issue(self.petrol_pump, self.nozzle_readings)
+
         # Create stock entry
-        if fuel_consumption:
+        if issues:
             stock_entry = frappe.new_doc("Stock Entry")
             stock_entry.stock_entry_type = "Material Issue"
             stock_entry.purpose = "Material Issue"
@@ -120,23 +147,17 @@ class ShiftReading(Document):
             stock_entry.set_posting_time = 1
             stock_entry.posting_date = self.reading_date or nowdate()
             
-            for fuel_type, liters in fuel_consumption.items():
-                # Find warehouse for this fuel type
-                warehouse = frappe.db.get_value("Fuel Tank", 
-                    {"petrol_pump": self.petrol_pump, "fuel_type": fuel_type}, 
-                    "warehouse")
-                
-                if warehouse:
-                    # Get actual valuation rate for proper COGS tracking
-                    valuation_rate = self.get_valuation_rate(fuel_type, warehouse)
-                    
-                    stock_entry.append("items", {
-                        "s_warehouse": warehouse,
-                        "item_code": fuel_type,
-                        "qty": liters,
-                        "basic_rate": valuation_rate,
-                        "conversion_factor": 1.0
-                    })
+            for (warehouse, fuel_type), liters in issues.items():
+                # Get actual valuation rate for proper COGS tracking
+                valuation_rate = self.get_valuation_rate(fuel_type, warehouse)
+
+                stock_entry.append("items", {
+                    "s_warehouse": warehouse,
+                    "item_code": fuel_type,
+                    "qty": liters,
+                    "basic_rate": valuation_rate,
+                    "conversion_factor": 1.0
+                })
             
             if stock_entry.items:
                 stock_entry.insert()
@@ -170,7 +191,11 @@ class ShiftReading(Document):
                     "name",
                 )
                 if nn:
-                    frappe.db.set_value("Nozzle", nn, "last_reading", flt(nozzle_reading.current_reading))
+                    frappe.db.set_value(
+                        "Nozzle",
+                        nn,
+                        {"last_reading": flt(nozzle_reading.current_reading), "last_reading_date": self.reading_date},
+                    )
     
     def close_shift(self):
         """Mark shift as closed"""
@@ -205,12 +230,20 @@ class ShiftReading(Document):
                     "name",
                 )
                 if nn:
-                    frappe.db.set_value("Nozzle", nn, "last_reading", flt(nozzle_reading.previous_reading))
+                    frappe.db.set_value(
+                        "Nozzle",
+                        nn,
+                        {"last_reading": flt(nozzle_reading.previous_reading), "last_reading_date": None},
+                    )
         frappe.msgprint("Nozzle readings reverted")
 
 @frappe.whitelist()
-def get_active_nozzles(petrol_pump: str):
-    """Return active nozzles for a petrol pump with defaults for child rows (standalone Nozzle)."""
+def get_active_nozzles(petrol_pump: str, reading_date: str = None, shift: str = None):
+    """Return active nozzles for a petrol pump with defaults for child rows (standalone Nozzle).
+
+    Rates are those in force at the shift start (or the end of the reading
+    date), so a back-dated Shift Reading is not pre-filled with today's price.
+    """
     rows = []
     if not petrol_pump:
         return rows
@@ -219,6 +252,8 @@ def get_active_nozzles(petrol_pump: str):
         filters={"petrol_pump": petrol_pump, "is_active": 1},
         fields=["nozzle_name", "fuel_type", "last_reading"],
     )
+    shift_start = frappe.db.get_value("Shift", shift, "start_time") if shift else None
+    rates = get_rates(petrol_pump, {n.fuel_type for n in nozzles}, shift_as_of(reading_date, shift_start))
     for n in nozzles:
         rows.append({
             "dispenser": None,
@@ -226,6 +261,6 @@ def get_active_nozzles(petrol_pump: str):
             "fuel_type": n.fuel_type,
             "previous_reading": n.last_reading or 0,
             "current_reading": 0,
-            "rate": ShiftReading.get_current_rate(ShiftReading, n.fuel_type, petrol_pump),
+            "rate": rates.get(n.fuel_type, 0),
         })
-    return rows
\ No newline at end of file
+    return rows
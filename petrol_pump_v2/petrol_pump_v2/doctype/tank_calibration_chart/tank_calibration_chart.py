@@ -0,0 +1,55 @@
+# Copyright (c) 2026, solitive and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.tank_calibration import clear_chart_cache
+
+
+class TankCalibrationChart(Document):
+	def validate(self):
+		self.sort_points()
+		self.validate_points()
+		self.max_dip_mm = self.calibration_points[-1].dip_mm
+		self.max_volume_liters = self.calibration_points[-1].volume_liters
+
+	def sort_points(self):
+		self.calibration_points.sort(key=lambda row: flt(row.dip_mm))
+		for idx, row in enumerate(self.calibration_points, 1):
+			row.idx = idx
+
+	def validate_points(self):
+		if len(self.calibration_points) < 2:
+			frappe.throw("A calibration chart needs at least two points")
+		previous = None
+		for row in self.calibration_points:
+			if flt(row.dip_mm) < 0 or flt(row.volume_liters) < 0:
+				frappe.throw(f"Row {row.idx}: Dip and Volume cannot be negative")
+			if previous:
+				if flt(row.dip_mm) == flt(previous.dip_mm):
+					frappe.throw(f"Row {row.idx}: Dip {row.dip_mm} mm is listed more than once")
+				if flt(row.volume_liters) < flt(previous.volume_liters):
+					frappe.throw(
+						f"Row {row.idx}: Volume must not fall as the dip rises "
+						f"({previous.dip_mm} mm = {previous.volume_liters} L, {row.dip_mm} mm = {row.volume_liters} L)"
+					)
+			previous = row
+
+		capacity = frappe.db.get_value("Fuel Tank", self.fuel_tank, "capacity")
+		if capacity and flt(self.calibration_points[-1].volume_liters) > flt(capacity) * 1.05:
+			frappe.msgprint(
+				f"The chart's top volume exceeds the tank capacity of {flt(capacity):g} L",
+				indicator="orange",
+				alert=True,
+			)
+
+	def on_update(self):
+		clear_chart_cache(self.fuel_tank)
+		before = self.get_doc_before_save()
+		if before and before.fuel_tank != self.fuel_tank:
+			clear_chart_cache(before.fuel_tank)
+
+	def on_trash(self):
+		clear_chart_cache(self.fuel_tank)
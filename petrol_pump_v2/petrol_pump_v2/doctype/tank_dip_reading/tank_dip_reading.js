@@ -2,6 +2,7 @@ frappe.ui.form.on('Tank Dip Reading', {
   refresh(frm) {
     if (frm.doc.docstatus === 0 && frm.doc.petrol_pump) {
       frm.add_custom_button(__('Load Tanks'), () => load_tanks(frm));
+      load_charts(frm);
     }
   },
 
@@ -22,6 +23,23 @@ frappe.ui.form.on('Tank Dip Reading', {
 });
 
 frappe.ui.form.on('Tank Dip Reading Detail', {
+  measured_dip_mm(frm, cdt, cdn) {
+    const row = frappe.get_doc(cdt, cdn);
+    if (!row.measured_dip_mm) return;
+
+    const chart = (frm.calibration_charts || {})[row.fuel_tank];
+    if (!chart) {
+      frappe.msgprint(__('Fuel Tank {0} has no Tank Calibration Chart', [row.fuel_tank]));
+      return;
+    }
+    const liters = interpolate_dip(chart, parseFloat(row.measured_dip_mm));
+    if (liters === null) {
+      frappe.msgprint(__('Dip {0} mm is outside the calibration chart of Fuel Tank {1}', [row.measured_dip_mm, row.fuel_tank]));
+      return;
+    }
+    frappe.model.set_value(cdt, cdn, 'measured_dip', liters);
+  },
+
   measured_dip(frm, cdt, cdn) {
     const row = frappe.get_doc(cdt, cdn);
     const measured = parseFloat(row.measured_dip || 0);
@@ -42,6 +60,7 @@ function load_tanks(frm) {
   (frm.doc.tank_readings || []).forEach((row) => {
     existing[row.fuel_tank] = {
       measured_dip: row.measured_dip,
+      measured_dip_mm: row.measured_dip_mm,
       remarks: row.remarks
     };
   });
@@ -64,6 +83,7 @@ function load_tanks(frm) {
         warehouse: row.warehouse,
         system_stock: row.system_stock,
         measured_dip: prev.measured_dip || 0,
+        measured_dip_mm: prev.measured_dip_mm || 0,
         remarks: prev.remarks || ''
       });
 
@@ -72,9 +92,43 @@ function load_tanks(frm) {
 
     frm.refresh_field('tank_readings');
     calculate_total_variance(frm);
+    load_charts(frm);
+  });
+}
+
+// Calibration charts of the form's tanks are fetched once, so every dip
+// entered in mm converts to liters in the browser without a round trip
+function load_charts(frm) {
+  const tanks = (frm.doc.tank_readings || []).map((row) => row.fuel_tank).filter(Boolean);
+  if (!tanks.length) return;
+
+  frappe.call({
+    method: 'petrol_pump_v2.petrol_pump_v2.tank_calibration.get_calibration_charts',
+    args: { tanks: tanks }
+  }).then((r) => {
+    frm.calibration_charts = r.message || {};
   });
 }
 
+// Linear interpolation between the chart points either side of the dip
+// (binary search); null outside the chart
+function interpolate_dip(chart, dip_mm) {
+  const dips = chart.dips;
+  const volumes = chart.volumes;
+  if (!dips.length || dip_mm < dips[0] || dip_mm > dips[dips.length - 1]) return null;
+
+  let lo = 0;
+  let hi = dips.length - 1;
+  while (hi - lo > 1) {
+    const mid = (lo + hi) >> 1;
+    if (dips[mid] <= dip_mm) lo = mid;
+    else hi = mid;
+  }
+  if (dips[lo] === dip_mm || lo === hi) return volumes[lo];
+  const share = (dip_mm - dips[lo]) / (dips[hi] - dips[lo]);
+  return volumes[lo] + share * (volumes[hi] - volumes[lo]);
+}
+
 function calculate_total_variance(frm) {
   let total = 0;
   (frm.doc.tank_readings || []).forEach((row) => {
@@ -1,54 +1,56 @@
 import frappe
 from frappe.model.document import Document
-from frappe.utils import flt, getdate, nowdate
-from erpnext.stock.utils import get_stock_balance
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.tank_calibration import dips_to_liters
+from petrol_pump_v2.petrol_pump_v2.tank_stock import get_tank_stock, stock_as_of
+from petrol_pump_v2.petrol_pump_v2.volume_correction import correct_volumes, measured_temperature
 
 
 class TankDipReading(Document):
     def before_save(self):
         self.calculate_totals()
 
+    def convert_dips(self):
+        """Liters of rows entered in mm, from the tanks' calibration charts in one pass."""
+        rows = [row for row in self.tank_readings or [] if flt(row.measured_dip_mm) > 0]
+        if not rows:
+            return
+        liters = dips_to_liters([(row.fuel_tank, row.measured_dip_mm) for row in rows])
+        for row, volume in zip(rows, liters, strict=True):
+            row.measured_dip = volume
+
+    def correct_dips(self):
+        """Observed liters corrected to 15 °C for all rows at once; both are kept."""
+        rows = self.tank_readings or []
+        corrected = correct_volumes([(row.fuel_type, row.measured_dip, measured_temperature(row)) for row in rows])
+        for row, volume in zip(rows, corrected, strict=True):
+            row.corrected_dip = volume
+
     def calculate_totals(self):
+        self.convert_dips()
+        self.correct_dips()
         total_variance = 0.0
         for row in self.tank_readings or []:
-            row.difference = flt(row.measured_dip) - flt(row.system_stock)
+            row.difference = flt(row.corrected_dip) - flt(row.system_stock)
             total_variance += flt(row.difference)
         self.total_variance = total_variance
 
 
 @frappe.whitelist()
 def get_pump_tank_rows(petrol_pump: str, reading_date: str = None):
-    """Return all fuel tanks for a pump with current system stock."""
+    """Return all fuel tanks for a pump with their system stock as of the reading date."""
     if not petrol_pump:
         return []
 
-    posting_date = getdate(reading_date) if reading_date else getdate(nowdate())
-    tanks = frappe.get_all(
-        "Fuel Tank",
-        filters={"petrol_pump": petrol_pump},
-        fields=["name", "fuel_type", "warehouse"],
-        order_by="name asc",
-    )
-
-    rows = []
-    for tank in tanks:
-        system_stock = 0.0
-        if tank.warehouse and tank.fuel_type:
-            system_stock = get_stock_balance(
-                item_code=tank.fuel_type,
-                warehouse=tank.warehouse,
-                posting_date=posting_date,
-            )
-
-        rows.append(
-            {
-                "fuel_tank": tank.name,
-                "fuel_type": tank.fuel_type,
-                "warehouse": tank.warehouse,
-                "system_stock": flt(system_stock),
-                "measured_dip": 0.0,
-                "difference": 0.0,
-            }
-        )
-
-    return rows
+    return [
+        {
+            "fuel_tank": tank.name,
+            "fuel_type": tank.fuel_type,
+            "warehouse": tank.warehouse,
+            "system_stock": flt(tank.qty),
+            "measured_dip": 0.0,
+            "difference": 0.0,
+        }
+        for tank in get_tank_stock(petrol_pump=petrol_pump, as_of=stock_as_of(reading_date))
+    ]
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, solitive and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class WetStockAnalysis(Document):
+	"""Nightly wet-stock reconciliation result of one tank (written by wet_stock)."""
+
+
+def on_doctype_update():
+	frappe.db.add_index("Wet Stock Analysis", ["analysis_date", "status"])
+	frappe.db.add_index("Wet Stock Analysis", ["fuel_tank", "analysis_date"])
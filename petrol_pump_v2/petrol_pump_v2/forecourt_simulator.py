@@ -0,0 +1,314 @@
+"""Forecourt controller simulator for load-testing meter ingestion.
+
+Emulates N pumps x K nozzles producing totalizer readings, price changes and
+occasional meter rollovers / resets, and pushes them to the ingestion API
+(`Nozzle Meter Reading.ingest_meter_readings`) or writes them to JSONL files.
+
+Against a site (reads real nozzles, reports DB growth):
+
+    bench --site mysite execute petrol_pump_v2.petrol_pump_v2.forecourt_simulator.run_load_profile \
+        --kwargs "{'duration': 60, 'rate': 500}"
+
+Standalone, without bench (the site's nozzles over HTTP, or synthetic ones to a file):
+
+    python -m petrol_pump_v2.petrol_pump_v2.forecourt_simulator --pumps 50 --nozzles 8 \
+        --rate 1000 --duration 30 --url https://mysite --api-key KEY --api-secret SECRET
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+INGEST_METHOD = "petrol_pump_v2.petrol_pump_v2.doctype.nozzle_meter_reading.nozzle_meter_reading.ingest_meter_readings"
+METER_CAPACITY = 1_000_000.0
+
+
+class ForecourtSimulator:
+	"""Generates meter events for a fixed set of nozzles.
+
+	`nozzles` is a list of (petrol_pump, nozzle) pairs; use `synthetic_nozzles`
+	when no site is available.
+	"""
+
+	def __init__(
+		self,
+		nozzles,
+		rollover_probability=0.0005,
+		reset_probability=0.0001,
+		price_change_probability=0.0002,
+		meter_capacity=METER_CAPACITY,
+		seed=None,
+	):
+		self.rng = random.Random(seed)
+		self.nozzles = list(nozzles)
+		self.rollover_probability = rollover_probability
+		self.reset_probability = reset_probability
+		self.price_change_probability = price_change_probability
+		self.meter_capacity = meter_capacity
+		self.totalizer = {n: self.rng.uniform(0, meter_capacity * 0.9) for _, n in self.nozzles}
+		self.price = {n: round(self.rng.uniform(250, 300), 2) for _, n in self.nozzles}
+
+	def next_event(self):
+		pump, nozzle = self.rng.choice(self.nozzles)
+		roll = self.rng.random()
+		event_type = "Reading"
+
+		if roll < self.reset_probability:
+			self.totalizer[nozzle] = 0.0
+			event_type = "Reset"
+		elif roll < self.reset_probability + self.rollover_probability:
+			self.totalizer[nozzle] = self.rng.uniform(0, 50)
+			event_type = "Rollover"
+		elif roll < self.reset_probability + self.rollover_probability + self.price_change_probability:
+			self.price[nozzle] = round(self.price[nozzle] + self.rng.uniform(-5, 5), 2)
+			event_type = "Price Change"
+		else:
+			reading = self.totalizer[nozzle] + self.rng.uniform(1, 60)
+			if reading >= self.meter_capacity:
+				reading -= self.meter_capacity
+				event_type = "Rollover"
+			self.totalizer[nozzle] = reading
+
+		return {
+			"petrol_pump": pump,
+			"nozzle": nozzle,
+			"reading_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+			"totalizer": round(self.totalizer[nozzle], 3),
+			"price_per_liter": self.price[nozzle],
+			"event_type": event_type,
+		}
+
+	def batch(self, size):
+		return [self.next_event() for _ in range(size)]
+
+
+def synthetic_nozzles(pumps, nozzles_per_pump):
+	return [(f"SIM-PUMP-{p:04d}", f"SIM-NOZ-{p:04d}-{k:02d}") for p in range(pumps) for k in range(nozzles_per_pump)]
+
+
+def site_nozzles(pumps=None, nozzles_per_pump=None):
+	"""Active nozzles on the current site, optionally capped to pumps x nozzles_per_pump."""
+	import frappe
+
+	rows = frappe.get_all(
+		"Nozzle",
+		filters={"is_active": 1},
+		fields=["petrol_pump", "name"],
+		order_by="petrol_pump asc, name asc",
+		as_list=True,
+	)
+	return cap_nozzles(rows, pumps, nozzles_per_pump)
+
+
+def cap_nozzles(rows, pumps=None, nozzles_per_pump=None):
+	by_pump = {}
+	for pump, nozzle in rows:
+		by_pump.setdefault(pump, []).append(nozzle)
+
+	selected = []
+	for pump in list(by_pump)[:pumps] if pumps else by_pump:
+		for nozzle in by_pump[pump][:nozzles_per_pump] if nozzles_per_pump else by_pump[pump]:
+			selected.append((pump, nozzle))
+	return selected
+
+
+class FileSink:
+	"""Appends each batch to a JSONL file."""
+
+	def __init__(self, path):
+		self.path = path
+
+	def send(self, batch):
+		with open(self.path, "a") as fh:
+			for row in batch:
+				fh.write(json.dumps(row) + "\n")
+
+
+class ApiSink:
+	"""POSTs each batch to the ingestion endpoint over HTTP using token auth."""
+
+	def __init__(self, url, api_key, api_secret, source="simulator"):
+		import requests
+
+		self.session = requests.Session()
+		self.session.headers["Authorization"] = f"token {api_key}:{api_secret}"
+		self.endpoint = f"{url.rstrip('/')}/api/method/{INGEST_METHOD}"
+		self.source = source
+
+	def fetch_nozzles(self, pumps=None, nozzles_per_pump=None):
+		base = self.endpoint.split("/api/method/")[0]
+		response = self.session.get(
+			f"{base}/api/resource/Nozzle",
+			params={
+				"fields": json.dumps(["petrol_pump", "name"]),
+				"filters": json.dumps({"is_active": 1}),
+				"order_by": "petrol_pump asc, name asc",
+				"limit_page_length": 0,
+			},
+		)
+		response.raise_for_status()
+		rows = [(r["petrol_pump"], r["name"]) for r in response.json()["data"]]
+		return cap_nozzles(rows, pumps, nozzles_per_pump)
+
+	def send(self, batch):
+		response = self.session.post(self.endpoint, json={"readings": batch, "source": self.source})
+		response.raise_for_status()
+
+
+class LocalSink:
+	"""Calls the ingestion function in-process and commits, as a worker would."""
+
+	def __init__(self, source="simulator"):
+		self.source = source
+
+	def send(self, batch):
+		import frappe
+
+		from petrol_pump_v2.petrol_pump_v2.doctype.nozzle_meter_reading.nozzle_meter_reading import (
+			ingest_meter_readings,
+		)
+
+		ingest_meter_readings(batch, source=self.source)
+		frappe.db.commit()
+
+
+def percentile(values, pct):
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	k = min(len(ordered) - 1, max(0, round(pct / 100.0 * len(ordered) + 0.5) - 1))
+	return ordered[k]
+
+
+def run(simulator, sink, rate=100, duration=10, batch_size=50):
+	"""Drive `sink` at `rate` readings/sec for `duration` seconds.
+
+	Returns sustained readings/sec and per-batch ingest latency percentiles (ms).
+	"""
+	interval = batch_size / float(rate)
+	latencies = []
+	sent = 0
+	started = time.perf_counter()
+	deadline = started + duration
+	next_tick = started
+
+	while time.perf_counter() < deadline:
+		batch = simulator.batch(batch_size)
+		t0 = time.perf_counter()
+		sink.send(batch)
+		latencies.append((time.perf_counter() - t0) * 1000)
+		sent += len(batch)
+
+		next_tick += interval
+		sleep_for = next_tick - time.perf_counter()
+		if sleep_for > 0:
+			time.sleep(sleep_for)
+
+	elapsed = time.perf_counter() - started
+	return {
+		"readings": sent,
+		"batches": len(latencies),
+		"elapsed_sec": round(elapsed, 3),
+		"target_readings_per_sec": rate,
+		"sustained_readings_per_sec": round(sent / elapsed, 1) if elapsed else 0,
+		"p50_latency_ms": round(percentile(latencies, 50), 2),
+		"p99_latency_ms": round(percentile(latencies, 99), 2),
+		"max_latency_ms": round(max(latencies), 2) if latencies else 0,
+	}
+
+
+def _table_stats():
+	import frappe
+
+	# information_schema sizes are InnoDB estimates; refresh them first
+	frappe.db.sql("ANALYZE TABLE `tabNozzle Meter Reading`")
+	size = frappe.db.sql(
+		"""
+		SELECT data_length + index_length
+		FROM information_schema.tables
+		WHERE table_schema = DATABASE() AND table_name = 'tabNozzle Meter Reading'
+		"""
+	)
+	return frappe.db.count("Nozzle Meter Reading"), int(size[0][0] or 0) if size else 0
+
+
+def run_load_profile(
+	duration=60,
+	rate=200,
+	batch_size=50,
+	pumps=None,
+	nozzles_per_pump=None,
+	sink="local",
+	path=None,
+	url=None,
+	api_key=None,
+	api_secret=None,
+	seed=None,
+):
+	"""Load profile runner for `bench execute`.
+
+	Uses the site's active nozzles, pushes through the chosen sink and reports
+	sustained readings/sec, p99 ingest latency and growth of the readings table.
+	"""
+	nozzles = site_nozzles(pumps, nozzles_per_pump)
+	if not nozzles:
+		raise ValueError("No active Nozzles found on this site")
+
+	if sink == "file":
+		target = FileSink(path or "meter_readings.jsonl")
+	elif sink == "api":
+		target = ApiSink(url, api_key, api_secret)
+	else:
+		target = LocalSink()
+
+	rows_before, bytes_before = _table_stats()
+	result = run(ForecourtSimulator(nozzles, seed=seed), target, rate=rate, duration=duration, batch_size=batch_size)
+	rows_after, bytes_after = _table_stats()
+
+	result.update(
+		{
+			"nozzles": len(nozzles),
+			"sink": sink,
+			"db_rows_added": rows_after - rows_before,
+			"db_bytes_added": bytes_after - bytes_before,
+			"db_bytes_per_reading": round((bytes_after - bytes_before) / result["readings"], 1)
+			if result["readings"]
+			else 0,
+		}
+	)
+	print(json.dumps(result, indent=2))
+	return result
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Simulate forecourt meter traffic")
+	parser.add_argument("--pumps", type=int, default=10)
+	parser.add_argument("--nozzles", type=int, default=4, help="nozzles per pump")
+	parser.add_argument("--rate", type=int, default=100, help="readings per second")
+	parser.add_argument("--duration", type=int, default=10, help="seconds")
+	parser.add_argument("--batch-size", type=int, default=50)
+	parser.add_argument("--seed", type=int)
+	parser.add_argument("--out", help="write JSONL to this file instead of pushing")
+	parser.add_argument("--url")
+	parser.add_argument("--api-key")
+	parser.add_argument("--api-secret")
+	args = parser.parse_args(argv)
+
+	if args.out:
+		sink = FileSink(args.out)
+		nozzles = synthetic_nozzles(args.pumps, args.nozzles)
+	elif args.url:
+		sink = ApiSink(args.url, args.api_key, args.api_secret)
+		nozzles = sink.fetch_nozzles(args.pumps, args.nozzles)
+	else:
+		parser.error("either --out or --url is required")
+
+	simulator = ForecourtSimulator(nozzles, seed=args.seed)
+	result = run(simulator, sink, rate=args.rate, duration=args.duration, batch_size=args.batch_size)
+	print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+	main()
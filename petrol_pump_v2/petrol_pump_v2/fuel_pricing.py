@@ -0,0 +1,341 @@
+"""Fuel price service: activation, deactivation and as-of-date lookups.
+
+All Fuel Price rows of a pump are turned into a per-fuel-type interval table
+(sorted effective_from datetimes with the matching rates) by one query and
+kept in the cache until a Fuel Price of that pump changes. A rate is then a
+binary search for the last price effective at or before the requested time,
+so back-dated closings are priced as of their own reading date, not today.
+
+Activation is scoped by (petrol_pump, fuel_type): a new active price only
+deactivates the active prices of its own pump whose fuel types it covers.
+Candidates are read through the (petrol_pump, is_active) index and
+deactivated by primary key, so a price change never scans or locks Fuel
+Price rows of other pumps.
+"""
+
+from bisect import bisect_right
+
+import frappe
+from frappe.utils import add_to_date, flt, get_datetime, getdate, now_datetime
+
+
+def _cache_key(petrol_pump):
+	return f"petrol_pump_v2:price_intervals:{petrol_pump}"
+
+
+def get_price_intervals(petrol_pump):
+	"""{fuel_type: ([effective_from, ...], [rate, ...])} for a pump, ascending."""
+	key = _cache_key(petrol_pump)
+	intervals = frappe.cache().get_value(key)
+	if intervals is not None:
+		return intervals
+
+	rows = frappe.db.sql(
+		"""
+		SELECT fpd.fuel_type, fp.effective_from, fpd.price_per_liter
+		FROM `tabFuel Price Detail` fpd
+		JOIN `tabFuel Price` fp ON fpd.parent = fp.name
+		WHERE fp.petrol_pump = %s AND fp.effective_from IS NOT NULL
+		ORDER BY fpd.fuel_type, fp.effective_from, fp.creation
+		""",
+		petrol_pump,
+	)
+	intervals = {}
+	for fuel_type, effective_from, rate in rows:
+		starts, rates = intervals.setdefault(fuel_type, ([], []))
+		starts.append(get_datetime(effective_from))
+		rates.append(flt(rate))
+	frappe.cache().set_value(key, intervals)
+	return intervals
+
+
+def clear_price_cache(petrol_pump):
+	frappe.cache().delete_value(_cache_key(petrol_pump))
+
+
+def rate_from_intervals(intervals, fuel_type, as_of):
+	starts, rates = intervals.get(fuel_type) or ((), ())
+	idx = bisect_right(starts, get_datetime(as_of))
+	return rates[idx - 1] if idx else 0
+
+
+def get_rate(petrol_pump, fuel_type, as_of=None):
+	"""Rate of a fuel type at a pump as of a datetime (default: now)."""
+	if not (petrol_pump and fuel_type):
+		return 0
+	return rate_from_intervals(get_price_intervals(petrol_pump), fuel_type, as_of or now_datetime())
+
+
+def get_rates(petrol_pump, fuel_types, as_of=None):
+	if not petrol_pump:
+		return dict.fromkeys(fuel_types, 0)
+	intervals = get_price_intervals(petrol_pump)
+	as_of = as_of or now_datetime()
+	return {fuel_type: rate_from_intervals(intervals, fuel_type, as_of) for fuel_type in fuel_types}
+
+
+def closing_as_of(reading_date):
+	"""Day Closings are priced at the rate in force at the end of their reading date."""
+	if not reading_date:
+		return now_datetime()
+	return get_datetime(f"{getdate(reading_date)} 23:59:59")
+
+
+def shift_as_of(reading_date, shift_start=None):
+	"""Shift Readings are priced as of the shift start, falling back to the end of the day."""
+	return get_datetime(shift_start) if shift_start else closing_as_of(reading_date)
+
+
+def get_active_prices(petrol_pumps):
+	"""{petrol_pump: {fuel_type: rate}} of the currently active Fuel Price of each pump, one query."""
+	if not petrol_pumps:
+		return {}
+	active = {}
+	for petrol_pump, fuel_type, rate in frappe.db.sql(
+		"""
+		SELECT fp.petrol_pump, fpd.fuel_type, fpd.price_per_liter
+		FROM `tabFuel Price` fp
+		JOIN `tabFuel Price Detail` fpd ON fpd.parent = fp.name AND fpd.parenttype = 'Fuel Price'
+		WHERE fp.is_active = 1 AND fp.petrol_pump IN %s
+		ORDER BY fp.effective_from
+		""",
+		(tuple(petrol_pumps),),
+	):
+		active.setdefault(petrol_pump, {})[fuel_type] = flt(rate)
+	return active
+
+
+def get_price_history(petrol_pump=None, fuel_type=None, from_date=None, to_date=None, active_only=False):
+	"""Fuel Price Detail rows with their parent price, newest first per (pump, fuel type)."""
+	conditions = []
+	if petrol_pump:
+		conditions.append("fp.petrol_pump = %(petrol_pump)s")
+	if fuel_type:
+		conditions.append("fpd.fuel_type = %(fuel_type)s")
+	if from_date:
+		conditions.append("fp.effective_from >= %(from_date)s")
+	if to_date:
+		conditions.append("fp.effective_from <= %(to_date)s")
+	if active_only:
+		conditions.append("fp.is_active = 1")
+
+	return frappe.db.sql(
+		f"""
+		SELECT fp.name AS fuel_price_name, fp.petrol_pump, fpd.fuel_type, fpd.price_per_liter,
+			fp.effective_from, fp.is_active
+		FROM `tabFuel Price Detail` fpd
+		JOIN `tabFuel Price` fp ON fpd.parent = fp.name AND fpd.parenttype = 'Fuel Price'
+		{"WHERE " + " AND ".join(conditions) if conditions else ""}
+		ORDER BY fp.petrol_pump, fpd.fuel_type, fp.effective_from DESC
+		""",
+		{"petrol_pump": petrol_pump, "fuel_type": fuel_type, "from_date": from_date, "to_date": to_date},
+		as_dict=True,
+	)
+
+
+def get_superseded_prices(coverage, exclude=()):
+	"""Active Fuel Prices made obsolete by new prices covering `coverage`.
+
+	`coverage` maps petrol_pump to the fuel types newly priced there. An active
+	price is superseded when every fuel type it carries is covered; a price
+	still carrying another fuel type stays active for that fuel type.
+	"""
+	if not coverage:
+		return []
+	carried = {}
+	for name, petrol_pump, fuel_type in frappe.db.sql(
+		"""
+		SELECT fp.name, fp.petrol_pump, fpd.fuel_type
+		FROM `tabFuel Price` fp
+		LEFT JOIN `tabFuel Price Detail` fpd ON fpd.parent = fp.name AND fpd.parenttype = 'Fuel Price'
+		WHERE fp.petrol_pump IN %(pumps)s AND fp.is_active = 1 AND fp.name NOT IN %(exclude)s
+		""",
+		{"pumps": tuple(coverage), "exclude": tuple(exclude) or ("",)},
+	):
+		fuel_types = carried.setdefault((name, petrol_pump), set())
+		if fuel_type:
+			fuel_types.add(fuel_type)
+	return [
+		name
+		for (name, petrol_pump), fuel_types in carried.items()
+		if fuel_types <= set(coverage[petrol_pump])
+	]
+
+
+def deactivate_prices(names):
+	"""Deactivate Fuel Prices by name with one UPDATE."""
+	if not names:
+		return
+	frappe.db.sql(
+		"UPDATE `tabFuel Price` SET is_active = 0 WHERE name IN %s",
+		(tuple(names),),
+	)
+
+
+def deactivate_superseded_prices(coverage, exclude=()):
+	names = get_superseded_prices(coverage, exclude)
+	deactivate_prices(names)
+	return names
+
+
+def apply_activation(doc):
+	"""Stage or activate a Fuel Price being saved and deactivate what it supersedes.
+
+	A price that takes effect in the future is only staged; the scheduler
+	activates it (and deactivates what it supersedes) at effective_from.
+	Unticking Pending Activation on a staged price withdraws it.
+	"""
+	if not doc.effective_from:
+		doc.effective_from = now_datetime()
+
+	staged = doc.is_active or doc.pending_activation
+	doc.pending_activation = 0
+	if staged:
+		if get_datetime(doc.effective_from) > now_datetime():
+			doc.is_active = 0
+			doc.pending_activation = 1
+		else:
+			# Also a staged price re-saved once due, e.g. moved to "now" before the scheduler ran
+			doc.is_active = 1
+	if doc.is_active and doc.petrol_pump:
+		fuel_types = {row.fuel_type for row in doc.get("fuel_prices") or [] if row.fuel_type}
+		deactivate_superseded_prices({doc.petrol_pump: fuel_types}, exclude=[doc.name])
+
+
+def prewarm_price_cache(petrol_pumps):
+	"""Rebuild the interval tables of the given pumps so the next lookup is warm."""
+	for petrol_pump in set(petrol_pumps):
+		clear_price_cache(petrol_pump)
+		get_price_intervals(petrol_pump)
+
+
+def activate_scheduled_prices():
+	"""Scheduler job (every minute): activate staged prices whose effective_from has passed.
+
+	All due prices are flipped with two bulk UPDATEs, whatever the number of
+	pumps: the latest due price per (pump, fuel type) becomes active and the
+	prices it supersedes inactive. Caches of the affected pumps are then rebuilt.
+	"""
+	now = now_datetime()
+	due = frappe.db.sql(
+		"""
+		SELECT fp.name, fp.petrol_pump, fpd.fuel_type
+		FROM `tabFuel Price` fp
+		LEFT JOIN `tabFuel Price Detail` fpd ON fpd.parent = fp.name AND fpd.parenttype = 'Fuel Price'
+		WHERE fp.pending_activation = 1 AND fp.effective_from <= %s
+		ORDER BY fp.petrol_pump, fp.effective_from DESC, fp.creation DESC
+		""",
+		now,
+		as_dict=True,
+	)
+	if not due:
+		prewarm_upcoming_prices(now)
+		return
+
+	# Walking newest first, a due price is activated if it still prices a fuel
+	# type no later due price of its pump covers
+	prices = {}
+	for row in due:
+		prices.setdefault((row.petrol_pump, row.name), set())
+		if row.fuel_type:
+			prices[(row.petrol_pump, row.name)].add(row.fuel_type)
+
+	coverage = {}
+	active = []
+	for (petrol_pump, name), fuel_types in prices.items():
+		covered = coverage.setdefault(petrol_pump, set())
+		if fuel_types - covered:
+			active.append(name)
+		covered |= fuel_types
+
+	pumps = tuple(coverage)
+	deactivate_superseded_prices(coverage, exclude=active)
+	frappe.db.sql(
+		"""
+		UPDATE `tabFuel Price`
+		SET is_active = (name IN %(active)s), pending_activation = 0
+		WHERE name IN %(due)s
+		""",
+		{"active": tuple(active) or ("",), "due": tuple(name for _pump, name in prices)},
+	)
+	frappe.db.commit()
+
+	prewarm_price_cache(pumps)
+	prewarm_upcoming_prices(now)
+
+
+def prewarm_upcoming_prices(now=None, minutes=5):
+	"""Warm the caches of pumps with a price taking effect in the next few minutes."""
+	now = now or now_datetime()
+	pumps = frappe.get_all(
+		"Fuel Price",
+		filters={
+			"pending_activation": 1,
+			"effective_from": ["between", [now, add_to_date(now, minutes=minutes)]],
+		},
+		pluck="petrol_pump",
+		distinct=True,
+	)
+	prewarm_price_cache(pumps)
+
+
+@frappe.whitelist()
+def reprice_drafts(petrol_pump, from_date=None):
+	"""Re-rate draft Day Closings and Shift Readings affected by a price edit.
+
+	One query per pump reads every draft nozzle and credit row dated on or after
+	`from_date` with the rate it carries. Rates are compared in memory against
+	the interval table and only drafts holding a stale rate are re-saved (with
+	their rates cleared, so the save re-resolves them as of their own date).
+	Shift Readings go first so rolled-up Day Closings pick up the new rates.
+	"""
+	frappe.has_permission("Day Closing", "write", throw=True)
+	clear_price_cache(petrol_pump)
+
+	rows = frappe.db.sql(
+		"""
+		SELECT 'Shift Reading' AS doctype, sr.name, sr.reading_date, sh.start_time AS shift_start,
+			nrd.fuel_type, nrd.rate
+		FROM `tabShift Reading` sr
+		JOIN `tabNozzle Reading Detail` nrd ON nrd.parent = sr.name AND nrd.parenttype = 'Shift Reading'
+		LEFT JOIN `tabShift` sh ON sh.name = sr.shift
+		WHERE sr.docstatus = 0 AND sr.petrol_pump = %(petrol_pump)s AND sr.reading_date >= %(from_date)s
+		UNION ALL
+		SELECT 'Day Closing', dc.name, dc.reading_date, NULL, nrd.fuel_type, nrd.rate
+		FROM `tabDay Closing` dc
+		JOIN `tabNozzle Reading Detail` nrd ON nrd.parent = dc.name AND nrd.parenttype = 'Day Closing'
+		WHERE dc.docstatus = 0 AND dc.petrol_pump = %(petrol_pump)s AND dc.reading_date >= %(from_date)s
+		UNION ALL
+		SELECT 'Day Closing', dc.name, dc.reading_date, NULL, cd.fuel_type, cd.rate
+		FROM `tabDay Closing` dc
+		JOIN `tabDay Closing Credit Detail` cd ON cd.parent = dc.name AND cd.parenttype = 'Day Closing'
+		WHERE dc.docstatus = 0 AND dc.petrol_pump = %(petrol_pump)s AND dc.reading_date >= %(from_date)s
+		""",
+		{"petrol_pump": petrol_pump, "from_date": getdate(from_date) if from_date else "1900-01-01"},
+		as_dict=True,
+	)
+
+	intervals = get_price_intervals(petrol_pump)
+	stale = {}
+	for row in rows:
+		if not row.fuel_type:
+			continue
+		as_of = (
+			shift_as_of(row.reading_date, row.shift_start)
+			if row.doctype == "Shift Reading"
+			else closing_as_of(row.reading_date)
+		)
+		if flt(row.rate) != flt(rate_from_intervals(intervals, row.fuel_type, as_of)):
+			stale.setdefault((row.doctype, row.name), None)
+
+	order = sorted(stale, key=lambda key: key[0] != "Shift Reading")
+	for doctype, name in order:
+		doc = frappe.get_doc(doctype, name)
+		for row in doc.get("nozzle_readings") or []:
+			row.rate = 0
+		for row in doc.get("credit_details") or []:
+			row.rate = 0
+		doc.save()
+
+	frappe.msgprint(f"Re-priced {len(order)} draft document(s) for {petrol_pump}")
+	return [name for _doctype, name in order]
@@ -0,0 +1,91 @@
+"""Cold-start import cost of the app's controllers and background job modules.
+
+Every web and background worker imports the doctype controllers it serves,
+and every `bench execute` or scheduler job imports its module in a fresh
+process, so a heavy top-level import is paid again on each cold start.
+Controllers therefore import ERPNext only at the call sites that need it.
+
+Each measurement runs `python -X importtime` in a new interpreter with
+frappe already imported, so the figures are what the app itself adds on
+top of the framework, and reports whether ERPNext's stock utilities were
+pulled in along the way.
+
+	bench execute petrol_pump_v2.petrol_pump_v2.import_benchmark.benchmark
+"""
+
+import subprocess
+import sys
+
+APP = "petrol_pump_v2.petrol_pump_v2"
+
+CONTROLLERS = tuple(
+	f"{APP}.doctype.{name}.{name}"
+	for name in (
+		"day_closing",
+		"shift_reading",
+		"dip_reading",
+		"tank_dip_reading",
+		"fuel_tank",
+		"fuel_transfer",
+		"fuel_testing",
+		"fuel_delivery",
+	)
+)
+
+# Scheduler jobs and doc_events handlers from hooks.py
+JOB_MODULES = (
+	f"{APP}.fuel_pricing",
+	f"{APP}.wet_stock",
+	f"{APP}.stock_forecast",
+	f"{APP}.tank_stock",
+	f"{APP}.credit_exposure",
+)
+
+HEAVY_MODULES = ("erpnext.stock.utils", "erpnext.stock.stock_ledger")
+
+
+def measure_imports(modules):
+	"""(milliseconds, heavy modules loaded) to import `modules` in a fresh interpreter after frappe."""
+	code = "import frappe; " + "; ".join(f"import {module}" for module in modules)
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code],
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+
+	# Lines read "import time: self [us] | cumulative | package", nested imports indented
+	microseconds = 0
+	loaded = set()
+	after_frappe = False
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "|" not in line:
+			continue
+		_self, cumulative, package = line.split("|")
+		if not cumulative.strip().isdigit():
+			continue
+		name = package.rstrip()
+		if not after_frappe:
+			after_frappe = name == " frappe"
+			continue
+		loaded.add(name.strip())
+		if not name.startswith("  "):
+			microseconds += int(cumulative)
+	return round(microseconds / 1000, 1), sorted(loaded.intersection(HEAVY_MODULES))
+
+
+def benchmark():
+	"""Print and return the cold import cost per controller, per worker and per job module."""
+	results = []
+	for label, modules in (
+		*((module.rsplit(".", 1)[-1], [module]) for module in CONTROLLERS),
+		("all controllers (per worker)", list(CONTROLLERS)),
+		*((f"job: {module.rsplit('.', 1)[-1]}", [module]) for module in JOB_MODULES),
+	):
+		ms, heavy = measure_imports(modules)
+		results.append({"modules": label, "ms": ms, "erpnext_stock": ", ".join(heavy) or "-"})
+
+	width = max(len(row["modules"]) for row in results)
+	for row in results:
+		print(f"{row['modules']:<{width}}  {row['ms']:>8.1f} ms  {row['erpnext_stock']}")
+	return results
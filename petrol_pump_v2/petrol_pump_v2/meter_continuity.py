@@ -0,0 +1,227 @@
+"""Meter continuity and rollover validation for nozzle totalizer readings.
+
+Every submitted Day Closing / Shift Reading extends a per-nozzle chain of
+readings. The head of that chain lives on the Nozzle master (last_reading,
+last_reading_date), which is indexed by (petrol_pump, nozzle_name), so a new
+reading is checked against its predecessor in O(1) after a single query per
+document. `audit_readings` replays the whole history in one pass per nozzle.
+"""
+
+import frappe
+from frappe.utils import flt, getdate
+
+from petrol_pump_v2.petrol_pump_v2.closing_core import (
+	METER_REPLACED,
+	ROLLOVER,
+	ROLLOVER_WINDOW,
+	dispensed_liters,
+	is_rollover,
+)
+
+# Readings may differ by this much (liters) before a gap/overlap is reported
+GAP_TOLERANCE = 0.01
+
+OK = "OK"
+GAP = "Gap"
+OVERLAP = "Overlap"
+BACKWARD = "Backward"
+OUT_OF_ORDER = "Out of Order"
+
+BLOCKING_STATUSES = (BACKWARD,)
+
+
+def check_reading(head, previous_reading, current_reading, reading_date=None, meter_event=None):
+	"""Classify one reading against the chain head.
+
+	`head` is a dict with last_reading, last_reading_date and meter_capacity;
+	a None last_reading means the nozzle has no history to compare against.
+	Returns (status, message).
+	"""
+	previous_reading = flt(previous_reading)
+	current_reading = flt(current_reading)
+	meter_capacity = flt((head or {}).get("meter_capacity"))
+
+	if current_reading < previous_reading and meter_event != METER_REPLACED:
+		if is_rollover(previous_reading, current_reading, meter_capacity, meter_event):
+			return ROLLOVER, (
+				f"meter rolled over at {meter_capacity}: "
+				f"{dispensed_liters(previous_reading, current_reading, meter_capacity, meter_event)} L dispensed"
+			)
+		return BACKWARD, f"current reading {current_reading} is below previous reading {previous_reading}"
+
+	if meter_event == METER_REPLACED:
+		return METER_REPLACED, "meter replaced, chain restarted"
+	if not head:
+		return OK, ""
+
+	last_date = head.get("last_reading_date")
+	if last_date and reading_date and getdate(reading_date) < getdate(last_date):
+		return OUT_OF_ORDER, f"reading date {reading_date} is before last posted reading ({last_date})"
+
+	if head.get("last_reading") is None:
+		return OK, ""
+	last_reading = flt(head.get("last_reading"))
+	if previous_reading - last_reading > GAP_TOLERANCE:
+		return GAP, (
+			f"previous reading {previous_reading} is ahead of last posted reading {last_reading}; "
+			f"{flt(previous_reading - last_reading)} L were never closed"
+		)
+	if last_reading - previous_reading > GAP_TOLERANCE:
+		return OVERLAP, (
+			f"previous reading {previous_reading} is behind last posted reading {last_reading}; "
+			f"{flt(last_reading - previous_reading)} L would be counted twice"
+		)
+	return OK, ""
+
+
+def get_chain_heads(petrol_pump):
+	"""Chain head per nozzle_name for a pump, from one indexed query."""
+	rows = frappe.get_all(
+		"Nozzle",
+		filters={"petrol_pump": petrol_pump},
+		fields=["nozzle_name", "last_reading", "last_reading_date", "meter_capacity"],
+	)
+	return {r.nozzle_name: r for r in rows}
+
+
+def validate_continuity(doc, throw=False):
+	"""Stamp continuity_status on each nozzle row and report problems.
+
+	Warnings are shown on save; with `throw=True` (used from before_submit)
+	backward readings that are neither a rollover nor a meter replacement block
+	the document.
+	"""
+	if not doc.petrol_pump:
+		return []
+
+	heads = get_chain_heads(doc.petrol_pump)
+	problems = []
+	for row in doc.nozzle_readings or []:
+		if not row.nozzle_number:
+			continue
+		head = heads.get(row.nozzle_number)
+		status, message = check_reading(
+			head,
+			row.previous_reading,
+			row.current_reading,
+			doc.reading_date,
+			getattr(row, "meter_event", None),
+		)
+		if status == ROLLOVER and not getattr(row, "meter_event", None):
+			row.meter_event = ROLLOVER
+		row.continuity_status = status
+		if status not in (OK, ROLLOVER, METER_REPLACED):
+			problems.append((status, f"Nozzle {row.nozzle_number}: {message}"))
+
+	if not problems:
+		return problems
+
+	blocking = [m for s, m in problems if s in BLOCKING_STATUSES]
+	if throw and blocking:
+		frappe.throw(
+			"Meter continuity check failed:<br>"
+			+ "<br>".join(blocking)
+			+ "<br><br>Set Meter Event to <b>Meter Replaced</b> if the totalizer was swapped, "
+			"or set Meter Capacity on the Nozzle if the meter rolled over."
+		)
+
+	frappe.msgprint(
+		"Meter continuity warnings:<br>" + "<br>".join(f"<b>{s}</b> - {m}" for s, m in problems),
+		indicator="orange",
+		alert=not throw,
+	)
+	return problems
+
+
+def audit_readings(petrol_pump=None, from_date=None, to_date=None):
+	"""Replay submitted Day Closing and Shift Reading meter rows in date order.
+
+	Reads every row with one query, then walks each nozzle's chain once,
+	carrying the head forward exactly as validate_continuity would have seen it.
+	Returns one dict per reading that is not OK.
+	"""
+	conditions = ["parent_doc.docstatus = 1"]
+	values = {}
+	if petrol_pump:
+		conditions.append("parent_doc.petrol_pump = %(petrol_pump)s")
+		values["petrol_pump"] = petrol_pump
+	if to_date:
+		conditions.append("parent_doc.reading_date <= %(to_date)s")
+		values["to_date"] = to_date
+	where = " AND ".join(conditions)
+
+	rows = frappe.db.sql(
+		f"""
+		SELECT * FROM (
+			SELECT 'Day Closing' AS voucher_type, parent_doc.name AS voucher_no, parent_doc.petrol_pump,
+				parent_doc.reading_date, parent_doc.creation, nrd.nozzle_number, nrd.previous_reading,
+				nrd.current_reading, nrd.meter_event
+			FROM `tabDay Closing` parent_doc
+			JOIN `tabNozzle Reading Detail` nrd
+				ON nrd.parent = parent_doc.name AND nrd.parenttype = 'Day Closing'
+			WHERE {where} AND parent_doc.rollup_shift_readings = 0
+			UNION ALL
+			SELECT 'Shift Reading', parent_doc.name, parent_doc.petrol_pump,
+				parent_doc.reading_date, parent_doc.creation, nrd.nozzle_number, nrd.previous_reading,
+				nrd.current_reading, nrd.meter_event
+			FROM `tabShift Reading` parent_doc
+			JOIN `tabNozzle Reading Detail` nrd
+				ON nrd.parent = parent_doc.name AND nrd.parenttype = 'Shift Reading'
+			WHERE {where}
+		) chain
+		ORDER BY petrol_pump, nozzle_number, reading_date, creation
+		""",
+		values,
+		as_dict=True,
+	)
+
+	nozzles = {
+		(r.petrol_pump, r.nozzle_name): r
+		for r in frappe.get_all(
+			"Nozzle",
+			filters={"petrol_pump": petrol_pump} if petrol_pump else {},
+			fields=["petrol_pump", "nozzle_name", "meter_capacity", "opening_reading"],
+		)
+	}
+
+	issues = []
+	head = None
+	current_key = None
+	for row in rows:
+		key = (row.petrol_pump, row.nozzle_number)
+		if key != current_key:
+			# Chain starts at the nozzle's opening reading, when one was recorded
+			current_key = key
+			nozzle = nozzles.get(key) or frappe._dict()
+			head = {
+				"last_reading": nozzle.opening_reading if flt(nozzle.opening_reading) else None,
+				"last_reading_date": None,
+				"meter_capacity": flt(nozzle.meter_capacity),
+			}
+
+		status, message = check_reading(
+			head,
+			row.previous_reading,
+			row.current_reading,
+			row.reading_date,
+			row.meter_event,
+		)
+		if status != OK and (not from_date or getdate(row.reading_date) >= getdate(from_date)):
+			issues.append(
+				{
+					"petrol_pump": row.petrol_pump,
+					"nozzle_number": row.nozzle_number,
+					"reading_date": row.reading_date,
+					"voucher_type": row.voucher_type,
+					"voucher_no": row.voucher_no,
+					"previous_reading": flt(row.previous_reading),
+					"current_reading": flt(row.current_reading),
+					"status": status,
+					"message": message,
+				}
+			)
+
+		head["last_reading"] = row.current_reading
+		head["last_reading_date"] = row.reading_date
+
+	return issues
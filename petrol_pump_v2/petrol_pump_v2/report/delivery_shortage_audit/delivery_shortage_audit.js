@@ -0,0 +1,48 @@
+frappe.query_reports["Delivery Shortage Audit"] = {
+	"filters": [
+		{
+			"fieldname": "from_date",
+			"label": __("From Date"),
+			"fieldtype": "Date",
+			"default": frappe.datetime.month_start(),
+			"reqd": 1
+		},
+		{
+			"fieldname": "to_date",
+			"label": __("To Date"),
+			"fieldtype": "Date",
+			"default": frappe.datetime.get_today(),
+			"reqd": 1
+		},
+		{
+			"fieldname": "petrol_pump",
+			"label": __("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "supplier",
+			"label": __("Supplier"),
+			"fieldtype": "Link",
+			"options": "Supplier",
+			"width": 150
+		},
+		{
+			"fieldname": "fuel_tank",
+			"label": __("Fuel Tank"),
+			"fieldtype": "Link",
+			"options": "Fuel Tank",
+			"width": 130
+		}
+	],
+
+	formatter: function (value, row, column, data, default_formatter) {
+		value = default_formatter(value, row, column, data);
+		if (column.fieldname === "status" && data) {
+			const colors = { "Short": "red", "Excess": "orange", "Within Tolerance": "green" };
+			value = `<span class="indicator-pill ${colors[data.status] || "gray"}">${value}</span>`;
+		}
+		return value;
+	}
+};
@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Atiq and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.delivery_reconciliation import EXCESS, SHORT, audit_deliveries
+
+
+def execute(filters=None):
+	filters = filters or {}
+	if not filters.get("from_date") or not filters.get("to_date"):
+		frappe.throw(_("From Date and To Date are required"))
+
+	columns = get_columns()
+	data = audit_deliveries(
+		filters.get("from_date"),
+		filters.get("to_date"),
+		petrol_pump=filters.get("petrol_pump"),
+		supplier=filters.get("supplier"),
+		fuel_tank=filters.get("fuel_tank"),
+	)
+	summary = get_summary(data)
+
+	return columns, data, None, None, summary
+
+
+def get_columns():
+	return [
+		{
+			"fieldname": "name",
+			"label": _("Fuel Delivery"),
+			"fieldtype": "Link",
+			"options": "Fuel Delivery",
+			"width": 150
+		},
+		{
+			"fieldname": "delivery_date",
+			"label": _("Date"),
+			"fieldtype": "Date",
+			"width": 100
+		},
+		{
+			"fieldname": "fuel_tank",
+			"label": _("Tank"),
+			"fieldtype": "Link",
+			"options": "Fuel Tank",
+			"width": 120
+		},
+		{
+			"fieldname": "fuel_type",
+			"label": _("Fuel Type"),
+			"fieldtype": "Link",
+			"options": "Fuel Type",
+			"width": 110
+		},
+		{
+			"fieldname": "supplier",
+			"label": _("Supplier"),
+			"fieldtype": "Link",
+			"options": "Supplier",
+			"width": 140
+		},
+		{
+			"fieldname": "supplier_invoice_no",
+			"label": _("Invoice No"),
+			"fieldtype": "Data",
+			"width": 110
+		},
+		{
+			"fieldname": "invoiced_qty",
+			"label": _("Invoiced (L)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 2
+		},
+		{
+			"fieldname": "received_qty",
+			"label": _("Received (L)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 2
+		},
+		{
+			"fieldname": "corrected_received_qty",
+			"label": _("Received at 15 °C (L)"),
+			"fieldtype": "Float",
+			"width": 140,
+			"precision": 2
+		},
+		{
+			"fieldname": "shortage_qty",
+			"label": _("Shortage (L)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 2
+		},
+		{
+			"fieldname": "shortage_percent",
+			"label": _("Shortage %"),
+			"fieldtype": "Percent",
+			"width": 100
+		},
+		{
+			"fieldname": "status",
+			"label": _("Status"),
+			"fieldtype": "Data",
+			"width": 130
+		},
+		{
+			"fieldname": "recorded_shortage_qty",
+			"label": _("Shortage at Submit (L)"),
+			"fieldtype": "Float",
+			"width": 150,
+			"precision": 2
+		},
+		{
+			"fieldname": "purchase_receipt",
+			"label": _("Purchase Receipt"),
+			"fieldtype": "Link",
+			"options": "Purchase Receipt",
+			"width": 150
+		}
+	]
+
+
+def get_summary(data):
+	invoiced = sum(flt(row.invoiced_qty) for row in data)
+	shortage = sum(flt(row.shortage_qty) for row in data)
+	return [
+		{"value": len(data), "label": _("Deliveries"), "datatype": "Int"},
+		{"value": invoiced, "label": _("Invoiced (L)"), "datatype": "Float"},
+		{
+			"value": shortage,
+			"label": _("Net Shortage (L)"),
+			"indicator": "Red" if shortage > 0 else "Green",
+			"datatype": "Float",
+		},
+		{
+			"value": sum(1 for row in data if row.status == SHORT),
+			"label": _("Short Deliveries"),
+			"indicator": "Red",
+			"datatype": "Int",
+		},
+		{
+			"value": sum(1 for row in data if row.status == EXCESS),
+			"label": _("Excess Deliveries"),
+			"indicator": "Orange",
+			"datatype": "Int",
+		},
+	]
@@ -1,9 +1,14 @@
 # Copyright (c) 2026, Atiq and contributors
 # For license information, please see license.txt
 
+import time
+from itertools import accumulate
+
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate, fmt_money
+from frappe.utils import add_to_date, flt, get_datetime, getdate, now_datetime
+
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import get_price_history
 
 
 def execute(filters=None):
@@ -73,6 +78,12 @@ def get_columns():
 			"fieldtype": "Percent",
 			"width": 100
 		},
+		{
+			"fieldname": "time_weighted_price",
+			"label": _("Time-Weighted Avg"),
+			"fieldtype": "Currency",
+			"width": 130
+		},
 		{
 			"fieldname": "fuel_price_name",
 			"label": _("Fuel Price ID"),
@@ -84,130 +95,140 @@ def get_columns():
 
 
 def get_data(filters):
-	conditions = get_conditions(filters)
-
-	data = frappe.db.sql(f"""
-		SELECT
-			fp.name as fuel_price_name,
-			fp.petrol_pump,
-			fpd.fuel_type,
-			fpd.price_per_liter,
-			fp.effective_from,
-			fp.is_active
-		FROM `tabFuel Price Detail` fpd
-		JOIN `tabFuel Price` fp ON fpd.parent = fp.name
-		WHERE 1=1
-		{conditions}
-		ORDER BY fp.petrol_pump, fpd.fuel_type, fp.effective_from DESC
-	""", filters, as_dict=1)
-
-	# Resolve fuel type names and calculate price changes
-	result = []
-	# Group by pump + fuel_type to find previous prices
-	prev_price_map = {}
-
-	for row in data:
-		# Resolve fuel type name
-		row["fuel_type_name"] = frappe.db.get_value(
-			"Fuel Type", row["fuel_type"], "fuel_type_name"
-		) or row["fuel_type"]
-
-		# Build key for tracking price changes
-		key = f"{row['petrol_pump']}::{row['fuel_type']}"
-
-		if key in prev_price_map:
-			# This is an older entry; the one before it was the "next" chronologically
-			prev_price_map[key]["previous_price"] = flt(row["price_per_liter"])
-			prev_price = flt(row["price_per_liter"])
-			curr_price = flt(prev_price_map[key]["price_per_liter"])
-			prev_price_map[key]["price_change"] = curr_price - prev_price
-			if prev_price > 0:
-				prev_price_map[key]["change_percent"] = (
-					(curr_price - prev_price) / prev_price
-				) * 100
-			else:
-				prev_price_map[key]["change_percent"] = 0
-
-		# Set defaults
-		row["previous_price"] = 0
-		row["price_change"] = 0
-		row["change_percent"] = 0
-
-		prev_price_map[key] = row
-		result.append(row)
-
-	return result
-
-
-def get_conditions(filters):
-	conditions = []
-
-	if filters.get("petrol_pump"):
-		conditions.append("fp.petrol_pump = %(petrol_pump)s")
-
-	if filters.get("fuel_type"):
-		conditions.append("fpd.fuel_type = %(fuel_type)s")
-
-	if filters.get("from_date"):
-		conditions.append("fp.effective_from >= %(from_date)s")
-
-	if filters.get("to_date"):
-		conditions.append("fp.effective_from <= %(to_date)s")
-
-	if filters.get("is_active"):
-		conditions.append("fp.is_active = 1")
+	to_date = getdate(filters.get("to_date")) if filters.get("to_date") else None
+	from_date = getdate(filters.get("from_date")) if filters.get("from_date") else None
+
+	# Prices before from_date are read too: they give the first row in range its
+	# previous price and open the time-weighted window
+	rows = get_price_history(
+		petrol_pump=filters.get("petrol_pump"),
+		fuel_type=filters.get("fuel_type"),
+		to_date=get_datetime(f"{to_date} 23:59:59") if to_date else None,
+		active_only=filters.get("is_active"),
+	)
+	fuel_names = dict(
+		frappe.get_all(
+			"Fuel Type",
+			filters={"name": ["in", list({row["fuel_type"] for row in rows})]},
+			fields=["name", "fuel_type_name"],
+			as_list=True,
+		)
+	) if rows else {}
+
+	window_end = min(get_datetime(f"{to_date} 23:59:59"), now_datetime()) if to_date else now_datetime()
+	window_start = get_datetime(from_date) if from_date else None
+	return analyse_history(rows, fuel_names, window_start, window_end)
+
+
+def analyse_history(rows, fuel_names, window_start, window_end):
+	"""Deltas and time-weighted averages of price rows, computed column-wise.
+
+	`rows` come ordered by pump, fuel type and effective_from descending, as
+	returned by get_price_history. Each column is pulled out once and the
+	previous price of a row is the next element of the price column within the
+	same (pump, fuel type) run, so no per-row lookups are needed.
+	"""
+	if not rows:
+		return []
+
+	keys = [(row["petrol_pump"], row["fuel_type"]) for row in rows]
+	prices = [flt(row["price_per_liter"]) for row in rows]
+	starts = [get_datetime(row["effective_from"]) for row in rows]
+
+	same_next = [a == b for a, b in zip(keys, keys[1:], strict=False)] + [False]
+	previous = [
+		nxt if same else 0 for nxt, same in zip(prices[1:] + [0], same_next, strict=True)
+	]
+	change = [
+		price - prev if prev else 0 for price, prev in zip(prices, previous, strict=True)
+	]
+	change_percent = [
+		delta / prev * 100 if prev else 0 for delta, prev in zip(change, previous, strict=True)
+	]
 
-	return " AND " + " AND ".join(conditions) if conditions else ""
+	# Runs of one (pump, fuel type): [run_start, run_end)
+	bounds = [0] + [i for i, same in enumerate(same_next, 1) if not same]
+	weighted = [0.0] * len(rows)
+	for run_start, run_end in zip(bounds, bounds[1:], strict=False):
+		average = time_weighted_average(
+			starts[run_start:run_end][::-1], prices[run_start:run_end][::-1], window_start, window_end
+		)
+		weighted[run_start:run_end] = [average] * (run_end - run_start)
+
+	data = []
+	for idx, row in enumerate(rows):
+		if window_start and starts[idx] < window_start:
+			continue
+		data.append(
+			{
+				"fuel_price_name": row["fuel_price_name"],
+				"petrol_pump": row["petrol_pump"],
+				"fuel_type": row["fuel_type"],
+				"fuel_type_name": fuel_names.get(row["fuel_type"]) or row["fuel_type"],
+				"price_per_liter": prices[idx],
+				"effective_from": starts[idx],
+				"is_active": row["is_active"],
+				"previous_price": previous[idx],
+				"price_change": change[idx],
+				"change_percent": change_percent[idx],
+				"time_weighted_price": weighted[idx],
+			}
+		)
+	return data
+
+
+def time_weighted_average(starts, prices, window_start, window_end):
+	"""Average price over [window_start, window_end], each price weighted by how long it applied.
+
+	`starts` are ascending effective_from datetimes. The window opens at the
+	first price if that is later than window_start.
+	"""
+	if not starts:
+		return 0
+	window_start = max(window_start or starts[0], starts[0])
+	if window_end <= window_start:
+		return prices[-1] if starts[-1] <= window_end else 0
+
+	total = 0.0
+	for start, end, price in zip(starts, starts[1:] + [window_end], prices, strict=True):
+		seconds = (min(end, window_end) - max(start, window_start)).total_seconds()
+		if seconds > 0:
+			total += price * seconds
+	return total / (window_end - window_start).total_seconds()
 
 
 def get_chart_data(data, filters):
 	if not data:
 		return None
 
-	# Group by fuel type for chart lines
-	fuel_types = {}
-	dates = []
-
-	for row in data:
-		ft = row.get("fuel_type_name") or row.get("fuel_type")
-		if ft not in fuel_types:
-			fuel_types[ft] = {}
-
-		date_str = str(row["effective_from"])[:10]
-		fuel_types[ft][date_str] = flt(row["price_per_liter"])
-
-		if date_str not in dates:
-			dates.append(date_str)
-
-	dates.sort()
+	# Latest price per (fuel type, date); data runs newest first per pump/fuel
+	# type, so walking it backwards leaves the latest value in place
+	by_fuel = {}
+	for row in reversed(data):
+		by_fuel.setdefault(row["fuel_type_name"], {})[str(row["effective_from"])[:10]] = row["price_per_liter"]
 
-	# Build datasets - fill forward prices for dates where a fuel type has no entry
-	datasets = []
+	dates = sorted({day for prices in by_fuel.values() for day in prices})
 	colors = ["#e74c3c", "#3498db", "#2ecc71", "#f39c12", "#9b59b6", "#1abc9c"]
 
-	for idx, (ft, prices) in enumerate(fuel_types.items()):
-		values = []
-		last_price = 0
-		for d in dates:
-			if d in prices:
-				last_price = prices[d]
-			values.append(last_price)
-
-		datasets.append({
-			"name": ft,
-			"values": values
-		})
+	# Forward fill: carry the last known price over dates without an entry
+	datasets = [
+		{
+			"name": fuel,
+			"values": list(
+				accumulate(
+					(prices.get(day) for day in dates),
+					lambda last, value: last if value is None else value,
+					initial=0,
+				)
+			)[1:][-50:],
+		}
+		for fuel, prices in by_fuel.items()
+	]
 
 	return {
 		"data": {
 			"labels": dates[-50:],
-			"datasets": [
-				{
-					"name": ds["name"],
-					"values": ds["values"][-50:]
-				}
-				for ds in datasets
-			]
+			"datasets": datasets
 		},
 		"type": "line",
 		"colors": colors[:len(datasets)],
@@ -215,3 +236,33 @@ def get_chart_data(data, filters):
 			"xIsSeries": 1
 		}
 	}
+
+
+def benchmark(pumps=300, years=5, changes_per_month=2, fuel_types=("Petrol", "Diesel", "Hi-Octane")):
+	"""Time analyse_history and get_chart_data on synthetic history; runs without a site.
+
+	python -c "from petrol_pump_v2.petrol_pump_v2.report.fuel_price_history.fuel_price_history import benchmark; benchmark()"
+	"""
+	changes = years * 12 * changes_per_month
+	first = get_datetime("2021-01-01 06:00:00")
+	rows = [
+		{
+			"fuel_price_name": f"FPRICE-{pump}-{i}",
+			"petrol_pump": f"PUMP-{pump:03d}",
+			"fuel_type": fuel_type,
+			"price_per_liter": 250 + (i * 7 + pump) % 40,
+			"effective_from": add_to_date(first, days=i * 365 * years // changes),
+			"is_active": int(i == changes - 1),
+		}
+		for pump in range(pumps)
+		for fuel_type in fuel_types
+		for i in reversed(range(changes))
+	]
+	fuel_names = {fuel_type: fuel_type for fuel_type in fuel_types}
+
+	started = time.perf_counter()
+	data = analyse_history(rows, fuel_names, get_datetime("2022-01-01"), get_datetime("2025-12-31 23:59:59"))
+	get_chart_data(data, {})
+	result = {"rows": len(rows), "ms": round((time.perf_counter() - started) * 1000, 2)}
+	print(result)
+	return result
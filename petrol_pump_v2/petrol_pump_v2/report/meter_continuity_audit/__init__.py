@@ -0,0 +1,2 @@
+# Meter Continuity Audit Report
+
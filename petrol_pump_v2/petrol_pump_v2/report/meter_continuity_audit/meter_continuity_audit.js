@@ -0,0 +1,30 @@
+frappe.query_reports["Meter Continuity Audit"] = {
+	"filters": [
+		{
+			"fieldname": "petrol_pump",
+			"label": __("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "from_date",
+			"label": __("From Date"),
+			"fieldtype": "Date",
+			"width": 100
+		},
+		{
+			"fieldname": "to_date",
+			"label": __("To Date"),
+			"fieldtype": "Date",
+			"width": 100,
+			"default": frappe.datetime.get_today()
+		},
+		{
+			"fieldname": "status",
+			"label": __("Status"),
+			"fieldtype": "Select",
+			"options": "\nGap\nOverlap\nBackward\nRollover\nOut of Order\nMeter Replaced"
+		}
+	]
+};
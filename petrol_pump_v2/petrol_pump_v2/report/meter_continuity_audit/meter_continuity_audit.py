@@ -0,0 +1,110 @@
+# Copyright (c) 2026, Atiq and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from petrol_pump_v2.petrol_pump_v2.meter_continuity import audit_readings
+
+
+def execute(filters=None):
+	filters = filters or {}
+	columns = get_columns()
+	data = get_data(filters)
+	summary = get_summary(data)
+
+	return columns, data, None, None, summary
+
+
+def get_columns():
+	return [
+		{
+			"fieldname": "reading_date",
+			"label": _("Date"),
+			"fieldtype": "Date",
+			"width": 100
+		},
+		{
+			"fieldname": "petrol_pump",
+			"label": _("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "nozzle_number",
+			"label": _("Nozzle"),
+			"fieldtype": "Data",
+			"width": 100
+		},
+		{
+			"fieldname": "voucher_type",
+			"label": _("Voucher Type"),
+			"fieldtype": "Data",
+			"width": 110
+		},
+		{
+			"fieldname": "voucher_no",
+			"label": _("Voucher"),
+			"fieldtype": "Dynamic Link",
+			"options": "voucher_type",
+			"width": 140
+		},
+		{
+			"fieldname": "previous_reading",
+			"label": _("Previous Reading"),
+			"fieldtype": "Float",
+			"width": 130,
+			"precision": 2
+		},
+		{
+			"fieldname": "current_reading",
+			"label": _("Current Reading"),
+			"fieldtype": "Float",
+			"width": 130,
+			"precision": 2
+		},
+		{
+			"fieldname": "status",
+			"label": _("Status"),
+			"fieldtype": "Data",
+			"width": 110
+		},
+		{
+			"fieldname": "message",
+			"label": _("Details"),
+			"fieldtype": "Data",
+			"width": 400
+		}
+	]
+
+
+def get_data(filters):
+	data = audit_readings(
+		petrol_pump=filters.get("petrol_pump"),
+		from_date=filters.get("from_date"),
+		to_date=filters.get("to_date"),
+	)
+	if filters.get("status"):
+		data = [row for row in data if row["status"] == filters.get("status")]
+	return data
+
+
+def get_summary(data):
+	if not data:
+		return []
+
+	counts = {}
+	for row in data:
+		counts[row["status"]] = counts.get(row["status"], 0) + 1
+
+	indicators = {"Backward": "Red", "Gap": "Orange", "Overlap": "Orange", "Out of Order": "Orange"}
+	return [
+		{
+			"value": count,
+			"indicator": indicators.get(status, "Blue"),
+			"label": status,
+			"datatype": "Int"
+		}
+		for status, count in counts.items()
+	]
@@ -55,8 +55,8 @@ def get_columns():
 			"width": 130
 		},
 		{
-			"fieldname": "cash_variance",
-			"label": _("Total Variance"),
+			"fieldname": "card_sales",
+			"label": _("Card Sales"),
 			"fieldtype": "Currency",
 			"width": 130
 		},
@@ -75,9 +75,12 @@ def get_columns():
 	]
 
 def get_data(filters):
+	# Months covered by a submitted Period Close are read from its stored totals;
+	# only the remaining months are aggregated from Day Closing.
+	data = get_closed_periods(filters)
 	conditions = get_conditions(filters)
 	
-	data = frappe.db.sql(f"""
+	data += frappe.db.sql(f"""
 		SELECT
 			DATE_FORMAT(dc.reading_date, '%%Y-%%m') as month,
 			dc.petrol_pump,
@@ -85,15 +88,24 @@ def get_data(filters):
 			SUM(dc.total_sales) as total_sales,
 			SUM(dc.cash_amount) as cash_collected,
 			SUM(dc.credit_amount) as credit_sales,
-			SUM(dc.cash_variance) as cash_variance,
+			SUM(dc.card_amount) as card_sales,
 			COUNT(dc.name) as operating_days
 		FROM `tabDay Closing` dc
 		WHERE dc.docstatus = 1
 		{conditions}
+		AND NOT EXISTS (
+			SELECT 1 FROM `tabPeriod Close` pc
+			WHERE pc.docstatus = 1
+			AND pc.petrol_pump = dc.petrol_pump
+			AND dc.reading_date BETWEEN pc.period_start AND pc.period_end
+			{get_period_conditions(filters)}
+		)
 		GROUP BY month, dc.petrol_pump
-		ORDER BY month DESC, dc.petrol_pump
 	""", filters, as_dict=1)
 	
+	data.sort(key=lambda row: row.petrol_pump)
+	data.sort(key=lambda row: row.month, reverse=True)
+	
 	# Calculate averages
 	for row in data:
 		operating_days = flt(row.operating_days)
@@ -104,6 +116,38 @@ def get_data(filters):
 	
 	return data
 
+def get_closed_periods(filters):
+	conditions = get_period_conditions(filters)
+	if filters.get("petrol_pump"):
+		conditions += " AND pc.petrol_pump = %(petrol_pump)s"
+	
+	return frappe.db.sql(f"""
+		SELECT
+			DATE_FORMAT(pc.period_start, '%%Y-%%m') as month,
+			pc.petrol_pump,
+			pc.total_liters,
+			pc.total_sales,
+			pc.cash_amount as cash_collected,
+			pc.credit_amount as credit_sales,
+			pc.card_amount as card_sales,
+			pc.operating_days
+		FROM `tabPeriod Close` pc
+		WHERE pc.docstatus = 1
+		{conditions}
+	""", filters, as_dict=1)
+
+def get_period_conditions(filters):
+	"""Only periods lying wholly inside the date filter can be served from stored totals."""
+	conditions = []
+	
+	if filters.get("from_date"):
+		conditions.append("pc.period_start >= %(from_date)s")
+	
+	if filters.get("to_date"):
+		conditions.append("pc.period_end <= %(to_date)s")
+	
+	return " AND " + " AND ".join(conditions) if conditions else ""
+
 def get_conditions(filters):
 	conditions = []
 	
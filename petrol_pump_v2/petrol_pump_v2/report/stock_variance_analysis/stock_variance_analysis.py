@@ -49,12 +49,26 @@ def get_columns():
 			"precision": 2
 		},
 		{
-			"fieldname": "measured_stock",
-			"label": _("Physical Stock (L)"),
+			"fieldname": "observed_stock",
+			"label": _("Observed Stock (L)"),
 			"fieldtype": "Float",
 			"width": 140,
 			"precision": 2
 		},
+		{
+			"fieldname": "temperature",
+			"label": _("Temp (°C)"),
+			"fieldtype": "Float",
+			"width": 90,
+			"precision": 1
+		},
+		{
+			"fieldname": "measured_stock",
+			"label": _("Physical Stock at 15 °C (L)"),
+			"fieldtype": "Float",
+			"width": 170,
+			"precision": 2
+		},
 		{
 			"fieldname": "variance",
 			"label": _("Variance (L)"),
@@ -85,29 +99,51 @@ def get_columns():
 def get_data(filters):
 	conditions = get_conditions(filters)
 	
+	# Single-tank Dip Readings and multi-tank Tank Dip Reading rows. The
+	# physical stock is the volume corrected to 15 °C (falling back to the
+	# observed volume for readings taken before correction was recorded)
 	data = frappe.db.sql(f"""
-		SELECT
-			dr.reading_date,
-			dr.petrol_pump,
-			drd.fuel_tank,
-			ft.fuel_type,
-			drd.system_stock,
-			drd.measured_stock,
-			drd.variance,
-			drd.temperature,
-			drd.water_level
-		FROM `tabDip Reading` dr
-		INNER JOIN `tabDip Reading Detail` drd ON drd.parent = dr.name
-		LEFT JOIN `tabFuel Tank` ft ON ft.name = drd.fuel_tank
-		WHERE dr.docstatus = 1
+		SELECT * FROM (
+			SELECT
+				dr.reading_date,
+				dr.petrol_pump,
+				dr.fuel_tank,
+				ft.fuel_type,
+				dr.system_stock,
+				dr.measured_dip AS observed_stock,
+				IF(dr.temperature_measured, dr.temperature, NULL) AS temperature,
+				IF(dr.temperature_measured, dr.corrected_dip, dr.measured_dip) AS measured_stock
+			FROM `tabDip Reading` dr
+			LEFT JOIN `tabFuel Tank` ft ON ft.name = dr.fuel_tank
+			WHERE dr.docstatus = 1
+			UNION ALL
+			SELECT
+				tdr.reading_date,
+				tdr.petrol_pump,
+				tdrd.fuel_tank,
+				tdrd.fuel_type,
+				tdrd.system_stock,
+				tdrd.measured_dip,
+				IF(tdrd.temperature_measured, tdrd.temperature, NULL),
+				IF(tdrd.temperature_measured, tdrd.corrected_dip, tdrd.measured_dip)
+			FROM `tabTank Dip Reading` tdr
+			INNER JOIN `tabTank Dip Reading Detail` tdrd
+				ON tdrd.parent = tdr.name AND tdrd.parenttype = 'Tank Dip Reading'
+			WHERE tdr.docstatus = 1
+		) readings
+		WHERE 1=1
 		{conditions}
-		ORDER BY dr.reading_date DESC, dr.petrol_pump
+		ORDER BY reading_date DESC, petrol_pump
 	""", filters, as_dict=1)
 	
+	# Latest valuation rate per fuel, one query for all rows
+	valuation_rates = get_valuation_rates({row.fuel_type for row in data if row.fuel_type})
+	
 	# Calculate variance percentage and value
 	for row in data:
 		system_stock = flt(row.system_stock)
-		variance = flt(row.variance)
+		variance = flt(row.measured_stock) - system_stock
+		row['variance'] = variance
 		
 		# Variance percentage
 		if system_stock:
@@ -115,18 +151,7 @@ def get_data(filters):
 		else:
 			row['variance_pct'] = 0
 		
-		# Get valuation rate to calculate value impact
-		valuation_rate = frappe.db.get_value(
-			"Stock Ledger Entry",
-			{
-				"item_code": row.fuel_type,
-				"is_cancelled": 0
-			},
-			"valuation_rate",
-			order_by="posting_date desc, posting_time desc"
-		) or 0
-		
-		row['variance_value'] = variance * flt(valuation_rate)
+		row['variance_value'] = variance * flt(valuation_rates.get(row.fuel_type))
 		
 		# Status based on variance
 		abs_variance_pct = abs(row['variance_pct'])
@@ -141,20 +166,35 @@ def get_data(filters):
 	
 	return data
 
+def get_valuation_rates(fuel_types):
+	if not fuel_types:
+		return {}
+	return dict(frappe.db.sql("""
+		SELECT item_code, valuation_rate FROM (
+			SELECT item_code, valuation_rate,
+				ROW_NUMBER() OVER (
+					PARTITION BY item_code ORDER BY posting_date DESC, posting_time DESC, creation DESC
+				) AS rn
+			FROM `tabStock Ledger Entry`
+			WHERE item_code IN %s AND is_cancelled = 0
+		) sle
+		WHERE rn = 1
+	""", (tuple(fuel_types),)))
+
 def get_conditions(filters):
 	conditions = []
 	
 	if filters.get("from_date"):
-		conditions.append("dr.reading_date >= %(from_date)s")
+		conditions.append("reading_date >= %(from_date)s")
 	
 	if filters.get("to_date"):
-		conditions.append("dr.reading_date <= %(to_date)s")
+		conditions.append("reading_date <= %(to_date)s")
 	
 	if filters.get("petrol_pump"):
-		conditions.append("dr.petrol_pump = %(petrol_pump)s")
+		conditions.append("petrol_pump = %(petrol_pump)s")
 	
 	if filters.get("fuel_tank"):
-		conditions.append("drd.fuel_tank = %(fuel_tank)s")
+		conditions.append("fuel_tank = %(fuel_tank)s")
 	
 	return " AND " + " AND ".join(conditions) if conditions else ""
 
@@ -0,0 +1,46 @@
+frappe.query_reports["Tank Reorder List"] = {
+	"filters": [
+		{
+			"fieldname": "petrol_pump",
+			"label": __("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "fuel_type",
+			"label": __("Fuel Type"),
+			"fieldtype": "Link",
+			"options": "Fuel Type",
+			"width": 130
+		},
+		{
+			"fieldname": "show_all",
+			"label": __("Show All Tanks"),
+			"fieldtype": "Check",
+			"default": 0
+		}
+	],
+
+	onload: function (report) {
+		report.page.add_inner_button(__("Run Forecast Now"), function () {
+			frappe.call({
+				method: "petrol_pump_v2.petrol_pump_v2.stock_forecast.run_forecast_now",
+				args: { petrol_pump: report.get_filter_value("petrol_pump") },
+				freeze: true,
+				callback: function () {
+					report.refresh();
+				}
+			});
+		});
+	},
+
+	formatter: function (value, row, column, data, default_formatter) {
+		value = default_formatter(value, row, column, data);
+		if (column.fieldname === "days_of_cover" && data && data.daily_consumption) {
+			const color = data.days_of_cover < 1 ? "red" : data.suggested_order_qty > 0 ? "orange" : "green";
+			value = `<span class="indicator-pill ${color}">${value}</span>`;
+		}
+		return value;
+	}
+};
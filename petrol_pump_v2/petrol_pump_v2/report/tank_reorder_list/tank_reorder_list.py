@@ -0,0 +1,121 @@
+# Copyright (c) 2026, Atiq and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+
+def execute(filters=None):
+	filters = filters or {}
+	columns = get_columns()
+	data = get_data(filters)
+	summary = get_summary(data)
+
+	return columns, data, None, None, summary
+
+
+def get_columns():
+	return [
+		{
+			"fieldname": "fuel_tank",
+			"label": _("Tank"),
+			"fieldtype": "Link",
+			"options": "Fuel Tank",
+			"width": 130
+		},
+		{
+			"fieldname": "petrol_pump",
+			"label": _("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "fuel_type",
+			"label": _("Fuel Type"),
+			"fieldtype": "Link",
+			"options": "Fuel Type",
+			"width": 110
+		},
+		{
+			"fieldname": "current_stock",
+			"label": _("Current Stock (L)"),
+			"fieldtype": "Float",
+			"width": 130,
+			"precision": 0
+		},
+		{
+			"fieldname": "capacity",
+			"label": _("Capacity (L)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 0
+		},
+		{
+			"fieldname": "daily_consumption",
+			"label": _("Daily Consumption (L)"),
+			"fieldtype": "Float",
+			"width": 150,
+			"precision": 2
+		},
+		{
+			"fieldname": "days_of_cover",
+			"label": _("Days of Cover"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 1
+		},
+		{
+			"fieldname": "suggested_order_qty",
+			"label": _("Suggested Order (L)"),
+			"fieldtype": "Float",
+			"width": 140,
+			"precision": 0
+		},
+		{
+			"fieldname": "forecast_updated_on",
+			"label": _("Forecast On"),
+			"fieldtype": "Datetime",
+			"width": 150
+		}
+	]
+
+
+def get_data(filters):
+	query_filters = {}
+	if filters.get("petrol_pump"):
+		query_filters["petrol_pump"] = filters.get("petrol_pump")
+	if filters.get("fuel_type"):
+		query_filters["fuel_type"] = filters.get("fuel_type")
+	if not filters.get("show_all"):
+		query_filters["suggested_order_qty"] = [">", 0]
+
+	return frappe.get_all(
+		"Fuel Tank",
+		filters=query_filters,
+		fields=[
+			"name as fuel_tank", "petrol_pump", "fuel_type", "current_stock", "capacity",
+			"daily_consumption", "days_of_cover", "suggested_order_qty", "forecast_updated_on",
+		],
+		order_by="days_of_cover asc, fuel_tank asc",
+	)
+
+
+def get_summary(data):
+	to_order = [row for row in data if flt(row.suggested_order_qty) > 0]
+	return [
+		{"value": len(to_order), "label": _("Tanks to Reorder"), "indicator": "Orange", "datatype": "Int"},
+		{
+			"value": sum(flt(row.suggested_order_qty) for row in to_order),
+			"label": _("Total Suggested (L)"),
+			"indicator": "Blue",
+			"datatype": "Float",
+		},
+		{
+			"value": sum(1 for row in data if row.daily_consumption and flt(row.days_of_cover) < 1),
+			"label": _("Dry Within a Day"),
+			"indicator": "Red",
+			"datatype": "Int",
+		},
+	]
@@ -0,0 +1,37 @@
+frappe.query_reports["Tank Utilization Report"] = {
+	"filters": [
+		{
+			"fieldname": "petrol_pump",
+			"label": __("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "fuel_type",
+			"label": __("Fuel Type"),
+			"fieldtype": "Link",
+			"options": "Fuel Type",
+			"width": 130
+		},
+		{
+			"fieldname": "as_of_date",
+			"label": __("As Of Date"),
+			"fieldtype": "Date",
+			"width": 100
+		}
+	],
+
+	onload: function (report) {
+		report.page.add_inner_button(__("Refresh Tank Stock"), function () {
+			frappe.call({
+				method: "petrol_pump_v2.petrol_pump_v2.tank_stock.refresh_tank_stock",
+				args: { petrol_pump: report.get_filter_value("petrol_pump") },
+				freeze: true,
+				callback: function () {
+					report.refresh();
+				}
+			});
+		});
+	}
+};
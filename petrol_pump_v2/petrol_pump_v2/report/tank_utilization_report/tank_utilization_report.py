@@ -3,7 +3,9 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import flt, get_datetime, getdate
+
+from petrol_pump_v2.petrol_pump_v2.tank_stock import get_tank_stock
 
 def execute(filters=None):
 	filters = filters or {}
@@ -50,6 +52,12 @@ def get_columns():
 			"width": 140,
 			"precision": 2
 		},
+		{
+			"fieldname": "stock_value",
+			"label": _("Stock Value"),
+			"fieldtype": "Currency",
+			"width": 130
+		},
 		{
 			"fieldname": "available_space",
 			"label": _("Available Space (L)"),
@@ -68,6 +76,33 @@ def get_columns():
 			"label": _("Status"),
 			"fieldtype": "Data",
 			"width": 100
+		},
+		{
+			"fieldname": "daily_consumption",
+			"label": _("Daily Consumption (L)"),
+			"fieldtype": "Float",
+			"width": 150,
+			"precision": 2
+		},
+		{
+			"fieldname": "days_of_cover",
+			"label": _("Days of Cover"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 1
+		},
+		{
+			"fieldname": "suggested_order_qty",
+			"label": _("Suggested Order (L)"),
+			"fieldtype": "Float",
+			"width": 140,
+			"precision": 0
+		},
+		{
+			"fieldname": "stock_updated_on",
+			"label": _("Stock As Of"),
+			"fieldtype": "Datetime",
+			"width": 160
 		}
 	]
 
@@ -79,14 +114,31 @@ def get_data(filters):
 			ft.name as tank_name,
 			ft.petrol_pump,
 			ft.fuel_type,
+			ft.warehouse,
 			ft.capacity,
-			ft.current_stock
+			ft.current_stock,
+			ft.stock_value,
+			ft.stock_updated_on,
+			ft.daily_consumption,
+			ft.days_of_cover,
+			ft.suggested_order_qty
 		FROM `tabFuel Tank` ft
 		WHERE 1=1
 		{conditions}
 		ORDER BY ft.petrol_pump, ft.tank_name
 	""", filters, as_dict=1)
-	
+
+	# As-of mode: stock from the ledger at the end of that day instead of the
+	# cached current stock
+	if filters.get("as_of_date"):
+		as_of = get_datetime(f"{getdate(filters.get('as_of_date'))} 23:59:59")
+		stock = {tank.name: tank for tank in get_tank_stock(tanks=[row.tank_name for row in data], as_of=as_of)}
+		for row in data:
+			tank = stock.get(row.tank_name) or {}
+			row.current_stock = flt(tank.get("qty"))
+			row.stock_value = flt(tank.get("value"))
+			row.stock_updated_on = as_of
+
 	# Calculate metrics
 	for row in data:
 		capacity = flt(row.capacity)
@@ -0,0 +1,45 @@
+frappe.query_reports["Wet Stock Alerts"] = {
+	"filters": [
+		{
+			"fieldname": "analysis_date",
+			"label": __("Analysis Date"),
+			"fieldtype": "Date",
+			"description": __("Defaults to the latest analysis")
+		},
+		{
+			"fieldname": "petrol_pump",
+			"label": __("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "flagged_only",
+			"label": __("Flagged Only"),
+			"fieldtype": "Check",
+			"default": 1
+		}
+	],
+
+	onload: function (report) {
+		report.page.add_inner_button(__("Run Analysis Now"), function () {
+			frappe.call({
+				method: "petrol_pump_v2.petrol_pump_v2.wet_stock.run_analysis_now",
+				args: { petrol_pump: report.get_filter_value("petrol_pump") },
+				freeze: true,
+				callback: function () {
+					report.refresh();
+				}
+			});
+		});
+	},
+
+	formatter: function (value, row, column, data, default_formatter) {
+		value = default_formatter(value, row, column, data);
+		if (column.fieldname === "status" && data) {
+			const colors = { "Leak Suspected": "red", "Watch": "orange", "Gain": "blue", "Normal": "green" };
+			value = `<span class="indicator-pill ${colors[data.status] || "gray"}">${value}</span>`;
+		}
+		return value;
+	}
+};
@@ -0,0 +1,142 @@
+# Copyright (c) 2026, Atiq and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from petrol_pump_v2.petrol_pump_v2.wet_stock import GAIN, LEAK, WATCH
+
+SEVERITY = {LEAK: 0, WATCH: 1, GAIN: 2}
+
+
+def execute(filters=None):
+	filters = filters or {}
+	columns = get_columns()
+	data = get_data(filters)
+	summary = get_summary(data)
+
+	return columns, data, None, None, summary
+
+
+def get_columns():
+	return [
+		{
+			"fieldname": "status",
+			"label": _("Status"),
+			"fieldtype": "Data",
+			"width": 130
+		},
+		{
+			"fieldname": "fuel_tank",
+			"label": _("Tank"),
+			"fieldtype": "Link",
+			"options": "Fuel Tank",
+			"width": 130
+		},
+		{
+			"fieldname": "petrol_pump",
+			"label": _("Petrol Pump"),
+			"fieldtype": "Link",
+			"options": "Petrol Pump",
+			"width": 150
+		},
+		{
+			"fieldname": "fuel_type",
+			"label": _("Fuel Type"),
+			"fieldtype": "Link",
+			"options": "Fuel Type",
+			"width": 110
+		},
+		{
+			"fieldname": "trend_per_day",
+			"label": _("Trend (L/day)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 2
+		},
+		{
+			"fieldname": "trend_percent",
+			"label": _("Trend % of Sales"),
+			"fieldtype": "Percent",
+			"width": 120
+		},
+		{
+			"fieldname": "cusum_low",
+			"label": _("Loss CUSUM (σ)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 1
+		},
+		{
+			"fieldname": "cumulative_variance",
+			"label": _("Cumulative Variance (L)"),
+			"fieldtype": "Float",
+			"width": 150,
+			"precision": 2
+		},
+		{
+			"fieldname": "total_sales",
+			"label": _("Sales (L)"),
+			"fieldtype": "Float",
+			"width": 110,
+			"precision": 2
+		},
+		{
+			"fieldname": "reconciled_days",
+			"label": _("Days"),
+			"fieldtype": "Int",
+			"width": 70
+		},
+		{
+			"fieldname": "reasons",
+			"label": _("Reasons"),
+			"fieldtype": "Data",
+			"width": 280
+		},
+		{
+			"fieldname": "analysis_date",
+			"label": _("Analysis Date"),
+			"fieldtype": "Date",
+			"width": 110
+		}
+	]
+
+
+def get_data(filters):
+	analysis_date = filters.get("analysis_date") or frappe.db.get_value(
+		"Wet Stock Analysis", {}, "max(analysis_date)"
+	)
+	if not analysis_date:
+		return []
+
+	query_filters = {"analysis_date": analysis_date}
+	if filters.get("petrol_pump"):
+		query_filters["petrol_pump"] = filters.get("petrol_pump")
+	if filters.get("flagged_only"):
+		query_filters["status"] = ["in", list(SEVERITY)]
+
+	data = frappe.get_all(
+		"Wet Stock Analysis",
+		filters=query_filters,
+		fields=[
+			"status", "fuel_tank", "petrol_pump", "fuel_type", "trend_per_day", "trend_percent",
+			"cusum_low", "cumulative_variance", "total_sales", "reconciled_days", "reasons",
+			"analysis_date",
+		],
+	)
+	data.sort(key=lambda row: (SEVERITY.get(row.status, 3), row.trend_percent))
+	for row in data:
+		row.reasons = (row.reasons or "").replace("\n", "; ")
+	return data
+
+
+def get_summary(data):
+	counts = {status: 0 for status in SEVERITY}
+	for row in data:
+		if row.status in counts:
+			counts[row.status] += 1
+	return [
+		{"value": counts[LEAK], "label": _("Leak Suspected"), "indicator": "Red", "datatype": "Int"},
+		{"value": counts[WATCH], "label": _("Watch"), "indicator": "Orange", "datatype": "Int"},
+		{"value": counts[GAIN], "label": _("Gain"), "indicator": "Blue", "datatype": "Int"},
+	]
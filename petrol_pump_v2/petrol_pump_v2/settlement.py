@@ -0,0 +1,87 @@
+"""Settlement of the Day Closing cash-customer invoice.
+
+The cash customer's Sales Invoice is paid partly by card (one amount per bank
+account) and the rest in cash. The split is planned in memory from the
+invoice's outstanding amount, so no fresh reads are needed between vouchers.
+"""
+
+import time
+
+import frappe
+from frappe.utils import flt
+
+CASH = None
+
+
+def plan_settlement(outstanding, card_by_bank):
+	"""Split an invoice's outstanding amount between card banks and cash.
+
+	Each bank gets its exact card amount, capped at what is still outstanding.
+	Cash takes the remainder. Returns a list of (bank_account, amount) pairs
+	where bank_account is CASH (None) for the cash line.
+	"""
+	remaining = flt(outstanding, 2)
+	plan = []
+	for bank_account, amount in card_by_bank.items():
+		if remaining <= 0:
+			break
+		allocate = min(flt(amount, 2), remaining)
+		if allocate > 0:
+			plan.append((bank_account, allocate))
+			remaining = flt(remaining - allocate, 2)
+	if remaining > 0:
+		plan.append((CASH, remaining))
+	return plan
+
+
+def benchmark_submit(day_closing, per_bank=False):
+	"""Submit a draft Day Closing inside a savepoint and report latency and vouchers.
+
+	Everything is rolled back afterwards, so the same draft can be measured with
+	`per_bank=True` (one Payment Entry per bank, the old behaviour) and without
+	(one settlement Journal Entry). Run with `bench execute`.
+	"""
+	doc = frappe.get_doc("Day Closing", day_closing)
+	if doc.docstatus != 0:
+		frappe.throw(f"Day Closing {day_closing} must be a draft")
+
+	company = frappe.db.get_value("Petrol Pump", doc.petrol_pump, "company")
+	# Creating the cash customer commits, which would defeat the savepoint
+	doc.get_or_create_cash_customer(company)
+
+	savepoint = "day_closing_benchmark"
+	frappe.db.savepoint(savepoint)
+	frappe.flags.settlement_per_bank = per_bank
+	try:
+		started = time.perf_counter()
+		doc.submit()
+		elapsed = time.perf_counter() - started
+		doc.reload()
+		vouchers = [
+			ref.strip()
+			for field in (
+				"stock_entry_ref",
+				"sales_invoice_ref",
+				"payment_entry_ref",
+				"settlement_entry_ref",
+				"expense_payment_entries_ref",
+				"fund_transfer_entries_ref",
+				"supplier_payment_entries_ref",
+				"credit_collection_entries_ref",
+				"summary_journal_entry_ref",
+			)
+			for ref in str(doc.get(field) or "").split(",")
+			if ref.strip()
+		]
+	finally:
+		frappe.flags.settlement_per_bank = False
+		frappe.db.rollback(save_point=savepoint)
+
+	result = {
+		"day_closing": day_closing,
+		"per_bank": per_bank,
+		"submit_seconds": round(elapsed, 3),
+		"vouchers": len(vouchers),
+	}
+	print(result)
+	return result
@@ -0,0 +1,124 @@
+"""Days-of-cover forecasting and reorder suggestions per tank.
+
+The daily job reads HISTORY_DAYS of nozzle sales per tank with one grouped
+query (the same series the wet-stock reconciliation uses) and, per tank:
+
+- base rate: the moving average of daily sales over the last BASE_DAYS
+- day-of-week index: average sales of each weekday over the history divided
+  by the overall average, so weekend peaks and quiet days are kept
+- forecast: base rate x weekday index for each coming day
+
+Days of cover walks that forecast down from the tank's current stock. A tank
+that runs dry within REORDER_DAYS gets a suggested order sized to fill it
+to FILL_RATIO of capacity at the expected delivery, never above it. Results
+are stored on Fuel Tank with one bulk update; reports read them from there.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now_datetime, today
+
+from petrol_pump_v2.petrol_pump_v2.wet_stock import get_daily_sales, get_tanks
+
+HISTORY_DAYS = 56
+BASE_DAYS = 14
+HORIZON_DAYS = 60
+# Expected days between placing an order and the delivery
+LEAD_TIME_DAYS = 2
+# Order when the tank runs dry within lead time plus a day of safety stock
+REORDER_DAYS = LEAD_TIME_DAYS + 1
+# Ullage: tanks are never filled beyond this share of capacity
+FILL_RATIO = 0.95
+
+
+def weekday_index(sales):
+	"""[index for Monday..Sunday] from {date: liters}; 1.0 where a weekday has no history."""
+	totals = [0.0] * 7
+	counts = [0] * 7
+	for day, liters in sales.items():
+		totals[day.weekday()] += liters
+		counts[day.weekday()] += 1
+	overall = sum(totals) / sum(counts) if sum(counts) else 0.0
+	if not overall:
+		return [1.0] * 7
+	return [totals[i] / counts[i] / overall if counts[i] else 1.0 for i in range(7)]
+
+
+def base_rate(sales, as_of, days=BASE_DAYS):
+	"""Moving average of daily sales over the `days` up to `as_of`, over days with sales recorded."""
+	start = add_days(as_of, -days + 1)
+	recent = [liters for day, liters in sales.items() if start <= day <= as_of]
+	return sum(recent) / len(recent) if recent else 0.0
+
+
+def forecast_tank(sales, stock, capacity, as_of):
+	"""(daily_consumption, days_of_cover, suggested_order_qty) for one tank."""
+	rate = base_rate(sales, as_of)
+	if rate <= 0:
+		return 0.0, HORIZON_DAYS, 0.0
+	index = weekday_index(sales)
+	daily = [rate * index[(as_of + timedelta(days=i)).weekday()] for i in range(1, HORIZON_DAYS + 1)]
+
+	# Walk the forecast down from current stock; the last day counts fractionally
+	remaining = max(flt(stock), 0.0)
+	days_of_cover = float(HORIZON_DAYS)
+	for i, liters in enumerate(daily):
+		if liters >= remaining:
+			days_of_cover = i + (remaining / liters if liters else 0.0)
+			break
+		remaining -= liters
+
+	suggested = 0.0
+	if days_of_cover <= REORDER_DAYS and capacity:
+		at_delivery = max(flt(stock) - sum(daily[:LEAD_TIME_DAYS]), 0.0)
+		suggested = max(flt(capacity) * FILL_RATIO - at_delivery, 0.0)
+	return rate, days_of_cover, suggested
+
+
+def run_forecast(as_of=None, petrol_pump=None):
+	"""Forecast every tank (or one pump's) and store the results on Fuel Tank."""
+	as_of = getdate(as_of or today())
+	tanks = get_tanks(petrol_pump)
+	if not tanks:
+		return {}
+
+	names = [tank.name for tank in tanks]
+	sales = get_daily_sales(add_days(as_of, -HISTORY_DAYS + 1), as_of, names)
+	stock = {
+		row.name: row
+		for row in frappe.get_all(
+			"Fuel Tank", filters={"name": ["in", names]}, fields=["name", "current_stock", "capacity"]
+		)
+	}
+
+	updated_on = now_datetime()
+	updates = {}
+	for tank in tanks:
+		daily, cover, suggested = forecast_tank(
+			sales.get(tank.name, {}), stock[tank.name].current_stock, stock[tank.name].capacity, as_of
+		)
+		updates[tank.name] = {
+			"daily_consumption": daily,
+			"days_of_cover": cover,
+			"suggested_order_qty": suggested,
+			"forecast_updated_on": updated_on,
+		}
+
+	frappe.db.bulk_update("Fuel Tank", updates, update_modified=False)
+	return updates
+
+
+def run_daily_forecast():
+	"""Scheduler job (daily): refresh forecasts from sales up to yesterday."""
+	run_forecast(add_days(today(), -1))
+	frappe.db.commit()
+
+
+@frappe.whitelist()
+def run_forecast_now(petrol_pump=None):
+	frappe.only_for("System Manager")
+	updates = run_forecast(add_days(today(), -1), petrol_pump=petrol_pump)
+	to_order = sum(1 for values in updates.values() if values["suggested_order_qty"])
+	frappe.msgprint(f"Forecast {len(updates)} tank(s); {to_order} to reorder")
+	return to_order
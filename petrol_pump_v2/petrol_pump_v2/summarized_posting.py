@@ -0,0 +1,264 @@
+"""Summarized GL posting for Day Closing.
+
+In Detailed mode a closing creates Sales Invoices, one Payment Entry per
+collection and Journal Entries for expenses and transfers, which adds
+hundreds of `tabGL Entry` rows per pump per day. In Summarized mode the same
+economics are posted as one balanced Journal Entry whose lines are netted per
+(account, cost center, party): receivables keep customer-level detail as
+party lines, everything else collapses to one line per account.
+"""
+
+import frappe
+from frappe.utils import flt, nowdate
+
+SUMMARIZED = "Summarized"
+# Day Closing posts stock only; the month's GL is posted by Period Close
+MONTHLY = "Monthly"
+
+
+def get_cash_account(company):
+	mode_of_payment = frappe.db.get_value("Mode of Payment", {"type": "Cash"}, "name") or "Cash"
+	cash_account = frappe.db.get_value(
+		"Mode of Payment Account",
+		{"parent": mode_of_payment, "company": company},
+		"default_account",
+	)
+	return cash_account or frappe.get_cached_value("Company", company, "default_cash_account")
+
+
+def get_income_accounts(company, item_codes):
+	"""Income account per item from Item Default, falling back to the company default."""
+	default = frappe.get_cached_value("Company", company, "default_income_account")
+	accounts = dict.fromkeys(item_codes, default)
+	if item_codes:
+		for row in frappe.get_all(
+			"Item Default",
+			filters={"parent": ["in", list(item_codes)], "company": company},
+			fields=["parent", "income_account"],
+		):
+			if row.income_account:
+				accounts[row.parent] = row.income_account
+	return accounts
+
+
+def get_bank_gl_accounts(bank_accounts):
+	if not bank_accounts:
+		return {}
+	return dict(
+		frappe.get_all(
+			"Bank Account",
+			filters={"name": ["in", list(bank_accounts)]},
+			fields=["name", "account"],
+			as_list=True,
+		)
+	)
+
+
+def build_summary_lines(doc, accounts):
+	"""Net all of a closing's postings into lines keyed by (account, cost_center, party_type, party).
+
+	`accounts` supplies cash, receivable, payable, cost_center, income (per
+	fuel type) and bank (per Bank Account) GL accounts. Returns a list of dicts
+	with a signed `amount` (positive = debit), already balanced to zero.
+	"""
+	cost_center = accounts["cost_center"]
+	cash = accounts["cash"]
+	net = {}
+
+	def post(account, amount, party_type=None, party=None):
+		if not account:
+			frappe.throw(f"GL account missing for summarized posting ({party or 'cash/bank/income'})")
+		key = (account, cost_center, party_type, party)
+		net[key] = net.get(key, 0.0) + flt(amount)
+
+	# Sales: Cr income per fuel type, Dr cash / card banks / customer receivables
+	for d in doc.nozzle_readings or []:
+		if flt(d.amount) and d.fuel_type:
+			post(accounts["income"][d.fuel_type], -flt(d.amount))
+	post(cash, flt(doc.total_sales))
+
+	for row in doc.credit_details or []:
+		if row.customer and flt(row.amount) > 0:
+			post(accounts["receivable"], flt(row.amount), "Customer", row.customer)
+			post(cash, -flt(row.amount))
+
+	for row in doc.card_sales or []:
+		if row.bank_account and flt(row.amount) > 0:
+			post(accounts["bank"].get(row.bank_account), flt(row.amount))
+			post(cash, -flt(row.amount))
+
+	for row in doc.expenses or []:
+		if row.expense_account and flt(row.amount) > 0:
+			post(row.expense_account, flt(row.amount))
+			post(cash, -flt(row.amount))
+
+	for row in doc.fund_transfers or []:
+		amount = flt(row.amount)
+		if not row.bank_account or amount <= 0:
+			continue
+		sign = 1 if row.transfer_type == "Deposit" else -1 if row.transfer_type == "Withdraw" else 0
+		if sign:
+			post(accounts["bank"].get(row.bank_account), sign * amount)
+			post(cash, -sign * amount)
+
+	for row in doc.supplier_payments or []:
+		if row.supplier and flt(row.amount) > 0:
+			post(accounts["payable"], flt(row.amount), "Supplier", row.supplier)
+			post(cash, -flt(row.amount))
+
+	for row in doc.credit_collections or []:
+		if row.customer and flt(row.amount) > 0:
+			post(cash, flt(row.amount))
+			post(accounts["receivable"], -flt(row.amount), "Customer", row.customer)
+
+	lines = []
+	for (account, cc, party_type, party), amount in net.items():
+		amount = flt(amount, 2)
+		if amount:
+			lines.append(
+				{"account": account, "cost_center": cc, "party_type": party_type, "party": party, "amount": amount}
+			)
+
+	# Push any rounding residue onto the cash line so the entry balances
+	residue = flt(sum(line["amount"] for line in lines), 2)
+	if residue:
+		cash_line = next((line for line in lines if line["account"] == cash and not line["party"]), None)
+		if cash_line:
+			cash_line["amount"] = flt(cash_line["amount"] - residue, 2)
+		else:
+			lines.append({"account": cash, "cost_center": cost_center, "party_type": None, "party": None, "amount": -residue})
+	return [line for line in lines if line["amount"]]
+
+
+def get_summary_accounts(doc, company, cost_center=None):
+	bank_accounts = {r.bank_account for r in (doc.card_sales or []) if r.bank_account}
+	bank_accounts |= {r.bank_account for r in (doc.fund_transfers or []) if r.bank_account}
+	fuel_types = {d.fuel_type for d in (doc.nozzle_readings or []) if d.fuel_type}
+	return {
+		"cost_center": cost_center or doc.get_pump_cost_center(),
+		"cash": get_cash_account(company),
+		"receivable": frappe.get_cached_value("Company", company, "default_receivable_account"),
+		"payable": frappe.get_cached_value("Company", company, "default_payable_account"),
+		"income": get_income_accounts(company, fuel_types),
+		"bank": get_bank_gl_accounts(bank_accounts),
+	}
+
+
+def make_summary_journal_entry(company, posting_date, lines, reference, remark):
+	"""Insert and submit one Journal Entry from signed summary lines."""
+	company_currency = frappe.get_cached_value("Company", company, "default_currency")
+	je = frappe.new_doc("Journal Entry")
+	je.voucher_type = "Journal Entry"
+	je.company = company
+	je.posting_date = posting_date or nowdate()
+	je.set_posting_time = 1
+	je.cheque_no = reference
+	je.cheque_date = posting_date or nowdate()
+	je.user_remark = remark
+
+	for line in lines:
+		je.append(
+			"accounts",
+			{
+				"account": line["account"],
+				"cost_center": line["cost_center"],
+				"party_type": line["party_type"],
+				"party": line["party"],
+				"debit_in_account_currency": line["amount"] if line["amount"] > 0 else 0,
+				"credit_in_account_currency": -line["amount"] if line["amount"] < 0 else 0,
+				"account_currency": company_currency,
+				"exchange_rate": 1.0,
+			},
+		)
+
+	je.insert(ignore_permissions=True)
+	je.submit()
+	return je
+
+
+def post_summary_journal_entry(doc):
+	"""Create and submit the single Journal Entry for a Summarized-mode closing."""
+	company = frappe.db.get_value("Petrol Pump", doc.petrol_pump, "company")
+	lines = build_summary_lines(doc, get_summary_accounts(doc, company))
+	if not lines:
+		return None
+
+	je = make_summary_journal_entry(
+		company,
+		doc.reading_date,
+		lines,
+		doc.name,
+		f"Summarized posting for Day Closing {doc.name}",
+	)
+	doc.db_set("summary_journal_entry_ref", je.name)
+	frappe.msgprint(f"Journal Entry {je.name} created for Day Closing ({len(lines)} lines)")
+	return je
+
+
+def benchmark_gl_growth(petrol_pump=None, from_date=None, to_date=None):
+	"""Compare GL rows written by Detailed closings with what Summarized mode would write.
+
+	Counts the actual `tabGL Entry` rows behind each submitted Detailed closing
+	(one grouped query) and rebuilds the summary lines each closing would have
+	produced instead. Run with `bench execute`.
+	"""
+	filters = {"docstatus": 1, "summary_journal_entry_ref": ["is", "not set"]}
+	if petrol_pump:
+		filters["petrol_pump"] = petrol_pump
+	if from_date and to_date:
+		filters["reading_date"] = ["between", [from_date, to_date]]
+
+	closings = frappe.get_all("Day Closing", filters=filters, pluck="name")
+	if not closings:
+		return {"closings": 0}
+
+	ref_fields = (
+		"stock_entry_ref",
+		"sales_invoice_ref",
+		"payment_entry_ref",
+		"settlement_entry_ref",
+		"expense_payment_entries_ref",
+		"fund_transfer_entries_ref",
+		"supplier_payment_entries_ref",
+		"credit_collection_entries_ref",
+	)
+	vouchers_by_closing = {}
+	for row in frappe.get_all("Day Closing", filters={"name": ["in", closings]}, fields=["name", *ref_fields]):
+		vouchers = set()
+		for field in ref_fields:
+			vouchers.update(v.strip() for v in str(row.get(field) or "").split(",") if v.strip())
+		vouchers_by_closing[row.name] = vouchers
+
+	all_vouchers = set().union(*vouchers_by_closing.values())
+	gl_rows = dict(
+		frappe.db.sql(
+			"""
+			SELECT voucher_no, COUNT(*) FROM `tabGL Entry`
+			WHERE voucher_no IN %(vouchers)s AND is_cancelled = 0
+			GROUP BY voucher_no
+			""",
+			{"vouchers": tuple(all_vouchers) or ("",)},
+		)
+	)
+
+	detailed_rows = 0
+	summarized_rows = 0
+	for name in closings:
+		doc = frappe.get_doc("Day Closing", name)
+		vouchers = vouchers_by_closing[name]
+		detailed_rows += sum(gl_rows.get(v, 0) for v in vouchers)
+		company = frappe.db.get_value("Petrol Pump", doc.petrol_pump, "company")
+		# Stock Entry GL rows are written in both modes
+		summarized_rows += len(build_summary_lines(doc, get_summary_accounts(doc, company)))
+		summarized_rows += gl_rows.get(doc.stock_entry_ref, 0) if doc.stock_entry_ref else 0
+
+	result = {
+		"closings": len(closings),
+		"detailed_gl_rows": detailed_rows,
+		"summarized_gl_rows": summarized_rows,
+		"detailed_rows_per_closing": flt(detailed_rows / len(closings), 1),
+		"summarized_rows_per_closing": flt(summarized_rows / len(closings), 1),
+		"reduction_pct": flt(100.0 * (detailed_rows - summarized_rows) / detailed_rows, 1) if detailed_rows else 0,
+	}
+	print(result)
+	return result
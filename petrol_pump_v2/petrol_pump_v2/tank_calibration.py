@@ -0,0 +1,128 @@
+"""Dip (mm) to volume (liters) conversion from tank strapping charts.
+
+Each Tank Calibration Chart is compiled into two sorted arrays, dips and
+volumes, cached per tank until the chart changes. A single dip is a binary
+search plus linear interpolation between the neighbouring chart points; a
+batch of dips is sorted once and merged against the chart in one pass.
+"""
+
+from bisect import bisect_left
+
+import frappe
+from frappe.utils import flt
+
+
+def _cache_key(fuel_tank):
+	return f"petrol_pump_v2:tank_calibration:{fuel_tank}"
+
+
+def clear_chart_cache(fuel_tank):
+	frappe.cache().delete_value(_cache_key(fuel_tank))
+
+
+def get_charts(tanks):
+	"""{fuel_tank: (dips, volumes)} for the tanks that have a chart; cache misses load in one query."""
+	charts = {}
+	missing = []
+	for tank in set(tanks or ()):
+		chart = frappe.cache().get_value(_cache_key(tank))
+		if chart is None:
+			missing.append(tank)
+		else:
+			charts[tank] = chart
+
+	if missing:
+		loaded = {}
+		for fuel_tank, dip_mm, volume in frappe.db.sql(
+			"""
+			SELECT tcc.fuel_tank, tcp.dip_mm, tcp.volume_liters
+			FROM `tabTank Calibration Chart` tcc
+			JOIN `tabTank Calibration Point` tcp ON tcp.parent = tcc.name AND tcp.parenttype = 'Tank Calibration Chart'
+			WHERE tcc.fuel_tank IN %s
+			ORDER BY tcc.fuel_tank, tcp.dip_mm
+			""",
+			(tuple(missing),),
+		):
+			dips, volumes = loaded.setdefault(fuel_tank, ([], []))
+			dips.append(flt(dip_mm))
+			volumes.append(flt(volume))
+		for tank in missing:
+			# Tanks without a chart are cached too, as an empty chart
+			chart = loaded.get(tank, ([], []))
+			frappe.cache().set_value(_cache_key(tank), chart)
+			charts[tank] = chart
+
+	return {tank: chart for tank, chart in charts.items() if chart[0]}
+
+
+def interpolate(dips, volumes, dip_mm):
+	"""Volume at `dip_mm` by linear interpolation; None outside the chart."""
+	dip_mm = flt(dip_mm)
+	if not dips or dip_mm < dips[0] or dip_mm > dips[-1]:
+		return None
+	idx = bisect_left(dips, dip_mm)
+	if dips[idx] == dip_mm:
+		return volumes[idx]
+	lo, hi = idx - 1, idx
+	share = (dip_mm - dips[lo]) / (dips[hi] - dips[lo])
+	return volumes[lo] + share * (volumes[hi] - volumes[lo])
+
+
+def interpolate_many(dips, volumes, dip_values):
+	"""Volumes for many dips of one tank, in input order (None outside the chart).
+
+	The dips are sorted once and walked together with the chart, so a bulk
+	import costs O(n log n + m) instead of one search per reading.
+	"""
+	result = [None] * len(dip_values)
+	if not dips:
+		return result
+	order = sorted(range(len(dip_values)), key=lambda i: flt(dip_values[i]))
+	point = 0
+	last = len(dips) - 1
+	for i in order:
+		dip_mm = flt(dip_values[i])
+		if dip_mm < dips[0] or dip_mm > dips[-1]:
+			continue
+		while point < last and dips[point + 1] < dip_mm:
+			point += 1
+		if dips[point] == dip_mm or point == last:
+			result[i] = volumes[point]
+			continue
+		share = (dip_mm - dips[point]) / (dips[point + 1] - dips[point])
+		result[i] = volumes[point] + share * (volumes[point + 1] - volumes[point])
+	return result
+
+
+def dips_to_liters(readings):
+	"""Convert [(fuel_tank, dip_mm), ...] to liters, in input order.
+
+	Charts of all tanks are fetched at once. Throws for a tank without a chart
+	or a dip outside its chart.
+	"""
+	charts = get_charts(tank for tank, _dip in readings)
+	by_tank = {}
+	for idx, (tank, dip_mm) in enumerate(readings):
+		if tank not in charts:
+			frappe.throw(f"Fuel Tank {tank} has no Tank Calibration Chart")
+		by_tank.setdefault(tank, []).append((idx, dip_mm))
+
+	liters = [None] * len(readings)
+	for tank, rows in by_tank.items():
+		dips, volumes = charts[tank]
+		converted = interpolate_many(dips, volumes, [dip_mm for _idx, dip_mm in rows])
+		for (idx, dip_mm), volume in zip(rows, converted, strict=True):
+			if volume is None:
+				frappe.throw(
+					f"Dip {flt(dip_mm):g} mm is outside the calibration chart of Fuel Tank {tank} "
+					f"({dips[0]:g} to {dips[-1]:g} mm)"
+				)
+			liters[idx] = volume
+	return liters
+
+
+@frappe.whitelist()
+def get_calibration_charts(tanks):
+	"""Compiled charts for the form, so dips are converted in the browser as they are typed."""
+	tanks = frappe.parse_json(tanks) if isinstance(tanks, str) else tanks
+	return {tank: {"dips": dips, "volumes": volumes} for tank, (dips, volumes) in get_charts(tanks).items()}
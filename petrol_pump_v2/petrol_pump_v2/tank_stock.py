@@ -0,0 +1,212 @@
+"""Materialized stock of Fuel Tanks.
+
+Fuel Tank.current_stock and stock_value mirror the stock ledger of the tank's
+(fuel_type, warehouse). A doc_events hook on Stock Ledger Entry queues the
+tanks a ledger entry touched and refreshes them from Bin just before the
+transaction commits, once ERPNext has reposted the voucher, so reports can
+read the tank table as-is instead of asking ERPNext for one balance per tank. `refresh_tank_stock`
+rebuilds every tank with one UPDATE from Bin, e.g. after a stock repost (which
+rewrites ledger values without firing document hooks).
+"""
+
+import frappe
+from frappe.utils import flt, get_datetime, getdate, now_datetime, nowdate, nowtime
+
+TANK_KEYS_CACHE = "petrol_pump_v2:tank_stock_keys"
+
+
+def get_tank_keys():
+	"""{(fuel_type, warehouse): [tank, ...]} of all Fuel Tanks, cached until a tank changes."""
+	keys = frappe.cache().get_value(TANK_KEYS_CACHE)
+	if keys is not None:
+		return keys
+	keys = {}
+	for name, fuel_type, warehouse in frappe.get_all(
+		"Fuel Tank",
+		filters={"warehouse": ["is", "set"], "fuel_type": ["is", "set"]},
+		fields=["name", "fuel_type", "warehouse"],
+		as_list=True,
+	):
+		keys.setdefault((fuel_type, warehouse), []).append(name)
+	frappe.cache().set_value(TANK_KEYS_CACHE, keys)
+	return keys
+
+
+def clear_tank_keys_cache():
+	frappe.cache().delete_value(TANK_KEYS_CACHE)
+
+
+def get_ledger_balance(item_code, warehouse, as_of=None):
+	"""(qty, value) of an item in a warehouse from the stock ledger, optionally as of a datetime."""
+	condition = ""
+	if as_of:
+		condition = "AND TIMESTAMP(posting_date, posting_time) <= %(as_of)s"
+	qty, value = frappe.db.sql(
+		f"""
+		SELECT IFNULL(SUM(actual_qty), 0), IFNULL(SUM(stock_value_difference), 0)
+		FROM `tabStock Ledger Entry`
+		WHERE item_code = %(item_code)s AND warehouse = %(warehouse)s AND is_cancelled = 0
+			{condition}
+		""",
+		{"item_code": item_code, "warehouse": warehouse, "as_of": as_of},
+	)[0]
+	return flt(qty), flt(value)
+
+
+def stock_as_of(posting_date=None, posting_time=None):
+	"""Datetime a stock balance is read at; like ERPNext, the time defaults to now."""
+	return get_datetime(f"{getdate(posting_date or nowdate())} {posting_time or nowtime()}")
+
+
+def get_tank_stock(petrol_pump=None, tanks=None, as_of=None):
+	"""Tanks with their stock as of a datetime, in one query.
+
+	Selects a pump's tanks or the named `tanks` and joins each to the latest
+	Stock Ledger Entry of its (fuel_type, warehouse) posted at or before
+	`as_of` (default now), reading qty_after_transaction, stock_value and
+	valuation_rate from it. Returns rows with name, petrol_pump, fuel_type,
+	warehouse, qty, value and valuation_rate.
+	"""
+	if not (petrol_pump or tanks):
+		return []
+	as_of = get_datetime(as_of) if as_of else now_datetime()
+	tank_condition = "petrol_pump = %(petrol_pump)s" if petrol_pump else "name IN %(tanks)s"
+	return frappe.db.sql(
+		f"""
+		SELECT ft.name, ft.petrol_pump, ft.fuel_type, ft.warehouse,
+			IFNULL(sle.qty_after_transaction, 0) AS qty, IFNULL(sle.stock_value, 0) AS value,
+			IFNULL(sle.valuation_rate, 0) AS valuation_rate
+		FROM `tabFuel Tank` ft
+		LEFT JOIN (
+			SELECT item_code, warehouse, qty_after_transaction, stock_value, valuation_rate,
+				ROW_NUMBER() OVER (
+					PARTITION BY item_code, warehouse
+					ORDER BY posting_date DESC, posting_time DESC, creation DESC
+				) AS rn
+			FROM `tabStock Ledger Entry`
+			WHERE is_cancelled = 0 AND posting_date <= %(as_of_date)s
+				AND TIMESTAMP(posting_date, posting_time) <= %(as_of)s
+				AND warehouse IN (SELECT warehouse FROM `tabFuel Tank` WHERE {tank_condition})
+		) sle ON sle.item_code = ft.fuel_type AND sle.warehouse = ft.warehouse AND sle.rn = 1
+		WHERE ft.{tank_condition}
+		ORDER BY ft.name
+		""",
+		{
+			"petrol_pump": petrol_pump,
+			"tanks": tuple(tanks or ()) or ("",),
+			"as_of": as_of,
+			"as_of_date": as_of.date(),
+		},
+		as_dict=True,
+	)
+
+
+def get_issue_warehouses(petrol_pump):
+	"""Where a pump's sales are issued from, in one query.
+
+	Returns ({nozzle_name: (warehouse, fuel_type)}, {fuel_type: warehouse}):
+	the warehouse of the tank each nozzle draws from, and per fuel type the
+	first tank's warehouse, for nozzles not linked to a tank.
+	"""
+	by_nozzle = {}
+	by_fuel_type = {}
+	for fuel_type, warehouse, nozzle_name in frappe.db.sql(
+		"""
+		SELECT ft.fuel_type, ft.warehouse, n.nozzle_name
+		FROM `tabFuel Tank` ft
+		LEFT JOIN `tabNozzle` n ON n.fuel_tank = ft.name AND n.petrol_pump = ft.petrol_pump
+		WHERE ft.petrol_pump = %s AND IFNULL(ft.warehouse, '') != ''
+		ORDER BY ft.name
+		""",
+		petrol_pump,
+	):
+		by_fuel_type.setdefault(fuel_type, warehouse)
+		if nozzle_name:
+			by_nozzle[nozzle_name] = (warehouse, fuel_type)
+	return by_nozzle, by_fuel_type
+
+
+def allocate_stock_issue(petrol_pump, nozzle_readings):
+	"""{(warehouse, fuel_type): liters} to issue for a pump's nozzle readings.
+
+	Each reading is issued from the tank its nozzle draws from (Nozzle.fuel_tank),
+	so pumps with several tanks of one fuel have each tank's stock reduced by
+	what its own nozzles dispensed. Readings of unlinked nozzles, or of a
+	nozzle linked to a tank of another fuel, fall back to the pump's first
+	tank of the fuel type; readings with no tank at all are left out.
+	"""
+	by_nozzle, by_fuel_type = get_issue_warehouses(petrol_pump)
+	issues = {}
+	for row in nozzle_readings or []:
+		if flt(row.dispensed_liters) <= 0:
+			continue
+		warehouse, fuel_type = by_nozzle.get(row.nozzle_number, (None, None))
+		if fuel_type != row.fuel_type:
+			warehouse = by_fuel_type.get(row.fuel_type)
+		if warehouse:
+			key = (warehouse, row.fuel_type)
+			issues[key] = issues.get(key, 0.0) + flt(row.dispensed_liters)
+	return issues
+
+
+def update_tank_stock(doc, method=None):
+	"""doc_events hook on Stock Ledger Entry: refresh the entry's tanks before the transaction commits.
+
+	ERPNext fills in actual_qty, stock_value_difference and the Bin only when
+	it reposts the voucher, after its ledger entries are submitted, so the
+	tanks are queued here and read from Bin just before commit. Cancellations
+	post reversing entries, so they pass through here as well. Back-dated
+	entries whose repost is queued settle later; refresh_tank_stock rebuilds
+	those.
+	"""
+	tanks = get_tank_keys().get((doc.item_code, doc.warehouse))
+	if not tanks:
+		return
+	if frappe.flags.tank_stock_pending is None:
+		frappe.flags.tank_stock_pending = set()
+		frappe.db.before_commit.add(refresh_pending_tanks)
+		frappe.db.after_rollback.add(discard_pending_tanks)
+	frappe.flags.tank_stock_pending.update(tanks)
+
+
+def refresh_pending_tanks():
+	"""Write the Bin balance of the tanks queued by update_tank_stock."""
+	tanks = frappe.flags.tank_stock_pending
+	frappe.flags.tank_stock_pending = None
+	if tanks:
+		update_tanks_from_bin(tanks=tanks)
+
+
+def discard_pending_tanks():
+	frappe.flags.tank_stock_pending = None
+
+
+def update_tanks_from_bin(petrol_pump=None, tanks=None):
+	"""Set current_stock and stock_value of all tanks, a pump's or the named ones from Bin in one UPDATE."""
+	condition = ""
+	if petrol_pump:
+		condition = "AND ft.petrol_pump = %(petrol_pump)s"
+	elif tanks:
+		condition = "AND ft.name IN %(tanks)s"
+	frappe.db.sql(
+		f"""
+		UPDATE `tabFuel Tank` ft
+		LEFT JOIN `tabBin` b ON b.item_code = ft.fuel_type AND b.warehouse = ft.warehouse
+		SET ft.current_stock = IFNULL(b.actual_qty, 0),
+			ft.stock_value = IFNULL(b.stock_value, 0),
+			ft.stock_updated_on = %(now)s
+		WHERE 1=1 {condition}
+		""",
+		{"petrol_pump": petrol_pump, "tanks": tuple(tanks or ()), "now": now_datetime()},
+	)
+
+
+@frappe.whitelist()
+def refresh_tank_stock(petrol_pump=None):
+	"""Rebuild current_stock and stock_value of all tanks (or one pump's) from Bin in one UPDATE.
+
+	bench --site <site> execute petrol_pump_v2.petrol_pump_v2.tank_stock.refresh_tank_stock
+	"""
+	frappe.only_for("System Manager")
+	update_tanks_from_bin(petrol_pump=petrol_pump)
+	clear_tank_keys_cache()
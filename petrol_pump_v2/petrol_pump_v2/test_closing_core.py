@@ -0,0 +1,91 @@
+# Copyright (c) 2026, solitive and Contributors
+# See license.txt
+
+import unittest
+
+from petrol_pump_v2.petrol_pump_v2.closing_core import (
+	compute_closing,
+	dispensed_liters,
+	fuel_types_without_rate,
+	has_backward_reading,
+	synthetic_closing,
+)
+
+
+class TestClosingCore(unittest.TestCase):
+	def test_dispensed_liters(self):
+		self.assertEqual(dispensed_liters(100, 150), 50)
+		# Rollover within the window of a 1,000,000 L meter
+		self.assertEqual(dispensed_liters(999_990, 15, 1_000_000), 25)
+		# Too far back to be a rollover: reported as-is (negative)
+		self.assertEqual(dispensed_liters(500_000, 15, 1_000_000), -499_985)
+		self.assertEqual(dispensed_liters(500, 15, 0, "Meter Replaced"), -485)
+
+	def test_readings_use_row_rate_then_fuel_rate(self):
+		readings = [
+			{"fuel_type": "Petrol", "previous_reading": 10, "current_reading": 30, "rate": 5},
+			{"fuel_type": "Diesel", "previous_reading": 0, "current_reading": 4},
+		]
+		totals = compute_closing(readings=readings, rates={"Diesel": 2.5})
+		self.assertEqual(totals["reading_liters"], [20, 4])
+		self.assertEqual(totals["reading_rates"], [5, 2.5])
+		self.assertEqual(totals["reading_amounts"], [100, 10])
+		self.assertEqual(totals["total_liters"], 24)
+		self.assertEqual(totals["total_sales"], 110)
+
+	def test_rollup_rows_keep_liters(self):
+		readings = [{"fuel_type": "Petrol", "previous_reading": 0, "current_reading": 0, "dispensed_liters": 12, "rate": 2}]
+		totals = compute_closing(readings=readings, recompute_liters=False)
+		self.assertEqual(totals["total_liters"], 12)
+		self.assertEqual(totals["total_sales"], 24)
+
+	def test_rollover_uses_nozzle_capacity(self):
+		readings = [
+			{"nozzle_number": "N1", "fuel_type": "Petrol", "previous_reading": 9990, "current_reading": 10, "rate": 1}
+		]
+		totals = compute_closing(readings=readings, meter_capacities={"N1": 10000})
+		self.assertEqual(totals["total_liters"], 20)
+
+	def test_credit_amounts(self):
+		credit = [
+			{"customer": "A", "fuel_type": "Petrol", "liters": 10},
+			{"customer": "B", "fuel_type": "Petrol", "liters": 5, "rate": 3},
+			# No liters: amount entered by hand is kept
+			{"customer": "C", "fuel_type": "Petrol", "amount": 42},
+		]
+		totals = compute_closing(credit=credit, rates={"Petrol": 2})
+		self.assertEqual(totals["credit_rates"], [2, 3, 2])
+		self.assertEqual(totals["credit_amounts"], [20, 15, 42])
+		self.assertEqual(totals["credit_sales_liters"], 15)
+		self.assertEqual(totals["credit_amount"], 77)
+
+	def test_cash_reconciliation(self):
+		totals = compute_closing(
+			readings=[{"fuel_type": "Petrol", "previous_reading": 0, "current_reading": 100, "rate": 10}],
+			credit=[{"fuel_type": "Petrol", "liters": 10, "rate": 10}],
+			card=[{"amount": 200}],
+			expenses=[{"amount": 50}],
+			transfers=[{"transfer_type": "Withdraw", "amount": 30}, {"transfer_type": "Deposit", "amount": 80}],
+			supplier_payments=[{"amount": 70}],
+			collections=[{"amount": 40}],
+			previous_cash=500,
+		)
+		self.assertEqual(totals["total_fund_transfer_effect"], -50)
+		# 1000 - 100 - 200 - 50 - 70 + 40 - 50
+		self.assertEqual(totals["cash_amount"], 570)
+		self.assertEqual(totals["cash_in_hand"], 1070)
+
+	def test_helpers(self):
+		readings = [
+			{"fuel_type": "Petrol", "previous_reading": 5, "current_reading": 1},
+			{"fuel_type": "Diesel", "previous_reading": 1, "current_reading": 5, "rate": 3},
+		]
+		self.assertTrue(has_backward_reading(readings))
+		self.assertFalse(has_backward_reading(readings[1:]))
+		self.assertEqual(fuel_types_without_rate(readings, [{"fuel_type": "Hi-Octane"}]), {"Petrol", "Hi-Octane"})
+
+	def test_large_closing(self):
+		closing = synthetic_closing(10000)
+		totals = compute_closing(**closing)
+		self.assertEqual(len(totals["reading_amounts"]), 10000)
+		self.assertAlmostEqual(totals["total_sales"], sum(totals["reading_amounts"]))
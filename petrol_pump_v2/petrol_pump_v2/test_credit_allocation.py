@@ -0,0 +1,27 @@
+# Copyright (c) 2026, solitive and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+
+from petrol_pump_v2.petrol_pump_v2.credit_allocation import allocate_fifo, build_reconcile_entries
+
+
+class TestCreditAllocation(unittest.TestCase):
+	def test_collection_split_across_two_invoices(self):
+		queue = [
+			frappe._dict(name="SINV-1", outstanding_amount=100),
+			frappe._dict(name="SINV-2", outstanding_amount=80),
+		]
+		pe = frappe._dict(name="PE-1", party="CUST-1", paid_from="Debtors", paid_amount=150, unallocated_amount=150)
+
+		allocations, remaining = allocate_fifo(pe.unallocated_amount, queue)
+		entries = build_reconcile_entries(pe, allocations)
+
+		self.assertEqual(remaining, 0)
+		self.assertEqual([entry.against_voucher for entry in entries], ["SINV-1", "SINV-2"])
+		self.assertEqual([entry.allocated_amount for entry in entries], [100, 50])
+		# ERPNext compares every row with the stored unallocated_amount of the Payment Entry
+		self.assertEqual([entry.unreconciled_amount for entry in entries], [150, 150])
+		self.assertEqual(queue[0].outstanding_amount, 30)
@@ -0,0 +1,44 @@
+# Copyright (c) 2026, solitive and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from petrol_pump_v2.petrol_pump_v2.fuel_pricing import apply_activation
+
+
+class TestFuelPricing(FrappeTestCase):
+	def make_price(self, effective_from):
+		# No pump, so nothing is superseded: only the activation flags are under test
+		return frappe._dict(
+			name="FPRICE-TEST", petrol_pump=None, effective_from=effective_from,
+			is_active=1, pending_activation=0, fuel_prices=[],
+		)
+
+	def test_future_price_is_staged(self):
+		doc = self.make_price(add_to_date(now_datetime(), hours=1))
+		apply_activation(doc)
+		self.assertEqual((doc.is_active, doc.pending_activation), (0, 1))
+
+	def test_staged_price_resaved_after_due_is_activated(self):
+		doc = self.make_price(add_to_date(now_datetime(), hours=1))
+		apply_activation(doc)
+
+		doc.effective_from = add_to_date(now_datetime(), minutes=-1)
+		apply_activation(doc)
+		self.assertEqual((doc.is_active, doc.pending_activation), (1, 0))
+
+	def test_unstaged_price_is_withdrawn(self):
+		doc = self.make_price(add_to_date(now_datetime(), hours=1))
+		apply_activation(doc)
+
+		doc.pending_activation = 0
+		apply_activation(doc)
+		self.assertEqual((doc.is_active, doc.pending_activation), (0, 0))
+
+	def test_inactive_price_stays_inactive(self):
+		doc = self.make_price(add_to_date(now_datetime(), minutes=-1))
+		doc.is_active = 0
+		apply_activation(doc)
+		self.assertEqual((doc.is_active, doc.pending_activation), (0, 0))
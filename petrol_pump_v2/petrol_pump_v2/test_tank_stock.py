@@ -0,0 +1,44 @@
+# Copyright (c) 2026, solitive and Contributors
+# See license.txt
+
+import frappe
+from erpnext.stock.doctype.stock_reconciliation.test_stock_reconciliation import (
+	create_stock_reconciliation,
+)
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from petrol_pump_v2.petrol_pump_v2.tank_stock import clear_tank_keys_cache, refresh_pending_tanks
+
+TEST_TANK = "_Test Tank Stock Tank"
+ITEM = "_Test Item"
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+class TestTankStock(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		# Written straight to the table: only the ledger hook is under test
+		frappe.get_doc({
+			"doctype": "Fuel Tank", "name": TEST_TANK, "tank_name": TEST_TANK,
+			"fuel_type": ITEM, "warehouse": WAREHOUSE,
+		}).db_insert()
+		clear_tank_keys_cache()
+
+	@classmethod
+	def tearDownClass(cls):
+		clear_tank_keys_cache()
+		super().tearDownClass()
+
+	def test_stock_reconciliation_updates_tank_after_repost(self):
+		create_stock_reconciliation(item_code=ITEM, warehouse=WAREHOUSE, qty=1234, rate=100)
+
+		# The hook only queues the tank; it is written from Bin before commit
+		self.assertIn(TEST_TANK, frappe.flags.tank_stock_pending)
+		refresh_pending_tanks()
+
+		tank = frappe.db.get_value("Fuel Tank", TEST_TANK, ["current_stock", "stock_value"], as_dict=True)
+		self.assertEqual(flt(tank.current_stock), 1234)
+		self.assertEqual(flt(tank.stock_value), 123400)
+		self.assertIsNone(frappe.flags.tank_stock_pending)
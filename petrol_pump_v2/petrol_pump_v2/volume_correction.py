@@ -0,0 +1,128 @@
+"""Correction of observed fuel volumes to the standard temperature of 15 °C.
+
+Fuel expands as it warms, so the same mass reads as more liters in summer
+than in winter. The volume correction factor (VCF) of a product follows the
+ASTM D1250 table 54B formula from its density at 15 °C:
+
+	alpha = K0 / rho^2 + K1 / rho
+	VCF   = exp(-alpha * dT * (1 + 0.8 * alpha * dT)),  dT = t - 15
+
+For each Fuel Type the factors are precomputed once, at 0.1 °C steps
+(the resolution of the printed tables), into a flat list cached per fuel
+type. Correcting a batch of readings is then an index lookup per row.
+"""
+
+import math
+
+import frappe
+from frappe.utils import flt
+
+STANDARD_TEMPERATURE = 15.0
+MIN_TEMPERATURE = -30.0
+MAX_TEMPERATURE = 60.0
+STEP = 0.1
+
+# (upper density bound in kg/m3, K0, K1) per table 54B product group
+PRODUCT_GROUPS = (
+	(770.5, 346.4228, 0.4388),  # gasolines
+	(787.5, None, None),  # transition zone, see _alpha
+	(838.5, 594.5418, 0.0),  # jet fuels, kerosene
+	(1075.0, 186.9696, 0.4862),  # diesel, fuel oils
+)
+TRANSITION_A = -0.00336312
+TRANSITION_B = 2680.3206
+
+
+def _alpha(density):
+	for upper, k0, k1 in PRODUCT_GROUPS:
+		if density <= upper:
+			if k0 is None:
+				return TRANSITION_A + TRANSITION_B / density**2
+			return k0 / density**2 + k1 / density
+	return PRODUCT_GROUPS[-1][1] / density**2 + PRODUCT_GROUPS[-1][2] / density
+
+
+def correction_factor(density, temperature):
+	"""VCF to 15 °C for a product of `density` (kg/m3 at 15 °C) observed at `temperature` (°C)."""
+	density = flt(density)
+	if density <= 0:
+		return 1.0
+	alpha = _alpha(density)
+	delta = flt(temperature) - STANDARD_TEMPERATURE
+	return math.exp(-alpha * delta * (1 + 0.8 * alpha * delta))
+
+
+def build_table(density):
+	"""VCFs from MIN_TEMPERATURE to MAX_TEMPERATURE at STEP intervals."""
+	steps = round((MAX_TEMPERATURE - MIN_TEMPERATURE) / STEP)
+	return [correction_factor(density, MIN_TEMPERATURE + i * STEP) for i in range(steps + 1)]
+
+
+def factor_from_table(table, temperature):
+	idx = round((flt(temperature) - MIN_TEMPERATURE) / STEP)
+	return table[min(max(idx, 0), len(table) - 1)]
+
+
+def _cache_key(fuel_type):
+	return f"petrol_pump_v2:volume_correction:{fuel_type}"
+
+
+def clear_correction_table(fuel_type):
+	frappe.cache().delete_value(_cache_key(fuel_type))
+
+
+def get_correction_tables(fuel_types):
+	"""{fuel_type: table} for fuel types with a density; cache misses load with one query."""
+	tables = {}
+	missing = []
+	for fuel_type in set(fuel_types or ()):
+		if not fuel_type:
+			continue
+		table = frappe.cache().get_value(_cache_key(fuel_type))
+		if table is None:
+			missing.append(fuel_type)
+		else:
+			tables[fuel_type] = table
+
+	if missing:
+		densities = dict(
+			frappe.get_all(
+				"Fuel Type",
+				filters={"name": ["in", missing]},
+				fields=["name", "density_at_15"],
+				as_list=True,
+			)
+		)
+		for fuel_type in missing:
+			# Fuel types without a density are cached as an empty table
+			table = build_table(densities[fuel_type]) if flt(densities.get(fuel_type)) > 0 else []
+			frappe.cache().set_value(_cache_key(fuel_type), table)
+			tables[fuel_type] = table
+
+	return {fuel_type: table for fuel_type, table in tables.items() if table}
+
+
+def measured_temperature(row):
+	"""The row's temperature if its Temperature Measured box is ticked, else None.
+
+	Float fields store an empty temperature as 0, so the check box is what
+	tells a reading at 0 °C from one never taken.
+	"""
+	return flt(row.get("temperature")) if row.get("temperature_measured") else None
+
+
+def correct_volumes(readings):
+	"""Standard volumes of [(fuel_type, observed_liters, temperature), ...], in input order.
+
+	Rows whose temperature is None (not measured), or whose fuel type has no
+	density, are returned uncorrected.
+	"""
+	tables = get_correction_tables(fuel_type for fuel_type, _liters, _temperature in readings)
+	corrected = []
+	for fuel_type, liters, temperature in readings:
+		table = tables.get(fuel_type)
+		if table and temperature is not None:
+			corrected.append(flt(liters) * factor_from_table(table, temperature))
+		else:
+			corrected.append(flt(liters))
+	return corrected
@@ -0,0 +1,337 @@
+"""Statistical wet-stock reconciliation and leak detection.
+
+For every tank the nightly run builds a daily series over the last
+WINDOW_DAYS from three grouped queries for the whole network:
+
+- dips: the last dip of each day, corrected to 15 °C where recorded (Dip
+  Reading and Tank Dip Reading)
+- nozzle sales: Nozzle Reading Detail of submitted Day Closings, mapped to
+  tanks through the Nozzle -> Fuel Tank link
+- other book movements: Stock Ledger Entries of the tank's warehouse, such
+  as the Purchase Receipts of Fuel Deliveries (in liters at 15 °C) and
+  transfers, excluding dip reconciliations and the Day Closing sales issue
+
+Between two dips the reconciliation variance is
+closing dip - (opening dip + deliveries - other issues - nozzle sales).
+The cumulative variance is then tested two ways:
+
+- regression: the least-squares slope of the cumulative variance is the
+  tank's loss (or gain) per day; beyond TREND_THRESHOLD_PERCENT of average
+  daily sales it is flagged
+- CUSUM: daily variances are standardised and accumulated one-sided, so a
+  small persistent loss crosses CUSUM_H well before it shows in a daily figure
+
+Results go into Wet Stock Analysis, one row per tank and night, indexed by
+(analysis_date, status) for the alert dashboard.
+"""
+
+import math
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now, today
+
+WINDOW_DAYS = 30
+MIN_POINTS = 5
+# Trend beyond this share of average daily sales (per day) is flagged
+TREND_THRESHOLD_PERCENT = 0.2
+# CUSUM slack and decision interval, in standard deviations
+CUSUM_K = 0.5
+CUSUM_H = 5.0
+
+NORMAL = "Normal"
+WATCH = "Watch"
+LEAK = "Leak Suspected"
+GAIN = "Gain"
+INSUFFICIENT = "Insufficient Data"
+
+
+def get_tanks(petrol_pump=None):
+	filters = {"warehouse": ["is", "set"], "fuel_type": ["is", "set"]}
+	if petrol_pump:
+		filters["petrol_pump"] = petrol_pump
+	return frappe.get_all(
+		"Fuel Tank", filters=filters, fields=["name", "petrol_pump", "fuel_type", "warehouse"]
+	)
+
+
+def get_daily_dips(from_date, to_date, tanks):
+	"""{tank: {date: liters}} of the last dip per tank and day."""
+	rows = frappe.db.sql(
+		"""
+		SELECT fuel_tank, reading_date, liters FROM (
+			SELECT fuel_tank, reading_date, liters,
+				ROW_NUMBER() OVER (PARTITION BY fuel_tank, reading_date ORDER BY creation DESC) AS rn
+			FROM (
+				SELECT dr.fuel_tank, dr.reading_date, dr.creation,
+					IF(dr.temperature_measured, dr.corrected_dip, dr.measured_dip) AS liters
+				FROM `tabDip Reading` dr
+				WHERE dr.docstatus = 1 AND dr.reading_date BETWEEN %(from_date)s AND %(to_date)s
+					AND dr.fuel_tank IN %(tanks)s
+				UNION ALL
+				SELECT tdrd.fuel_tank, tdr.reading_date, tdr.creation,
+					IF(tdrd.temperature_measured, tdrd.corrected_dip, tdrd.measured_dip)
+				FROM `tabTank Dip Reading` tdr
+				JOIN `tabTank Dip Reading Detail` tdrd
+					ON tdrd.parent = tdr.name AND tdrd.parenttype = 'Tank Dip Reading'
+				WHERE tdr.docstatus = 1 AND tdr.reading_date BETWEEN %(from_date)s AND %(to_date)s
+					AND tdrd.fuel_tank IN %(tanks)s
+			) dips
+		) ranked
+		WHERE rn = 1
+		""",
+		{"from_date": from_date, "to_date": to_date, "tanks": tuple(tanks)},
+	)
+	dips = {}
+	for tank, reading_date, liters in rows:
+		dips.setdefault(tank, {})[getdate(reading_date)] = flt(liters)
+	return dips
+
+
+def get_daily_sales(from_date, to_date, tanks):
+	"""{tank: {date: liters}} dispensed by the nozzles drawing from each tank."""
+	rows = frappe.db.sql(
+		"""
+		SELECT n.fuel_tank, dc.reading_date, SUM(nrd.dispensed_liters)
+		FROM `tabDay Closing` dc
+		JOIN `tabNozzle Reading Detail` nrd ON nrd.parent = dc.name AND nrd.parenttype = 'Day Closing'
+		JOIN `tabNozzle` n ON n.petrol_pump = dc.petrol_pump AND n.nozzle_name = nrd.nozzle_number
+		WHERE dc.docstatus = 1 AND dc.reading_date BETWEEN %(from_date)s AND %(to_date)s
+			AND n.fuel_tank IN %(tanks)s
+		GROUP BY n.fuel_tank, dc.reading_date
+		""",
+		{"from_date": from_date, "to_date": to_date, "tanks": tuple(tanks)},
+	)
+	sales = {}
+	for tank, reading_date, liters in rows:
+		sales.setdefault(tank, {})[getdate(reading_date)] = flt(liters)
+	return sales
+
+
+def get_daily_movements(from_date, to_date, tanks):
+	"""{tank: {date: (deliveries, other_issues)}} from the stock ledger.
+
+	Dip reconciliations and the Day Closing sales issue are left out: the
+	first would hide the variance being measured, the second is already
+	counted as nozzle sales.
+	"""
+	by_key = {(t.fuel_type, t.warehouse): t.name for t in tanks}
+	rows = frappe.db.sql(
+		"""
+		SELECT sle.item_code, sle.warehouse, sle.posting_date,
+			SUM(IF(sle.actual_qty > 0, sle.actual_qty, 0)),
+			SUM(IF(sle.actual_qty < 0, -sle.actual_qty, 0))
+		FROM `tabStock Ledger Entry` sle
+		WHERE sle.is_cancelled = 0 AND sle.posting_date BETWEEN %(from_date)s AND %(to_date)s
+			AND sle.warehouse IN %(warehouses)s AND sle.item_code IN %(items)s
+			AND sle.voucher_type != 'Stock Reconciliation'
+			AND NOT EXISTS (
+				SELECT 1 FROM `tabDay Closing` dc
+				WHERE dc.stock_entry_ref = sle.voucher_no AND sle.voucher_type = 'Stock Entry'
+			)
+		GROUP BY sle.item_code, sle.warehouse, sle.posting_date
+		""",
+		{
+			"from_date": from_date,
+			"to_date": to_date,
+			"warehouses": tuple({t.warehouse for t in tanks}),
+			"items": tuple({t.fuel_type for t in tanks}),
+		},
+	)
+	movements = {}
+	for item_code, warehouse, posting_date, received, issued in rows:
+		tank = by_key.get((item_code, warehouse))
+		if tank:
+			movements.setdefault(tank, {})[getdate(posting_date)] = (flt(received), flt(issued))
+	return movements
+
+
+def reconcile_series(dips, sales, movements):
+	"""Reconciliation points between consecutive dips of one tank.
+
+	Returns (points, total_sales, total_deliveries), where points are
+	(date, variance, sales) tuples in date order.
+	"""
+	days = sorted(dips)
+	points = []
+	total_sales = total_deliveries = 0.0
+	for opening_day, closing_day in zip(days, days[1:], strict=False):
+		sold = received = issued = 0.0
+		day = add_days(opening_day, 1)
+		while day <= closing_day:
+			sold += sales.get(day, 0.0)
+			in_qty, out_qty = movements.get(day, (0.0, 0.0))
+			received += in_qty
+			issued += out_qty
+			day = add_days(day, 1)
+		book = dips[opening_day] + received - issued - sold
+		points.append((closing_day, dips[closing_day] - book, sold))
+		total_sales += sold
+		total_deliveries += received
+	return points, total_sales, total_deliveries
+
+
+def trend(points, start):
+	"""Least-squares slope (liters/day) of the cumulative variance against the day number."""
+	xs = []
+	ys = []
+	cumulative = 0.0
+	for day, variance, _sold in points:
+		cumulative += variance
+		xs.append((getdate(day) - getdate(start)).days)
+		ys.append(cumulative)
+	n = len(xs)
+	mean_x = sum(xs) / n
+	mean_y = sum(ys) / n
+	sxx = sum((x - mean_x) ** 2 for x in xs)
+	if not sxx:
+		return 0.0, cumulative
+	sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys, strict=True))
+	return sxy / sxx, cumulative
+
+
+def cusum(variances, floor=1.0):
+	"""One-sided CUSUM statistics (loss, gain) of standardised variances, in sigmas."""
+	n = len(variances)
+	mean = sum(variances) / n
+	sigma = math.sqrt(sum((v - mean) ** 2 for v in variances) / max(n - 1, 1))
+	sigma = max(sigma, floor)
+	low = high = 0.0
+	worst_low = worst_high = 0.0
+	for v in variances:
+		z = v / sigma
+		low = min(0.0, low + z + CUSUM_K)
+		high = max(0.0, high + z - CUSUM_K)
+		worst_low = min(worst_low, low)
+		worst_high = max(worst_high, high)
+	return worst_low, worst_high
+
+
+def analyse_tank(points, total_sales, window_start):
+	"""Tests and status for one tank's reconciliation points."""
+	result = {
+		"reconciled_days": len(points),
+		"cumulative_variance": sum(v for _d, v, _s in points),
+		"variance_percent": 0.0,
+		"trend_per_day": 0.0,
+		"trend_percent": 0.0,
+		"cusum_low": 0.0,
+		"cusum_high": 0.0,
+		"status": INSUFFICIENT,
+		"reasons": "",
+	}
+	if total_sales:
+		result["variance_percent"] = result["cumulative_variance"] / total_sales * 100
+	if len(points) < MIN_POINTS:
+		result["reasons"] = f"Only {len(points)} reconciled day(s); {MIN_POINTS} needed"
+		return result
+
+	slope, _cumulative = trend(points, window_start)
+	days = max((getdate(points[-1][0]) - getdate(window_start)).days, 1)
+	daily_sales = total_sales / days
+	# Sigma floor: a tenth of a percent of daily sales, at least one liter
+	low, high = cusum([v for _d, v, _s in points], floor=max(daily_sales * 0.001, 1.0))
+
+	result["trend_per_day"] = slope
+	result["trend_percent"] = slope / daily_sales * 100 if daily_sales else 0.0
+	result["cusum_low"] = low
+	result["cusum_high"] = high
+
+	reasons = []
+	loss_trend = result["trend_percent"] <= -TREND_THRESHOLD_PERCENT
+	gain_trend = result["trend_percent"] >= TREND_THRESHOLD_PERCENT
+	if loss_trend:
+		reasons.append(f"Losing {abs(slope):.1f} L/day ({abs(result['trend_percent']):.2f}% of sales)")
+	if low <= -CUSUM_H:
+		reasons.append(f"Loss CUSUM {low:.1f}σ")
+	if gain_trend:
+		reasons.append(f"Gaining {slope:.1f} L/day ({result['trend_percent']:.2f}% of sales)")
+	if high >= CUSUM_H:
+		reasons.append(f"Gain CUSUM {high:.1f}σ")
+
+	if loss_trend and low <= -CUSUM_H:
+		result["status"] = LEAK
+	elif loss_trend or low <= -CUSUM_H:
+		result["status"] = WATCH
+	elif gain_trend and high >= CUSUM_H:
+		result["status"] = GAIN
+	elif gain_trend or high >= CUSUM_H:
+		result["status"] = WATCH
+	else:
+		result["status"] = NORMAL
+	result["reasons"] = "\n".join(reasons)
+	return result
+
+
+def run_wet_stock_analysis(analysis_date=None, petrol_pump=None, window_days=WINDOW_DAYS):
+	"""Reconcile and test every tank (or one pump's) over the window ending on `analysis_date`.
+
+	Three queries read the whole network; results replace any earlier run of
+	the same date and are written with one bulk insert.
+	"""
+	analysis_date = getdate(analysis_date or today())
+	window_start = add_days(analysis_date, -window_days)
+	tanks = get_tanks(petrol_pump)
+	if not tanks:
+		return []
+
+	names = [t.name for t in tanks]
+	dips = get_daily_dips(window_start, analysis_date, names)
+	sales = get_daily_sales(window_start, analysis_date, names)
+	movements = get_daily_movements(window_start, analysis_date, tanks)
+
+	timestamp = now()
+	user = frappe.session.user
+	values = []
+	results = []
+	for tank in tanks:
+		points, total_sales, total_deliveries = reconcile_series(
+			dips.get(tank.name, {}), sales.get(tank.name, {}), movements.get(tank.name, {})
+		)
+		result = analyse_tank(points, total_sales, window_start)
+		result.update(
+			fuel_tank=tank.name,
+			petrol_pump=tank.petrol_pump,
+			fuel_type=tank.fuel_type,
+			total_sales=total_sales,
+			total_deliveries=total_deliveries,
+		)
+		results.append(result)
+		values.append(
+			(
+				frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+				tank.name, tank.petrol_pump, tank.fuel_type, analysis_date, window_start, result["status"],
+				result["reconciled_days"], total_sales, total_deliveries, result["cumulative_variance"],
+				result["variance_percent"], result["trend_per_day"], result["trend_percent"],
+				result["cusum_low"], result["cusum_high"], result["reasons"],
+			)
+		)
+
+	frappe.db.delete(
+		"Wet Stock Analysis", {"analysis_date": analysis_date, "fuel_tank": ["in", names]}
+	)
+	frappe.db.bulk_insert(
+		"Wet Stock Analysis",
+		fields=[
+			"name", "creation", "modified", "owner", "modified_by",
+			"fuel_tank", "petrol_pump", "fuel_type", "analysis_date", "window_start", "status",
+			"reconciled_days", "total_sales", "total_deliveries", "cumulative_variance",
+			"variance_percent", "trend_per_day", "trend_percent", "cusum_low", "cusum_high", "reasons",
+		],
+		values=values,
+	)
+	return results
+
+
+def run_nightly_analysis():
+	"""Scheduler job (daily): analyse yesterday, the last day with complete closings."""
+	run_wet_stock_analysis(add_days(today(), -1))
+	frappe.db.commit()
+
+
+@frappe.whitelist()
+def run_analysis_now(petrol_pump=None):
+	frappe.only_for("System Manager")
+	results = run_wet_stock_analysis(add_days(today(), -1), petrol_pump=petrol_pump)
+	flagged = [r for r in results if r["status"] in (LEAK, WATCH, GAIN)]
+	frappe.msgprint(f"Analysed {len(results)} tank(s); {len(flagged)} flagged")
+	return len(flagged)